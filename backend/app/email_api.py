@@ -1,11 +1,16 @@
 import os
+import logging
 from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel, EmailStr, Field
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
+from fastapi_mail import ConnectionConfig
 from dotenv import load_dotenv
 load_dotenv()
 
+from app.email_dispatch import EmailDispatcher, InvalidEmailError
+
+logger = logging.getLogger(__name__)
+
 conf = ConnectionConfig(
     MAIL_USERNAME=os.getenv("MAIL_USERNAME"),
     MAIL_PASSWORD=os.getenv("MAIL_PASSWORD"),
@@ -14,11 +19,15 @@ conf = ConnectionConfig(
     MAIL_SERVER=os.getenv("MAIL_SERVER", "smtp.gmail.com"),
     MAIL_STARTTLS=os.getenv("MAIL_STARTTLS", "True").lower() == "true",
     MAIL_SSL_TLS=os.getenv("MAIL_SSL_TLS", "False").lower() == "true",
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True
+    # Both can be switched off to test against a local SMTP server (e.g. aiosmtpd)
+    USE_CREDENTIALS=os.getenv("MAIL_USE_CREDENTIALS", "True").lower() == "true",
+    VALIDATE_CERTS=os.getenv("MAIL_VALIDATE_CERTS", "True").lower() == "true"
 )
 MAIL_TO = os.getenv("MAIL_TO")
 
+# Started and stopped by the application lifespan
+email_dispatcher = EmailDispatcher(conf)
+
 router = APIRouter()
 
 class ContactFormRequest(BaseModel):
@@ -29,16 +38,17 @@ class ContactFormRequest(BaseModel):
 
 @router.post("/submit-contact", status_code=status.HTTP_200_OK)
 async def submit_contact(request: ContactFormRequest):
-    """Handles the contact form submission by sending the main email."""
-    print("START EMAIL HANDLING")
+    """
+    Handles the contact form submission. The email to the owner and the confirmation to the
+    sender are queued for background delivery, the response does not wait for SMTP.
+    """
+    logger.info("Handling contact form submission")
     if not MAIL_TO or not conf.MAIL_USERNAME:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Email service configuration is missing."
         )
 
-    fm = FastMail(conf)
-    
     try:
         owner_email_body = f"""
 New Contact Form Submission:
@@ -49,14 +59,12 @@ Email: {request.email}
 Message:
 {request.message}
 """
-        owner_message = MessageSchema(
-            subject=f"Portfolio Inquiry from {request.name}",
-            recipients=[MAIL_TO], 
-            body=owner_email_body,
-            subtype=MessageType.plain,
-            reply_to=[request.email] 
-        )
-        await fm.send_message(owner_message)
+        owner_message = {
+            "subject": f"Portfolio Inquiry from {request.name}",
+            "recipients": [MAIL_TO],
+            "body": owner_email_body,
+            "reply_to": [request.email]
+        }
 
         confirmation_email_body = f"""
 Dear {request.name},
@@ -69,18 +77,21 @@ Michael Schlosser
 ***
 Disclaimer: This is an automated confirmation of your contact form submission to Michael Schlosser's portfolio. If you received this email in error and did not submit a contact form, please ignore this message.
 """
-        confirmation_message = MessageSchema(
-            subject="Confirmation: Your Inquiry has been received",
-            recipients=[request.email],
-            body=confirmation_email_body,
-            subtype=MessageType.plain
-        )
-        await fm.send_message(confirmation_message)
+        confirmation_message = {
+            "subject": "Confirmation: Your Inquiry has been received",
+            "recipients": [request.email],
+            "body": confirmation_email_body
+        }
+        # Both messages are sent concurrently over pooled SMTP connections
+        await email_dispatcher.enqueue([owner_message, confirmation_message])
+
+        return {"message": "Emails queued for delivery to owner and sender"}
 
-        return {"message": "Emails sent successfully to owner and sender"}
-        
-    except Exception as e:
-        print(f"ERROR SENDING EMAIL: {e}")
+    except InvalidEmailError as e:
+        logger.warning("Rejected contact form submission", extra={"error": str(e)})
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception:
+        logger.exception("Queueing the emails failed")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to send email. Please try again later."
@@ -0,0 +1,292 @@
+import os
+import json
+import logging
+import time
+import asyncio
+import sqlite3
+import threading
+from email.headerregistry import Address
+from email.message import EmailMessage
+from email.utils import formataddr, make_msgid
+from typing import List, Optional
+
+import aiosmtplib
+from fastapi_mail import ConnectionConfig
+
+logger = logging.getLogger(__name__)
+
+# Number of SMTP connections (and concurrent sends), each kept open between messages
+MAIL_POOL_SIZE = int(os.getenv("MAIL_POOL_SIZE", "2"))
+# Pooled connections are closed after this long without messages, before the server drops them
+MAIL_IDLE_TIMEOUT_SECONDS = float(os.getenv("MAIL_IDLE_TIMEOUT_SECONDS", "60"))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "6"))
+# Retries wait base * 2^(attempt - 1) seconds: 5s, 10s, 20s, ...
+MAIL_RETRY_BASE_SECONDS = float(os.getenv("MAIL_RETRY_BASE_SECONDS", "5"))
+MAIL_OUTBOX_PATH = os.getenv("MAIL_OUTBOX_PATH", "data/outbox/outbox.db")
+# A worker owns a message for this long while sending it; other workers and processes sharing the
+# outbox skip it meanwhile, and take it over if the owner died before finishing
+MAIL_CLAIM_SECONDS = float(os.getenv("MAIL_CLAIM_SECONDS", "120"))
+# Retry timers may fire slightly before the stored time
+_CLOCK_TOLERANCE_SECONDS = 1.0
+
+
+class InvalidEmailError(ValueError):
+    """A message that can never be sent, e.g. a header with a line break or an invalid address."""
+
+
+class EmailDispatcher:
+    """
+    Delivers emails in the background. Every message is first written to an on-disk outbox
+    (SQLite), so queued mail survives a restart, then sent by one of `pool_size` workers that
+    each keep an SMTP connection open and reuse it for the following messages. Failed sends are
+    retried with exponential backoff; after `max_attempts` the message is marked as failed
+    and stays in the outbox for inspection. Several server processes can share one outbox:
+    a message is claimed before it is sent, so it is delivered once.
+    """
+
+    def __init__(
+        self,
+        conf: ConnectionConfig,
+        outbox_path: str = MAIL_OUTBOX_PATH,
+        pool_size: int = MAIL_POOL_SIZE,
+        max_attempts: int = MAIL_MAX_ATTEMPTS,
+        retry_base_seconds: float = MAIL_RETRY_BASE_SECONDS,
+        idle_timeout_seconds: float = MAIL_IDLE_TIMEOUT_SECONDS,
+        claim_seconds: float = MAIL_CLAIM_SECONDS,
+    ):
+        self.conf = conf
+        self.outbox_path = outbox_path
+        self.pool_size = pool_size
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.claim_seconds = claim_seconds
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.connections_opened = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        # Workers touch the outbox from the thread pool, access is serialized by the lock
+        self._lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._retry_handles = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self):
+        self._conn = await asyncio.to_thread(self._open_outbox)
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.pool_size)]
+
+        # Mail queued before the last shutdown (or still waiting for a retry) is picked up again
+        pending = await asyncio.to_thread(
+            self._fetch_all, "SELECT id, next_attempt_at FROM outbox WHERE status = 'pending' ORDER BY id", ()
+        )
+        for message_id, next_attempt_at in pending:
+            self._schedule(message_id, next_attempt_at - time.time())
+        if pending:
+            logger.info("Resuming queued emails from the outbox", extra={"emails": len(pending)})
+
+    async def aclose(self):
+        """Stops the workers; unsent mail stays in the outbox for the next start."""
+        for handle in self._retry_handles:
+            handle.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    def _open_outbox(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.outbox_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.outbox_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY,
+                message TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            );
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox (status);")
+        conn.commit()
+        return conn
+
+    def _fetch_all(self, sql: str, parameters: tuple) -> list:
+        with self._lock:
+            return self._conn.execute(sql, parameters).fetchall()
+
+    def _write(self, sql: str, parameters: tuple):
+        with self._lock, self._conn:
+            self._conn.execute(sql, parameters)
+
+    def _insert(self, messages: List[dict]) -> List[int]:
+        now = time.time()
+        with self._lock, self._conn:
+            return [
+                self._conn.execute(
+                    "INSERT INTO outbox (message, next_attempt_at, created_at) VALUES (?, ?, ?)",
+                    (json.dumps(message), now, now)
+                ).lastrowid
+                for message in messages
+            ]
+
+    def _claim(self, message_id: int) -> tuple:
+        """
+        Takes the message for `claim_seconds`. Returns (message, attempts) if this worker owns it now,
+        otherwise None and the time it becomes available again (None if it is gone).
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            claimed = self._conn.execute(
+                "UPDATE outbox SET next_attempt_at = ? WHERE id = ? AND status = 'pending' AND next_attempt_at <= ?",
+                (now + self.claim_seconds, message_id, now + _CLOCK_TOLERANCE_SECONDS)
+            ).rowcount
+            row = self._conn.execute(
+                "SELECT message, attempts, next_attempt_at FROM outbox WHERE id = ? AND status = 'pending'", (message_id,)
+            ).fetchone()
+        if row is None:
+            return None, None
+        if not claimed:
+            return None, row[2]
+        return (json.loads(row[0]), row[1]), None
+
+    async def enqueue(self, messages: List[dict]) -> List[int]:
+        """
+        Persists the messages ({subject, recipients, body, reply_to}) and queues them for
+        delivery. Returns once they are in the outbox, without waiting for SMTP. Raises
+        InvalidEmailError (and queues none of them) if one of the messages cannot be sent.
+        """
+        for message in messages:
+            self.validate(message)
+        message_ids = await asyncio.to_thread(self._insert, messages)
+        for message_id in message_ids:
+            self._queue.put_nowait(message_id)
+        return message_ids
+
+    def _schedule(self, message_id: int, delay: float):
+        if delay <= 0:
+            self._queue.put_nowait(message_id)
+            return
+        loop = asyncio.get_running_loop()
+        self._retry_handles = [handle for handle in self._retry_handles if handle.when() > loop.time()]
+        self._retry_handles.append(loop.call_later(delay, self._queue.put_nowait, message_id))
+
+    def validate(self, message: dict):
+        """Rejects messages that would fail on every attempt, before they reach the outbox."""
+        for address in [*message["recipients"], *message.get("reply_to", [])]:
+            try:
+                Address(addr_spec=address)
+            except ValueError as e:
+                raise InvalidEmailError(f"Invalid email address: {e}") from e
+        try:
+            self._build_message(message)
+        except ValueError as e:
+            # E.g. header injection attempts, headers cannot contain line breaks
+            raise InvalidEmailError(str(e)) from e
+
+    def _build_message(self, message: dict) -> EmailMessage:
+        email = EmailMessage()
+        email["Subject"] = message["subject"]
+        email["From"] = formataddr((self.conf.MAIL_FROM_NAME or "", str(self.conf.MAIL_FROM)))
+        email["To"] = ", ".join(message["recipients"])
+        if message.get("reply_to"):
+            email["Reply-To"] = ", ".join(message["reply_to"])
+        email["Message-ID"] = make_msgid()
+        email.set_content(message["body"])
+        return email
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.conf.MAIL_SERVER,
+            port=self.conf.MAIL_PORT,
+            use_tls=self.conf.MAIL_SSL_TLS,
+            start_tls=self.conf.MAIL_STARTTLS,
+            validate_certs=self.conf.VALIDATE_CERTS,
+            timeout=self.conf.TIMEOUT,
+        )
+        await smtp.connect()
+        if self.conf.USE_CREDENTIALS:
+            await smtp.login(self.conf.MAIL_USERNAME, self.conf.MAIL_PASSWORD.get_secret_value())
+        self.connections_opened += 1
+        return smtp
+
+    @staticmethod
+    async def _disconnect(smtp: Optional[aiosmtplib.SMTP]):
+        if smtp is None or not smtp.is_connected:
+            return
+        try:
+            await smtp.quit()
+        except aiosmtplib.SMTPException:
+            smtp.close()
+
+    async def _worker(self):
+        smtp = None
+        try:
+            while True:
+                try:
+                    message_id = await asyncio.wait_for(self._queue.get(), timeout=self.idle_timeout_seconds)
+                except asyncio.TimeoutError:
+                    await self._disconnect(smtp)
+                    smtp = None
+                    continue
+
+                claimed, available_at = await asyncio.to_thread(self._claim, message_id)
+                if claimed is None:
+                    if available_at is not None:
+                        # Claimed by another process, taken over if it is still pending then
+                        self._schedule(message_id, available_at - time.time())
+                    continue
+                message, attempts = claimed
+                try:
+                    if smtp is None or not smtp.is_connected:
+                        smtp = await self._connect()
+                    await smtp.send_message(self._build_message(message))
+                except Exception as e:
+                    # The connection may be broken, the next message reconnects
+                    await self._disconnect(smtp)
+                    smtp = None
+                    await self._handle_failure(message_id, attempts + 1, e)
+                    continue
+
+                await asyncio.to_thread(self._write, "DELETE FROM outbox WHERE id = ?", (message_id,))
+                self.sent += 1
+        finally:
+            await self._disconnect(smtp)
+
+    async def _handle_failure(self, message_id: int, attempts: int, error: Exception):
+        if attempts >= self.max_attempts:
+            self.failed += 1
+            logger.error("Giving up on email", extra={"email_id": message_id, "attempts": attempts, "error": str(error)})
+            status, delay = "failed", 0.0
+        else:
+            self.retried += 1
+            delay = self.retry_base_seconds * 2 ** (attempts - 1)
+            logger.warning("Sending email failed, retrying", extra={"email_id": message_id, "error": str(error), "retry_in_seconds": delay})
+            status = "pending"
+
+        await asyncio.to_thread(
+            self._write,
+            "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+            (status, attempts, time.time() + delay, str(error), message_id)
+        )
+        if status == "pending":
+            self._schedule(message_id, delay)
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "smtp_connections_opened": self.connections_opened,
+        }
@@ -1,25 +1,58 @@
 # main.py
 import os
+import glob
+import json
+import logging
+import time
+import asyncio
+import secrets
 import uvicorn
-from fastapi import FastAPI, HTTPException, Request
-from pydantic import BaseModel
-from typing import List
+from fastapi import Depends, FastAPI, HTTPException, Request, Header, Query
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest, multiprocess
 
-from app.email_api import router as email_router
+from app.email_api import router as email_router, email_dispatcher
+from app.rate_limit import limiter, CHAT_RATE_LIMIT
+from app.responses import CacheableBody, CompressionMiddleware, conditional_response
 from portfolio_assistant.core.assistant import PortfolioAssistant
+from portfolio_assistant.core.config import aclose_http_clients, SESSION_DB_PATH, SESSION_IDLE_TTL_SECONDS, SESSION_MAX_SESSIONS
+from portfolio_assistant.core.sessions import SessionManager
+from portfolio_assistant.tools.rag import warm_retriever, refresh_retriever_periodically
+from portfolio_assistant.tools.profile import read_profile
+from portfolio_assistant.tools.db_manager import question_writer
+from portfolio_assistant.tools.question_analytics import atop_missing_topics, default_range
+from portfolio_assistant.utils.log import configure_logging
+from portfolio_assistant.utils.metrics import HTTP_REQUEST_DURATION
 
-limiter = Limiter(key_func=get_remote_address)
+configure_logging()
+logger = logging.getLogger(__name__)
 
 DEV_MODE = os.getenv("APP_ENV") == "dev"
-print(f"Server starting in: {'DEV (Ollama)' if DEV_MODE else 'PROD (OpenRouter)'} Mode")
+# 'background': serve immediately and build the vector store in a background task,
+# 'blocking': finish the vector store before serving, 'lazy': build on the first query
+RAG_WARMUP_MODE = os.getenv("RAG_WARMUP_MODE", "background")
+# Seconds between checks for changed source documents (0 disables the refresh)
+RAG_REFRESH_INTERVAL_SECONDS = float(os.getenv("RAG_REFRESH_INTERVAL_SECONDS", "0"))
+# Visitors' questions and the assistant's internals are private, /analytics and /stats are only enabled with a token
+ANALYTICS_TOKEN = os.getenv("ANALYTICS_TOKEN")
+# Worker processes of `python -m app.main`; rate limits, sessions and logs are shared through data/
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+# With several workers each one writes its metrics to files in this directory and /metrics merges
+# them (prometheus_client multiprocess mode). `python -m app.main` sets it, other launchers have to
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+# Browsers and CDNs reuse /profile this long before revalidating it with its ETag
+PROFILE_MAX_AGE_SECONDS = int(os.getenv("PROFILE_MAX_AGE_SECONDS", "300"))
+logger.info(f"Server starting in: {'DEV (Ollama)' if DEV_MODE else 'PROD (OpenRouter)'} Mode")
 
 portfolio_assistant = None
+session_manager = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -27,11 +60,40 @@ async def lifespan(app: FastAPI):
     Initializes the assistant when the server starts.
     This prevents re-initializing the LLM connection on every request.
     """
-    global portfolio_assistant
-    portfolio_assistant = PortfolioAssistant(dev_mode=DEV_MODE)
+    global portfolio_assistant, session_manager
+    startup_started_at = time.perf_counter()
+    session_manager = SessionManager(SESSION_DB_PATH, SESSION_IDLE_TTL_SECONDS, SESSION_MAX_SESSIONS)
+    await session_manager.aopen()
+    await question_writer.start()
+    await email_dispatcher.start()
+    portfolio_assistant = PortfolioAssistant(dev_mode=DEV_MODE, checkpointer=session_manager.checkpointer)
+
+    background_tasks = []
+    if RAG_WARMUP_MODE == "blocking":
+        await warm_retriever()
+    elif RAG_WARMUP_MODE == "background":
+        background_tasks.append(asyncio.create_task(warm_retriever()))
+    if RAG_REFRESH_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(
+            refresh_retriever_periodically(RAG_REFRESH_INTERVAL_SECONDS)
+        ))
+    logger.info(
+        "Startup finished",
+        extra={"seconds": round(time.perf_counter() - startup_started_at, 2), "rag_warmup": RAG_WARMUP_MODE}
+    )
+
     yield
-    # Cleanup code (if needed) goes here
-    print("Shutting down Portfolio Assistant...")
+
+    logger.info("Shutting down Portfolio Assistant...")
+    for task in background_tasks:
+        task.cancel()
+    await session_manager.aclose()
+    # Flushes the questions that are still queued; unsent emails stay in the outbox
+    await question_writer.aclose()
+    await email_dispatcher.aclose()
+    await aclose_http_clients()
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
 
 app = FastAPI(title="Portfolio Chat API", lifespan=lifespan)
 app.state.limiter = limiter
@@ -39,44 +101,199 @@ app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
 app.include_router(email_router)
 
+@app.middleware("http")
+async def observe_request_duration(request: Request, call_next):
+    started_at = time.perf_counter()
+    response = await call_next(request)
+    # The route template keeps the label set small (no ids or query strings); for streams
+    # the duration ends when the response starts, the node histograms cover the rest
+    route = request.scope.get("route")
+    HTTP_REQUEST_DURATION.labels(
+        method=request.method,
+        route=route.path if route else "unmatched",
+        status=response.status_code,
+    ).observe(time.perf_counter() - started_at)
+    return response
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the frontend read the validators for conditional requests
+    expose_headers=["ETag", "Last-Modified"],
 )
+# Outermost, so it also compresses the CORS and error responses
+app.add_middleware(CompressionMiddleware)
+
+# Upper bounds for a single request; the assistant itself only sends a bounded
+# window plus a rolling summary of the history to the LLMs
+MAX_MESSAGE_LENGTH = 2000
+MAX_HISTORY_MESSAGES = 200
 
 class Message(BaseModel):
     role: str
-    text: str
+    text: str = Field(..., max_length=4 * MAX_MESSAGE_LENGTH)
 
 class ChatRequest(BaseModel):
-    message: str
-    history: List[Message]
+    message: str = Field(..., min_length=1, max_length=MAX_MESSAGE_LENGTH)
+    # Sessions keep the history on the server; 'history' is only used for stateless requests
+    session_id: Optional[str] = Field(default=None, max_length=64)
+    history: List[Message] = Field(default_factory=list, max_length=MAX_HISTORY_MESSAGES)
+
+async def _resolve_session(chat_data: ChatRequest) -> Optional[str]:
+    """Requests that send their own history stay stateless, all others run in a server-side session."""
+    if chat_data.history and not chat_data.session_id:
+        return None
+    session_id, _ = await session_manager.resolve(chat_data.session_id)
+    return session_id
+
+ROOT_BODY = CacheableBody.from_json(
+    {"status": "ok", "mode": "DEVELOPER (Local Ollama)" if DEV_MODE else "PRODUCTION (OpenRouter)"},
+    last_modified=time.time(),
+)
 
 @app.get("/")
-def read_root():
-    mode = "DEVELOPER (Local Ollama)" if DEV_MODE else "PRODUCTION (OpenRouter)"
-    return {"status": "ok", "mode": mode}
+def read_root(request: Request):
+    return conditional_response(request, ROOT_BODY)
+
+@app.get("/profile")
+async def read_profile_endpoint(request: Request):
+    """
+    Portfolio facts extracted from the documents when the index was built (documents, their
+    sections with text, emphasized phrases). No LLM is involved; revalidate with If-None-Match.
+    """
+    profile = await asyncio.to_thread(read_profile)
+    if profile is None:
+        raise HTTPException(status_code=503, detail="The profile is built with the index, try again shortly")
+    body, last_modified = profile
+    return conditional_response(
+        request,
+        CacheableBody.from_bytes(body, last_modified),
+        cache_control=f"public, max-age={PROFILE_MAX_AGE_SECONDS}",
+    )
+
+def require_analytics_token(x_analytics_token: Optional[str] = Header(None)):
+    """Admits requests sending ANALYTICS_TOKEN as X-Analytics-Token; without a token the endpoint is disabled."""
+    if not ANALYTICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Analytics are disabled")
+    if not x_analytics_token or not secrets.compare_digest(x_analytics_token, ANALYTICS_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid analytics token")
+
+@app.get("/stats", dependencies=[Depends(require_analytics_token)])
+async def read_stats():
+    """Counters of the assistant's shortcuts (e.g. how many LLM router calls were skipped)."""
+    if not portfolio_assistant:
+        raise HTTPException(status_code=500, detail="Assistant not initialized")
+    stats = portfolio_assistant.stats()
+    stats["sessions"] = {"active": await session_manager.count()}
+    stats["email"] = email_dispatcher.stats()
+    return stats
+
+@app.get("/metrics")
+def read_metrics():
+    """Prometheus metrics: per-node and LLM latency histograms, token usage, retrieval and HTTP metrics."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        # Whichever worker answers reports the metrics of all workers
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/analytics/unanswered", dependencies=[Depends(require_analytics_token)])
+async def read_unanswered_topics(
+    since: Optional[str] = Query(None, description="First day (YYYY-MM-DD), default 30 days ago"),
+    until: Optional[str] = Query(None, description="Last day (YYYY-MM-DD), default today"),
+    limit: int = Query(20, ge=1, le=100),
+    cluster: bool = Query(True, description="Merge similar questions by embedding similarity"),
+):
+    """Top missing topics: the most asked unanswered questions in the time range."""
+    if not portfolio_assistant:
+        raise HTTPException(status_code=500, detail="Assistant not initialized")
+
+    default_since, default_until = default_range()
+    topics = await atop_missing_topics(
+        since or default_since,
+        until or default_until,
+        limit,
+        embeddings=portfolio_assistant.embeddings if cluster else None,
+    )
+    return {"since": since or default_since, "until": until or default_until, "topics": topics}
 
 @app.post("/chat")
-@limiter.limit("30/day")
+# Shared with /chat/stream, switching endpoints does not grant a second quota
+@limiter.shared_limit(CHAT_RATE_LIMIT, scope="chat")
 async def chat_endpoint(request: Request, chat_data: ChatRequest): # Slowapi needs request object
     if not portfolio_assistant:
         raise HTTPException(status_code=500, detail="Assistant not initialized")
 
+    session_id = await _resolve_session(chat_data)
     # Pass the request to the assistant
     result = await portfolio_assistant.chat(
         user_input=chat_data.message,
-        history=[m.dict() for m in chat_data.history]
+        history=[m.model_dump() for m in chat_data.history],
+        session_id=session_id
     )
+    if session_id:
+        await session_manager.touch(session_id)
     response_text = result["messages"][-1].content
     return {
             "response": response_text,
-            "action": result.get("next_action", "none") # Add a new key for the action
+            "action": result.get("next_action", "none"), # Add a new key for the action
+            "session_id": session_id
         }
 
+def _format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream")
+@limiter.shared_limit(CHAT_RATE_LIMIT, scope="chat")
+async def chat_stream_endpoint(request: Request, chat_data: ChatRequest):
+    """
+    Same as /chat, but answers with Server-Sent Events: 'progress' events for every
+    graph node, 'token' events with the answer chunks and a 'final' event with the action.
+    """
+    if not portfolio_assistant:
+        raise HTTPException(status_code=500, detail="Assistant not initialized")
+
+    session_id = await _resolve_session(chat_data)
+
+    async def event_generator():
+        try:
+            async for event in portfolio_assistant.astream_chat(
+                user_input=chat_data.message,
+                history=[m.model_dump() for m in chat_data.history],
+                session_id=session_id
+            ):
+                if event["event"] == "final":
+                    if session_id:
+                        await session_manager.touch(session_id)
+                    event["data"]["session_id"] = session_id
+                yield _format_sse(event["event"], event["data"])
+        except Exception:
+            logger.exception("Streaming the chat failed")
+            yield _format_sse("error", {"detail": "Failed to generate a response."})
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 if __name__ == "__main__":
-    print(f"Starting Server. Dev Mode: {DEV_MODE}")
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=DEV_MODE)
\ No newline at end of file
+    logger.info(f"Starting Server. Dev Mode: {DEV_MODE}, workers: {WEB_CONCURRENCY}")
+    if WEB_CONCURRENCY > 1 and not DEV_MODE:
+        # The workers import prometheus_client after this; files of a previous run would be counted
+        metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.abspath("data/metrics"))
+        os.makedirs(metrics_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(metrics_dir, "*.db")):
+            os.remove(path)
+    # Reloading only works with a single process
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=DEV_MODE,
+        workers=None if DEV_MODE else WEB_CONCURRENCY,
+    )
\ No newline at end of file
@@ -0,0 +1,98 @@
+# rate_limit.py
+import os
+import time
+import sqlite3
+import threading
+from urllib.parse import urlparse
+
+from limits.storage import Storage
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+# Where the request counters live. The default SQLite file is shared by all workers on the host;
+# 'redis://host:6379' (requires `redis`) shares them across hosts, 'memory://' counts per worker
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "sqlite:///data/ratelimit/limits.db")
+CHAT_RATE_LIMIT = os.getenv("CHAT_RATE_LIMIT", "30/day")
+PURGE_EVERY_INCREMENTS = 1000
+
+
+class SQLiteStorage(Storage):
+    """
+    Fixed-window rate limit counters in a SQLite file, registered for `sqlite:///path` URIs
+    (four slashes for an absolute path). Every increment is one atomic upsert, so the limits
+    hold exactly across processes.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.path = urlparse(uri).path[1:] or "limits.db"
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=float(options.get("timeout", 10)), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                count INTEGER NOT NULL,
+                expires_at REAL NOT NULL
+            ) WITHOUT ROWID;
+        """)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._increments = 0
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = time.time()
+        with self._lock, self._conn:
+            self._increments += 1
+            if self._increments % PURGE_EVERY_INCREMENTS == 0:
+                # Finished windows of other clients; otherwise the table keeps one row per client and route
+                self._conn.execute("DELETE FROM rate_limits WHERE expires_at <= ?", (now,))
+            # An expired window starts over with this hit
+            return self._conn.execute(
+                """
+                INSERT INTO rate_limits (key, count, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    count = CASE WHEN expires_at <= ? THEN excluded.count ELSE count + excluded.count END,
+                    expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END
+                RETURNING count
+                """,
+                (key, amount, now + expiry, now, now)
+            ).fetchone()[0]
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT count FROM rate_limits WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at FROM rate_limits WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self) -> bool:
+        try:
+            with self._lock:
+                self._conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int:
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM rate_limits").rowcount
+
+    def clear(self, key: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM rate_limits WHERE key = ?", (key,))
+
+
+limiter = Limiter(key_func=get_remote_address, storage_uri=RATE_LIMIT_STORAGE_URI)
@@ -0,0 +1,185 @@
+# responses.py
+import os
+import json
+import zlib
+import hashlib
+from dataclasses import dataclass
+from datetime import timezone
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Smaller responses are sent uncompressed, the encoding overhead would eat the savings
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "500"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def _accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """'br' or 'gzip', whichever the client accepts (brotli first), or None."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                continue
+        accepted[name.strip().lower()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class _Encoder:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            output = self._compressor.process(data)
+            return output + (self._compressor.finish() if final else self._compressor.flush())
+        output = self._compressor.compress(data)
+        return output + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """
+    Compresses JSON, text and Server-Sent Events with brotli (if the `brotli` extra is installed)
+    or gzip, whichever the client accepts. Streams are flushed after every chunk, so each event is
+    delivered as soon as it is sent while sharing the compression window with the earlier ones.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _accepted_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder: Optional[_Encoder] = None
+
+        async def compressing_send(message):
+            nonlocal start_message, encoder
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether compressing pays off
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                start, start_message = start_message, None
+                headers = MutableHeaders(raw=start["headers"])
+                content_type = headers.get("content-type", "")
+                # Middlewares upstream may send a complete body in several messages
+                size = int(headers["content-length"]) if "content-length" in headers else None
+                if size is None and not more_body:
+                    size = len(body)
+                if (
+                    "content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or (size is not None and size < self.minimum_size)
+                ):
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = _Encoder(encoding)
+                headers["content-encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "etag" in headers and not headers["etag"].startswith("W/"):
+                    # The compressed bytes differ from the ones the strong validator describes
+                    headers["etag"] = "W/" + headers["etag"]
+                if "content-length" in headers:
+                    del headers["content-length"]
+                if not more_body:
+                    body = encoder.compress(body, final=True)
+                    headers["content-length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start)
+
+            if encoder is None:
+                await send(message)
+                return
+            await send({"type": "http.response.body", "body": encoder.compress(body, final=not more_body), "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)
+
+
+@dataclass(frozen=True)
+class CacheableBody:
+    """A response body with its validators: a content hash as ETag and its modification time."""
+    body: bytes
+    etag: str
+    last_modified: float
+
+    @classmethod
+    def from_bytes(cls, body: bytes, last_modified: float) -> "CacheableBody":
+        return cls(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"', last_modified=last_modified)
+
+    @classmethod
+    def from_json(cls, payload, last_modified: float) -> "CacheableBody":
+        return cls.from_bytes(json.dumps(payload, separators=(",", ":")).encode(), last_modified)
+
+
+def _not_modified(request: Request, cacheable: CacheableBody) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison, the compression middleware marks the ETags of compressed bodies weak
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or cacheable.etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return int(cacheable.last_modified) <= since.timestamp()
+    return False
+
+
+def conditional_response(
+    request: Request,
+    cacheable: CacheableBody,
+    cache_control: str = "no-cache",
+    media_type: str = "application/json",
+) -> Response:
+    """The body with ETag and Last-Modified, or an empty 304 if the client's copy is current."""
+    headers = {
+        "ETag": cacheable.etag,
+        "Last-Modified": formatdate(cacheable.last_modified, usegmt=True),
+        "Cache-Control": cache_control,
+    }
+    if _not_modified(request, cacheable):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cacheable.body, media_type=media_type, headers=headers)
@@ -0,0 +1,69 @@
+# bench_coalescing.py
+"""
+A shared link: --visitors send the same first question at the same time, some as /chat and
+some as /chat/stream. Reports the LLM calls, wall-clock time and p95 latency with and without
+request coalescing (single-flight). Chat models and embeddings are fakes.
+
+Usage: python -m benchmarks.bench_coalescing --visitors 50 --latency 0.2
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+QUESTIONS = ["What is his tech stack?", "what is his tech stack", "What is his tech-stack?!"]
+
+
+async def run_burst(assistant, visitors: int) -> dict:
+    latencies = []
+
+    async def visitor(i: int):
+        started_at = time.perf_counter()
+        question = QUESTIONS[i % len(QUESTIONS)]
+        if i % 2:
+            [event async for event in assistant.astream_chat(question, [])]
+        else:
+            await assistant.chat(question, [])
+        latencies.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*[visitor(i) for i in range(visitors)])
+    return {
+        "wall_s": time.perf_counter() - started_at,
+        "p95_s": statistics.quantiles(latencies, n=20, method="inclusive")[18],
+    }
+
+
+async def main(args):
+    os.chdir(tempfile.mkdtemp(prefix="bench_coalescing_"))
+    # Keeps the fake questions out of the real review log
+    os.environ["QUESTION_DB_PATH"] = os.path.abspath(os.path.join("data", "questions", "unanswered_questions.db"))
+    # Every burst should reach the graph, not the answer cache
+    os.environ["SEMANTIC_CACHE_ENABLED"] = "False"
+    from benchmarks.fakes import FakeEmbeddings, fake_model_factory
+    from portfolio_assistant.tools.rag import set_embeddings
+    from portfolio_assistant.core.assistant import PortfolioAssistant
+
+    set_embeddings(FakeEmbeddings())
+    print(f"{'coalescing':<12}{'LLM calls':>10}{'wall s':>9}{'p95 s':>9}")
+    for enabled in (False, True):
+        prompt_logs = []
+        assistant = PortfolioAssistant(model_factory=fake_model_factory(latency=args.latency, prompt_logs=prompt_logs))
+        if not enabled:
+            assistant.single_flight = None
+        await assistant.chat("warm-up", [])
+        calls_before = sum(len(log) for log in prompt_logs)
+        result = await run_burst(assistant, args.visitors)
+        calls = sum(len(log) for log in prompt_logs) - calls_before
+        print(f"{'on' if enabled else 'off':<12}{calls:>10}{result['wall_s']:>9.2f}{result['p95_s']:>9.2f}")
+        if enabled:
+            print(f"stats: {assistant.stats()['coalescing']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--visitors", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated seconds per LLM call")
+    asyncio.run(main(parser.parse_args()))
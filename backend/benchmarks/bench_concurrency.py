@@ -0,0 +1,78 @@
+# bench_concurrency.py
+"""
+Runs N simultaneous chats through the full graph with fake chat models and
+reports throughput. With native async nodes the throughput should grow
+roughly linearly with N, because no node holds a thread pool worker while
+waiting on the (simulated) LLM.
+
+Usage: python -m benchmarks.bench_concurrency --concurrency 1 8 32 128 --latency 0.05 > /dev/null
+(the report goes to stderr, node logging to stdout)
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+QUESTIONS = [
+    "What is his tech stack?",
+    "Where did he study?",
+    "hello",
+    "I want to email him",
+]
+
+
+def _load_assistant_class():
+    # Keep the vector store and embedding cache in a scratch directory
+    os.chdir(tempfile.mkdtemp(prefix="bench_concurrency_"))
+    # Keeps the fake questions out of the real review log
+    os.environ["QUESTION_DB_PATH"] = os.path.abspath(os.path.join("data", "questions", "unanswered_questions.db"))
+    # Every chat should run the whole graph
+    os.environ["SEMANTIC_CACHE_ENABLED"] = "False"
+    os.environ["GRADER_MODE"] = "llm"
+
+    from benchmarks.fakes import FakeEmbeddings
+    from portfolio_assistant.tools.rag import set_embeddings
+    from portfolio_assistant.core.assistant import PortfolioAssistant
+
+    set_embeddings(FakeEmbeddings())
+    return PortfolioAssistant
+
+
+async def _run_batch(assistant, concurrency: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        assistant.chat(user_input=QUESTIONS[i % len(QUESTIONS)], history=[])
+        for i in range(concurrency)
+    ])
+    return time.perf_counter() - start
+
+
+async def main(concurrency_levels, latency: float):
+    from benchmarks.fakes import fake_model_factory
+
+    PortfolioAssistant = _load_assistant_class()
+    assistant = PortfolioAssistant(model_factory=fake_model_factory(latency=latency))
+    await _run_batch(assistant, 1)  # warm-up
+
+    results = []
+    for concurrency in concurrency_levels:
+        elapsed = await _run_batch(assistant, concurrency)
+        results.append((concurrency, elapsed, concurrency / elapsed))
+
+    print(f"\n{'N':>6} {'wall [s]':>10} {'chats/s':>10} {'speedup':>10}", file=sys.stderr)
+    base_throughput = results[0][2]
+    for concurrency, elapsed, throughput in results:
+        print(
+            f"{concurrency:>6} {elapsed:>10.3f} {throughput:>10.1f} {throughput / base_throughput:>10.1f}x",
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64, 128])
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per LLM call")
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.latency))
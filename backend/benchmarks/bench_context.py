@@ -0,0 +1,74 @@
+# bench_context.py
+"""
+Plays a conversation of up to --turns turns against the assistant (fake models) and
+reports, per turn, the estimated prompt tokens sent to the router and the chat
+generator and the latency of the turn. With bounded context both stay flat, the
+--unbounded run shows the previous behaviour of sending the full history.
+
+Usage: python -m benchmarks.bench_context --turns 60 > /dev/null
+(the report goes to stderr, node logging to stdout)
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+REPORT_TURNS = [1, 5, 10, 25, 50, 75, 100]
+
+
+async def play(assistant, prompt_logs: list, turns: int) -> list:
+    # Creation order in PortfolioAssistant: router, grader, generator, summarizer
+    router_log, _, generator_log = prompt_logs[:3]
+    history = []
+    rows = []
+    for turn in range(1, turns + 1):
+        # Alternate LLM-routed searches and small talk that goes to the chat node
+        message = f"What did he build in project number {turn}?" if turn % 2 else "thanks"
+        router_calls, generator_calls = len(router_log), len(generator_log)
+
+        started_at = time.perf_counter()
+        result = await assistant.chat(user_input=message, history=history)
+        latency = time.perf_counter() - started_at
+
+        router_tokens = sum(router_log[router_calls:])
+        generator_tokens = sum(generator_log[generator_calls:])
+        rows.append((turn, router_tokens, generator_tokens, latency))
+        history += [{"role": "user", "text": message}, {"role": "ai", "text": result["messages"][-1].content}]
+    return rows
+
+
+async def main(turns: int, unbounded: bool):
+    os.chdir(tempfile.mkdtemp(prefix="bench_context_"))
+    # Keeps the fake questions out of the real review log
+    os.environ["QUESTION_DB_PATH"] = os.path.abspath(os.path.join("data", "questions", "unanswered_questions.db"))
+    os.environ["SEMANTIC_CACHE_ENABLED"] = "False"
+    os.environ["GRADER_MODE"] = "llm"
+    if unbounded:
+        os.environ["CONTEXT_MAX_RECENT_MESSAGES"] = "100000"
+        os.environ["CONTEXT_MAX_TOKENS"] = "100000000"
+        os.environ["ROUTER_HISTORY_WINDOW"] = "100000"
+
+    from benchmarks.fakes import FakeEmbeddings, fake_model_factory
+    from portfolio_assistant.tools.rag import set_embeddings
+    from portfolio_assistant.core.assistant import PortfolioAssistant
+
+    set_embeddings(FakeEmbeddings())
+    prompt_logs = []
+    assistant = PortfolioAssistant(model_factory=fake_model_factory(latency=0.01, prompt_logs=prompt_logs))
+    rows = await play(assistant, prompt_logs, turns)
+
+    print(f"\n{'unbounded' if unbounded else 'bounded'} context", file=sys.stderr)
+    print(f"{'turn':>6} {'router tok':>11} {'chat tok':>9} {'latency [ms]':>13}", file=sys.stderr)
+    for turn, router_tokens, generator_tokens, latency in rows:
+        if turn in REPORT_TURNS or turn == turns:
+            print(f"{turn:>6} {router_tokens:>11} {generator_tokens:>9} {latency * 1000:>13.1f}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--unbounded", action="store_true", help="Send the full history like before")
+    args = parser.parse_args()
+    asyncio.run(main(args.turns, args.unbounded))
@@ -0,0 +1,253 @@
+# bench_e2e.py
+"""
+Offline end-to-end load test. It runs the full graph directly ('graph') and through the
+FastAPI app, using an in-process ASGI client ('http'). Both use deterministic fake chat
+models and fake embeddings, on a synthetic corpus of --files documents in data/source.
+
+Every corpus size runs in a fresh child process with its own scratch directory, so
+indexes and memory do not carry over. At every concurrency level, --requests chats are
+sent by that many concurrent clients. The report shows latency percentiles, throughput,
+peak RSS and the mean time per graph node, taken from the /metrics histograms.
+
+--save-baseline writes the results to --baseline. --compare checks the results against
+the baseline and exits with status 1 when p95 latency or throughput is worse by more
+than --tolerance.
+
+Usage: python -m benchmarks.bench_e2e --files 10 200 --concurrency 1 8 32 --requests 64
+       python -m benchmarks.bench_e2e --save-baseline
+       python -m benchmarks.bench_e2e --compare --tolerance 0.2
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+import tempfile
+import functools
+import statistics
+import subprocess
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baselines", "bench_e2e.json")
+MODES = ["graph", "http"]
+
+QUESTIONS = [
+    "What is his tech stack?",
+    "Which projects used sensor fusion?",
+    "Where did he study?",
+    "hello",
+    "I want to email him",
+    "What did he build with C++ and Python?",
+]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _node_totals() -> dict:
+    """Total seconds and calls per graph node, read from the node duration histogram."""
+    from portfolio_assistant.utils.metrics import NODE_DURATION
+
+    totals = {}
+    for sample in NODE_DURATION.collect()[0].samples:
+        node = sample.labels["node"]
+        if sample.name.endswith("_sum"):
+            totals.setdefault(node, [0.0, 0])[0] = sample.value
+        elif sample.name.endswith("_count"):
+            totals.setdefault(node, [0.0, 0])[1] = int(sample.value)
+    return totals
+
+
+def _stage_means(before: dict, after: dict) -> dict:
+    stages = {}
+    for node, (seconds, calls) in after.items():
+        seconds_before, calls_before = before.get(node, (0.0, 0))
+        if calls > calls_before:
+            stages[node] = round((seconds - seconds_before) / (calls - calls_before) * 1000, 2)
+    return stages
+
+
+async def _run_level(send, concurrency: int, requests: int) -> dict:
+    """Sends `requests` chats from `concurrency` concurrent clients, each waiting for its answer."""
+    latencies = []
+    pending = iter(range(requests))
+
+    async def client():
+        for i in pending:
+            started_at = time.perf_counter()
+            await send(QUESTIONS[i % len(QUESTIONS)])
+            latencies.append(time.perf_counter() - started_at)
+
+    nodes_before = _node_totals()
+    started_at = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started_at
+
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "p50_ms": round(percentiles[49] * 1000, 2),
+        "p95_ms": round(percentiles[94] * 1000, 2),
+        "p99_ms": round(percentiles[98] * 1000, 2),
+        "throughput_rps": round(requests / elapsed, 2),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "stages_ms": _stage_means(nodes_before, _node_totals()),
+    }
+
+
+async def _measure_child(args) -> dict:
+    from benchmarks.fakes import FakeEmbeddings, fake_model_factory
+    from portfolio_assistant.tools.rag import set_embeddings, warm_retriever
+    from portfolio_assistant.core.assistant import PortfolioAssistant
+
+    set_embeddings(FakeEmbeddings(latency=args.embedding_latency))
+    model_factory = fake_model_factory(latency=args.latency)
+    index_started_at = time.perf_counter()
+    await warm_retriever()
+    results = {"index_s": round(time.perf_counter() - index_started_at, 2)}
+
+    if "graph" in args.mode:
+        assistant = PortfolioAssistant(model_factory=model_factory)
+
+        async def send_graph(question: str):
+            await assistant.chat(user_input=question, history=[])
+
+        await send_graph(QUESTIONS[0])  # warm-up
+        for concurrency in args.concurrency:
+            results[f"graph/c={concurrency}"] = await _run_level(send_graph, concurrency, args.requests)
+
+    if "http" in args.mode:
+        import httpx
+        from app import main
+
+        # The app builds its own assistant in the lifespan, with the fake models injected here
+        main.PortfolioAssistant = functools.partial(PortfolioAssistant, model_factory=model_factory)
+        # All requests come from one client address, the daily limit would reject them
+        main.limiter.enabled = False
+        async with main.app.router.lifespan_context(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+
+                async def send_http(question: str):
+                    response = await client.post("/chat", json={"message": question})
+                    response.raise_for_status()
+
+                await send_http(QUESTIONS[0])  # warm-up
+                for concurrency in args.concurrency:
+                    results[f"http/c={concurrency}"] = await _run_level(send_http, concurrency, args.requests)
+
+    return results
+
+
+def run_corpus(files: int, args) -> dict:
+    from benchmarks.bench_startup import write_corpus
+
+    workdir = tempfile.mkdtemp(prefix=f"bench_e2e_{files}_")
+    write_corpus(workdir, files)
+    backend_dir = os.path.dirname(BENCHMARK_DIR)
+    env = {
+        **os.environ,
+        "PYTHONPATH": backend_dir,
+        # Keeps the fake questions out of the real review log
+        "QUESTION_DB_PATH": os.path.join(workdir, "data", "questions", "unanswered_questions.db"),
+        # Every chat should run the whole graph
+        "SEMANTIC_CACHE_ENABLED": "False",
+        "RAG_WARMUP_MODE": "blocking",
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+        # The app validates its model and mail configuration on import
+        "OPENROUTER_API_KEY": os.getenv("OPENROUTER_API_KEY", "benchmark"),
+        "MAIL_USERNAME": os.getenv("MAIL_USERNAME", "benchmark"),
+        "MAIL_PASSWORD": os.getenv("MAIL_PASSWORD", "benchmark"),
+        "MAIL_FROM": os.getenv("MAIL_FROM", "benchmark@example.com"),
+    }
+    command = [
+        sys.executable, "-m", "benchmarks.bench_e2e", "--child",
+        "--mode", *args.mode,
+        "--concurrency", *map(str, args.concurrency),
+        "--requests", str(args.requests),
+        "--latency", str(args.latency),
+        "--embedding-latency", str(args.embedding_latency),
+    ]
+    output = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_report(results: dict):
+    for key, result in results.items():
+        if key.endswith("index_s"):
+            print(f"{key.split('/')[0]}: index built in {result}s")
+    print(f"{'run':<26}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'RSS MB':>9}  mean ms per node")
+    for key, result in results.items():
+        if not isinstance(result, dict) or "p50_ms" not in result:
+            continue
+        stages = " ".join(f"{node}={ms}" for node, ms in result["stages_ms"].items())
+        print(f"{key:<26}{result['p50_ms']:>9}{result['p95_ms']:>9}{result['p99_ms']:>9}"
+              f"{result['throughput_rps']:>9}{result['peak_rss_mb']:>9}  {stages}")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Returns a line for every run that is slower than its baseline by more than `tolerance`."""
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if not isinstance(result, dict) or "p95_ms" not in result or not isinstance(reference, dict):
+            continue
+        if result["p95_ms"] > reference["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {result['p95_ms']} ms, baseline {reference['p95_ms']} ms")
+        if result["throughput_rps"] < reference["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{key}: {result['throughput_rps']} req/s, baseline {reference['throughput_rps']} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--files", type=int, nargs="+", default=[10, 200], help="Corpus sizes in data/source")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64, help="Chats per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per LLM call")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="Simulated seconds per embedding request")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression for --compare")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_measure_child(args))))
+        return
+
+    results = {"settings": {
+        "latency": args.latency, "embedding_latency": args.embedding_latency, "requests": args.requests,
+    }}
+    for files in args.files:
+        for key, result in run_corpus(files, args).items():
+            results[f"files={files}/{key}"] = result
+    print_report(results)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("settings") != results["settings"]:
+            print(f"warning: baseline settings {baseline.get('settings')} differ from {results['settings']}")
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# bench_email.py
+"""
+Contact form delivery against a local stand-in SMTP server (aiosmtpd, install it
+with `pip install aiosmtpd`). The server adds --latency seconds to every EHLO and
+DATA, like a remote provider's handshake and acceptance.
+
+1. Response time of /submit-contact with the background dispatcher, compared with
+   sending both emails inline through a fresh FastMail connection each (the old path),
+   plus the time until all queued emails were delivered over the pooled connections.
+2. Outbox recovery: with the SMTP server down, a submission is queued, the dispatcher
+   is stopped (a restart) and started again once the server is back; the email must
+   still be delivered.
+
+Usage: python -m benchmarks.bench_email --submissions 20 --latency 0.2
+"""
+import os
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _configure(port: int):
+    os.environ.update({
+        "MAIL_SERVER": "127.0.0.1",
+        "MAIL_PORT": str(port),
+        "MAIL_STARTTLS": "False",
+        "MAIL_SSL_TLS": "False",
+        "MAIL_USE_CREDENTIALS": "False",
+        "MAIL_VALIDATE_CERTS": "False",
+        "MAIL_USERNAME": "bench",
+        "MAIL_PASSWORD": "bench",
+        "MAIL_FROM": "portfolio@example.com",
+        "MAIL_TO": "owner@example.com",
+        "MAIL_OUTBOX_PATH": os.path.join(tempfile.mkdtemp(prefix="bench_email_"), "outbox.db"),
+        "MAIL_RETRY_BASE_SECONDS": "0.2",
+    })
+
+
+class SlowHandler:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.received = []
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.latency)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.latency)
+        self.received.append(envelope.rcpt_tos)
+        return "250 Message accepted for delivery"
+
+
+def _form(i: int) -> dict:
+    return {"name": f"Visitor {i}", "email": f"visitor{i}@example.com", "message": "I would like to talk about a project."}
+
+
+async def _wait_for(condition, timeout: float = 30) -> float:
+    started_at = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - started_at > timeout:
+            raise TimeoutError("Emails were not delivered in time")
+        await asyncio.sleep(0.01)
+    return time.perf_counter() - started_at
+
+
+async def bench_inline(submissions: int) -> list:
+    from fastapi_mail import FastMail, MessageSchema, MessageType
+    from app.email_api import conf, MAIL_TO
+
+    latencies = []
+    for i in range(submissions):
+        form = _form(i)
+        started_at = time.perf_counter()
+        for recipients in ([MAIL_TO], [form["email"]]):
+            await FastMail(conf).send_message(
+                MessageSchema(subject="Inline", recipients=recipients, body=form["message"], subtype=MessageType.plain)
+            )
+        latencies.append(time.perf_counter() - started_at)
+    return latencies
+
+
+async def bench_dispatcher(client, dispatcher, handler, submissions: int) -> tuple:
+    received_before = len(handler.received)
+    latencies = []
+    started_at = time.perf_counter()
+    for i in range(submissions):
+        request_started_at = time.perf_counter()
+        response = await client.post("/submit-contact", json=_form(i))
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - request_started_at)
+    await _wait_for(lambda: len(handler.received) - received_before >= 2 * submissions)
+    return latencies, time.perf_counter() - started_at
+
+
+async def check_outbox_recovery(client, email_api, port: int, latency: float):
+    from aiosmtpd.controller import Controller
+
+    # SMTP server down: the submission is accepted and stays in the outbox
+    response = await client.post("/submit-contact", json=_form(999))
+    response.raise_for_status()
+    await asyncio.sleep(0.1)
+    await email_api.email_dispatcher.aclose()
+
+    handler = SlowHandler(latency)
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        restarted = email_api.EmailDispatcher(email_api.conf)
+        await restarted.start()
+        seconds = await _wait_for(lambda: len(handler.received) >= 2)
+        await restarted.aclose()
+        print(f"outbox recovery: {len(handler.received)} emails delivered {seconds:.2f}s after the restart")
+    finally:
+        controller.stop()
+
+
+async def main(args):
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError as e:
+        raise SystemExit("This benchmark needs the stand-in SMTP server: pip install aiosmtpd") from e
+
+    port = _free_port()
+    _configure(port)
+    import httpx
+    from fastapi import FastAPI
+    from app import email_api
+
+    app = FastAPI()
+    app.include_router(email_api.router)
+
+    handler = SlowHandler(args.latency)
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    await email_api.email_dispatcher.start()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        try:
+            inline = await bench_inline(args.submissions)
+            queued, delivered_seconds = await bench_dispatcher(client, email_api.email_dispatcher, handler, args.submissions)
+        finally:
+            controller.stop()
+
+        print(f"{args.submissions} submissions, SMTP latency {args.latency}s per EHLO/DATA")
+        print(f"{'path':<26}{'p50 ms':>10}{'max ms':>10}")
+        for name, latencies in [("inline FastMail", inline), ("queued (dispatcher)", queued)]:
+            print(f"{name:<26}{statistics.median(latencies) * 1000:>10.1f}{max(latencies) * 1000:>10.1f}")
+        print(f"dispatcher delivered {2 * args.submissions} emails in {delivered_seconds:.2f}s, "
+              f"stats: {email_api.email_dispatcher.stats()}")
+
+        await check_outbox_recovery(client, email_api, port, args.latency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--submissions", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,211 @@
+# bench_embedding.py
+"""
+Index builds against a local fake OpenAI-compatible embedding server (real OpenAIEmbeddings
+client and embedding cache, synthetic markdown corpus of --files files). The server adds
+--latency per request and can reject requests with 429 or fail permanently.
+
+1. Build time and chunks/s with 1 (sequential batches) and more requests in flight, with the
+   peak number of requests the server saw at once.
+2. A flaky server rejecting --failure-rate of the requests: every chunk is still indexed.
+3. Resume: the server fails permanently after half of the requests, the build stops; a second
+   build against a healthy server only embeds the chunks that were not finished.
+
+Usage: python -m benchmarks.bench_embedding --files 400 --latency 0.2 --batch-size 64
+"""
+import os
+import json
+import time
+import base64
+import random
+import hashlib
+import argparse
+import tempfile
+import threading
+import functools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from benchmarks.bench_startup import write_corpus
+
+DIMENSIONS = 64
+
+
+class FakeEmbeddingServer:
+    """Serves POST /v1/embeddings with hash vectors on a background thread."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.failure_rate = 0.0
+        # After this many requests every request fails with 503
+        self.fail_after = None
+        self.requests = 0
+        self.texts = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler(), bind_and_activate=False)
+        self._server.daemon_threads = True
+        # The default listen backlog of 5 drops connections of a burst (retried after 1s)
+        self._server.request_queue_size = 256
+        self._server.server_bind()
+        self._server.server_activate()
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def reset(self, failure_rate: float = 0.0, fail_after=None):
+        with self._lock:
+            self.failure_rate, self.fail_after = failure_rate, fail_after
+            self.requests = self.texts = self.peak_in_flight = 0
+
+    def close(self):
+        self._server.shutdown()
+
+    def respond(self, body: dict) -> tuple[int, dict]:
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            failed = self.fail_after is not None and self.requests > self.fail_after
+            rejected = random.random() < self.failure_rate
+        try:
+            time.sleep(self.latency)
+            if failed:
+                return 503, {"error": {"message": "Service unavailable", "type": "server_error"}}
+            if rejected:
+                return 429, {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}}
+            texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            with self._lock:
+                self.texts += len(texts)
+            data = []
+            for i, text in enumerate(texts):
+                seed = int.from_bytes(hashlib.sha256(str(text).encode()).digest()[:4], "little")
+                vector = np.random.default_rng(seed).standard_normal(DIMENSIONS).astype(np.float32)
+                if body.get("encoding_format") == "base64":
+                    embedding = base64.b64encode(vector.tobytes()).decode()
+                else:
+                    embedding = vector.tolist()
+                data.append({"object": "embedding", "index": i, "embedding": embedding})
+            return 200, {"object": "list", "data": data, "model": body.get("model"),
+                         "usage": {"prompt_tokens": len(texts), "total_tokens": len(texts)}}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                status, response = fake.respond(body)
+                payload = json.dumps(response).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def build(server: FakeEmbeddingServer, args, max_in_flight: int, max_attempts: int = 5) -> dict:
+    """Builds (or resumes) the index in the current directory. Returns the outcome and counters."""
+    from langchain_openai import OpenAIEmbeddings
+    from portfolio_assistant.core.config import OPENROUTER_EMBEDDING_MODEL
+    from portfolio_assistant.tools import rag
+    from portfolio_assistant.tools.embedding_cache import CachedEmbeddings
+    from portfolio_assistant.tools.batch_embedding import BatchEmbedder
+
+    rag.set_embeddings(CachedEmbeddings(
+        # No retries in the client, so the retries of the batch embedder are visible;
+        # no tokenizer download for the context length check
+        OpenAIEmbeddings(model=OPENROUTER_EMBEDDING_MODEL, base_url=server.url, api_key="benchmark",
+                         check_embedding_ctx_length=False, max_retries=0),
+        model_name=OPENROUTER_EMBEDDING_MODEL,
+        db_path=rag.EMBEDDING_CACHE_FILE,
+    ))
+    rag.INGEST_BATCH_SIZE = args.batch_size
+    rag.BatchEmbedder = functools.partial(
+        BatchEmbedder, max_in_flight=max_in_flight, max_attempts=max_attempts, retry_base_seconds=0.05
+    )
+    started_at = time.perf_counter()
+    try:
+        vectorstore = rag.open_vectorstore()
+        error = None
+    except Exception as e:
+        vectorstore = rag.Chroma(persist_directory=rag.PERSIST_DIRECTORY, embedding_function=rag.get_embeddings())
+        error = type(e).__name__
+    seconds = time.perf_counter() - started_at
+    manifest = rag.load_manifest() or {"files": {}}
+    return {
+        "seconds": seconds,
+        "error": error,
+        "chunks_stored": len(vectorstore.get(include=[])["ids"]),
+        "files_done": sum(entry["hash"] is not None for entry in manifest["files"].values()),
+    }
+
+
+def fresh_workdir(files: int):
+    from chromadb.api.client import SharedSystemClient
+
+    # Chroma keeps one client per persist path, and the relative path is the same in every run
+    SharedSystemClient.clear_system_cache()
+    workdir = tempfile.mkdtemp(prefix="bench_embedding_")
+    write_corpus(workdir, files)
+    os.chdir(workdir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per embedding request")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--in-flight", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--failure-rate", type=float, default=0.2)
+    args = parser.parse_args()
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    server = FakeEmbeddingServer(latency=args.latency)
+    print(f"{'run':<26}{'seconds':>9}{'chunks/s':>10}{'requests':>10}{'peak':>6}{'chunks':>8}")
+
+    def row(name: str, result: dict):
+        print(f"{name:<26}{result['seconds']:>9.2f}{server.texts / result['seconds']:>10.0f}"
+              f"{server.requests:>10}{server.peak_in_flight:>6}{result['chunks_stored']:>8}"
+              + (f"  stopped: {result['error']}" if result["error"] else ""))
+
+    try:
+        for max_in_flight in args.in_flight:
+            fresh_workdir(args.files)
+            server.reset()
+            row(f"{max_in_flight} in flight", build(server, args, max_in_flight))
+        full_build_requests = server.requests
+
+        fresh_workdir(args.files)
+        server.reset(failure_rate=args.failure_rate)
+        row(f"{args.failure_rate:.0%} rejected, 4 in flight", build(server, args, 4, max_attempts=8))
+
+        fresh_workdir(args.files)
+        server.reset(fail_after=full_build_requests // 2)
+        first = build(server, args, 4, max_attempts=2)
+        row("interrupted", first)
+        print(f"  {first['files_done']}/{args.files} files finished, {server.texts} texts embedded")
+        server.reset()
+        second = build(server, args, 4)
+        row("resumed", second)
+        print(f"  {second['files_done']}/{args.files} files finished, {server.texts} of {second['chunks_stored']} "
+              f"chunks sent to the server again")
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# bench_embedding_backends.py
+"""
+Local vs. remote embeddings: query latency (single queries, then --burst concurrent ones)
+and the time to build the index of a synthetic corpus (--files markdown files).
+
+- remote: the OpenAI client against the fake embedding server of bench_embedding, which
+  adds --remote-latency per request (roughly a provider round-trip)
+- onnx: the in-process CPU model (LOCAL_EMBEDDING_MODEL, a Hugging Face repo that is
+  downloaded once, or a local directory); the burst is run with and without query batching
+- ollama: with --ollama, OLLAMA_EMBEDDING_MODEL on the local Ollama server
+
+Usage: python -m benchmarks.bench_embedding_backends --files 200 --queries 50 --burst 32
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+from benchmarks.bench_startup import write_corpus
+from benchmarks.bench_embedding import FakeEmbeddingServer
+
+QUERIES = [
+    "Which programming languages does he use?", "What did he work on at Hensoldt?",
+    "Tell me about his master's thesis", "Does he have experience with sensor fusion?",
+    "Which deep learning frameworks does he know?", "What is his tech stack?",
+]
+
+
+def query(i: int) -> str:
+    # Distinct texts, so no layer below can answer from a cache
+    return f"{QUERIES[i % len(QUERIES)]} ({i})"
+
+
+def percentile(values: list, p: int) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1] if len(values) > 1 else values[0]
+
+
+def query_latency(embeddings, queries: int) -> dict:
+    latencies = []
+    for i in range(queries):
+        started_at = time.perf_counter()
+        embeddings.embed_query(query(i))
+        latencies.append((time.perf_counter() - started_at) * 1000)
+    return {"p50_ms": percentile(latencies, 50), "p95_ms": percentile(latencies, 95)}
+
+
+def burst(embeddings, size: int) -> float:
+    async def run():
+        started_at = time.perf_counter()
+        await asyncio.gather(*[embeddings.aembed_query(query(1000 + i)) for i in range(size)])
+        return (time.perf_counter() - started_at) * 1000
+    return asyncio.run(run())
+
+
+def build_index(embeddings, model_name: str, files: int) -> float:
+    from chromadb.api.client import SharedSystemClient
+    from portfolio_assistant.tools import rag
+    from portfolio_assistant.tools.embedding_cache import CachedEmbeddings
+
+    SharedSystemClient.clear_system_cache()
+    workdir = tempfile.mkdtemp(prefix="bench_embedding_backends_")
+    write_corpus(workdir, files)
+    os.chdir(workdir)
+    rag.set_embeddings(CachedEmbeddings(embeddings, model_name=model_name, db_path=rag.EMBEDDING_CACHE_FILE))
+    started_at = time.perf_counter()
+    rag.open_vectorstore()
+    return time.perf_counter() - started_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--burst", type=int, default=32, help="Concurrent queries")
+    parser.add_argument("--remote-latency", type=float, default=0.15, help="Seconds per remote request")
+    parser.add_argument("--ollama", action="store_true", help="Also measure Ollama embeddings")
+    args = parser.parse_args()
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from langchain_openai import OpenAIEmbeddings
+    from portfolio_assistant.core import config
+    from portfolio_assistant.tools.local_embeddings import BatchedQueryEmbeddings, OnnxEmbeddings
+
+    server = FakeEmbeddingServer(latency=args.remote_latency)
+    backends = [("remote", lambda: OpenAIEmbeddings(
+        model=config.OPENROUTER_EMBEDDING_MODEL, base_url=server.url, api_key="benchmark",
+        check_embedding_ctx_length=False,
+    ))]
+    backends.append(("onnx", lambda: OnnxEmbeddings(
+        config.LOCAL_EMBEDDING_MODEL, config.LOCAL_EMBEDDING_ONNX_FILE, threads=config.LOCAL_EMBEDDING_THREADS
+    )))
+    if args.ollama:
+        from langchain_ollama import OllamaEmbeddings
+        backends.append(("ollama", lambda: OllamaEmbeddings(model=config.OLLAMA_EMBEDDING_MODEL)))
+
+    print(f"{'backend':<10}{'load s':>8}{'p50 ms':>9}{'p95 ms':>9}{f'burst {args.burst} ms':>14}"
+          f"{'batched ms':>12}{'index s':>9}")
+    try:
+        for name, create in backends:
+            try:
+                started_at = time.perf_counter()
+                embeddings = create()
+                load_seconds = time.perf_counter() - started_at
+                latency = query_latency(embeddings, args.queries)
+            except Exception as e:
+                print(f"{name:<10}skipped: {type(e).__name__}: {e}")
+                continue
+            unbatched = burst(embeddings, args.burst)
+            batched = burst(BatchedQueryEmbeddings(embeddings), args.burst) if name != "remote" else None
+            index_seconds = build_index(embeddings, f"bench:{name}", args.files)
+            print(f"{name:<10}{load_seconds:>8.2f}{latency['p50_ms']:>9.1f}{latency['p95_ms']:>9.1f}"
+                  f"{unbatched:>14.0f}{f'{batched:.0f}' if batched is not None else '-':>12}{index_seconds:>9.2f}")
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# bench_grading.py
+"""
+Compares the local relevance gate with the LLM grader. Labelled questions from
+bench_retrieval are expected to grade 'good' whenever the relevant chunk was
+retrieved, off-topic questions are expected to grade 'bad'. Reports agreement
+and latency of the local grader, and with --llm also of the configured grader
+LLM and the agreement between both.
+
+Usage: python -m benchmarks.bench_grading --embeddings provider --llm
+"""
+import os
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+from benchmarks.bench_retrieval import DEFAULT_CORPUS, DEFAULT_LABELS, is_relevant
+
+OFF_TOPIC_QUESTIONS = [
+    "What is his favourite pizza?",
+    "Does he own a dog?",
+    "What is the capital of Australia?",
+    "Which football club does he support?",
+    "How tall is he?",
+    "What is his salary expectation in dollars?",
+    "Has he ever climbed Mount Everest?",
+    "What car does he drive?",
+]
+
+
+def _summary(name: str, decisions: list, expected: list, latencies: list):
+    decided = [(d, e) for d, e in zip(decisions, expected) if d is not None]
+    agreement = sum(d == e for d, e in decided) / len(decided) if decided else 0.0
+    print(
+        f"{name:>16} {agreement:>10.2f} {len(decided) / len(decisions):>9.2f} "
+        f"{statistics.median(latencies):>9.2f} {max(latencies):>9.2f}"
+    )
+
+
+async def main(args):
+    with open(DEFAULT_LABELS) as f:
+        labels = json.load(f)
+
+    workdir = tempfile.mkdtemp(prefix="bench_grading_")
+    shutil.copytree(os.path.abspath(DEFAULT_CORPUS), os.path.join(workdir, "data", "source"))
+    os.chdir(workdir)
+    # Keeps the fake questions out of the real review log
+    os.environ["QUESTION_DB_PATH"] = os.path.abspath(os.path.join("data", "questions", "unanswered_questions.db"))
+
+    from portfolio_assistant.tools import rag
+    from portfolio_assistant.core import config
+    from portfolio_assistant.core.grading import LocalGrader
+    if args.embeddings == "fake":
+        from benchmarks.fakes import FakeEmbeddings
+        rag.set_embeddings(FakeEmbeddings())
+    retriever = rag.create_retriever(rag.open_vectorstore(), "hybrid")
+
+    cases = []
+    for label in labels:
+        docs = await retriever.ainvoke(label["question"])
+        cases.append((label["question"], docs, "good" if any(is_relevant(d, label) for d in docs) else "bad"))
+    for question in OFF_TOPIC_QUESTIONS:
+        cases.append((question, await retriever.ainvoke(question), "bad"))
+    expected = [grade for _, _, grade in cases]
+
+    grader = LocalGrader(
+        embeddings=rag.get_embeddings(),
+        good_threshold=config.GRADER_GOOD_THRESHOLD,
+        bad_threshold=config.GRADER_BAD_THRESHOLD,
+        cross_encoder_model=config.GRADER_CROSS_ENCODER_MODEL,
+    )
+    local_decisions, local_latencies = [], []
+    for question, docs, _ in cases:
+        started_at = time.perf_counter()
+        score = await grader.ascore(question, [doc.page_content for doc in docs])
+        local_latencies.append((time.perf_counter() - started_at) * 1000)
+        local_decisions.append(grader.decide(score))
+
+    print(f"\n{len(cases)} cases, embeddings: {args.embeddings}")
+    print(f"{'grader':>16} {'agreement':>10} {'decided':>9} {'p50 [ms]':>9} {'max [ms]':>9}")
+    _summary("local", local_decisions, expected, local_latencies)
+
+    if args.llm:
+        from portfolio_assistant.core.assistant import PortfolioAssistant
+        assistant = PortfolioAssistant(dev_mode=os.getenv("APP_ENV") == "dev")
+        llm_decisions, llm_latencies = [], []
+        for question, docs, _ in cases:
+            started_at = time.perf_counter()
+            llm_decisions.append(await assistant._llm_grade(question, "\n\n".join(d.page_content for d in docs)))
+            llm_latencies.append((time.perf_counter() - started_at) * 1000)
+        _summary("llm", llm_decisions, expected, llm_latencies)
+        _summary("local vs llm", local_decisions, llm_decisions, local_latencies)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--embeddings", choices=["fake", "provider"], default="fake")
+    parser.add_argument("--llm", action="store_true", help="Also run the configured grader LLM (network)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,159 @@
+# bench_ingestion.py
+"""
+Ingestion throughput on a synthetic corpus of --pdfs generated PDFs (--pages pages each,
+with headings, bold subheadings, paragraphs and bullet lists) plus markdown files.
+
+1. Parsing and splitting, in pages/s: the previous loader (PyPDFLoader and a plain
+   recursive split, one file at a time), then the structure-aware parser run
+   sequentially and with --workers processes. The report also shows how many PDF chunks
+   carry Header1/Header2 metadata.
+2. Building the whole index (fake embeddings) with update_vectorstore, which embeds new
+   chunks in batches while files are still being parsed.
+
+Usage: python -m benchmarks.bench_ingestion --pdfs 200 --pages 10 --workers 4
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+
+from benchmarks.bench_startup import write_corpus
+
+WORDS = "sensor fusion radar tracking embedded C++ Python pipeline latency calibration thesis".split()
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: list):
+    """Writes a minimal PDF; every page is a list of (bold, font size, text) lines."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, written once the page ids are known
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for lines in pages:
+        y, stream = 800, []
+        for bold, size, text in lines:
+            y -= size * 1.6
+            stream.append(f"BT /{'F2' if bold else 'F1'} {size} Tf 50 {y:.0f} Td ({_escape(text)}) Tj ET")
+        content = "\n".join(stream)
+        objects.append(f"<< /Length {len(content.encode('cp1252'))} >>\nstream\n{content}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Contents {len(objects)} 0 R "
+            "/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>"
+        )
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("cp1252")
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode()
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(output)
+
+
+def _sentence(seed: int) -> str:
+    return " ".join(WORDS[(seed * 7 + i * 3) % len(WORDS)] for i in range(12)) + "."
+
+
+def synthetic_pages(doc: int, pages: int) -> list:
+    result = []
+    for page in range(pages):
+        lines = [(True, 20, f"Project Report {doc}")] if page == 0 else []
+        lines += [(False, 15, f"Section {page}: Results of phase {page}")]
+        for paragraph in range(3):
+            lines += [(False, 10, _sentence(doc + page + paragraph + i)) for i in range(4)]
+        lines += [(True, 10, f"Key findings {page}")]
+        lines += [(False, 10, f"• Finding {i}: {_sentence(doc * page + i)}") for i in range(3)]
+        lines += [(False, 9, str(page + 1))]
+        result.append(lines)
+    return result
+
+
+def write_pdf_corpus(directory: str, pdfs: int, pages: int):
+    source_dir = os.path.join(directory, "data", "source")
+    os.makedirs(source_dir, exist_ok=True)
+    for i in range(pdfs):
+        write_pdf(os.path.join(source_dir, f"report_{i}.pdf"), synthetic_pages(i, pages))
+
+
+def old_loader(paths: list) -> tuple:
+    from langchain_community.document_loaders import PyPDFLoader, TextLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    chunks, pages = 0, 0
+    for path in paths:
+        docs = PyPDFLoader(path).load() if path.endswith(".pdf") else TextLoader(path).load()
+        pages += len(docs)
+        chunks += len(splitter.split_documents(docs))
+    return chunks, pages, 0.0, 0.0
+
+
+def new_parser(paths: list, workers: int) -> tuple:
+    from portfolio_assistant.tools.ingestion import iter_parsed_files
+
+    chunks, pages, pdf_chunks, with_h1, with_h2 = 0, 0, 0, 0, 0
+    for parsed in iter_parsed_files(paths, workers=workers):
+        chunks += len(parsed.splits)
+        pages += parsed.pages
+        if parsed.path.endswith(".pdf"):
+            pdf_chunks += len(parsed.splits)
+            with_h1 += sum("Header1" in split.metadata for split in parsed.splits)
+            with_h2 += sum("Header2" in split.metadata for split in parsed.splits)
+    return chunks, pages, with_h1 / max(pdf_chunks, 1), with_h2 / max(pdf_chunks, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdfs", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=10, help="Pages per PDF")
+    parser.add_argument("--markdown", type=int, default=50, help="Markdown files in the corpus")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_ingestion_")
+    write_pdf_corpus(workdir, args.pdfs, args.pages)
+    write_corpus(workdir, args.markdown)
+    os.chdir(workdir)
+
+    from portfolio_assistant.tools import rag
+
+    paths = rag._list_source_files()
+    print(f"{len(paths)} files, {os.cpu_count()} CPUs")
+    print(f"{'parser':<28}{'seconds':>9}{'pages/s':>10}{'chunks':>8}{'PDF H1':>8}{'PDF H2':>8}")
+    runs = [("PyPDFLoader, sequential", lambda: old_loader(paths)),
+            ("structured, sequential", lambda: new_parser(paths, workers=0)),
+            (f"structured, {args.workers} workers", lambda: new_parser(paths, workers=args.workers))]
+    for name, run in runs:
+        started_at = time.perf_counter()
+        chunks, pages, h1, h2 = run()
+        seconds = time.perf_counter() - started_at
+        print(f"{name:<28}{seconds:>9.2f}{pages / seconds:>10.0f}{chunks:>8}{h1:>8.0%}{h2:>8.0%}")
+
+    from benchmarks.fakes import FakeEmbeddings
+    rag.set_embeddings(FakeEmbeddings())
+    shutil.rmtree(rag.PERSIST_DIRECTORY, ignore_errors=True)
+    started_at = time.perf_counter()
+    rag.open_vectorstore()
+    seconds = time.perf_counter() - started_at
+    report, _ = rag.scan_source_changes(rag.load_manifest())
+    total_pages = args.pdfs * args.pages + args.markdown
+    print(f"full index (fake embeddings, batches of {rag.INGEST_BATCH_SIZE}): {seconds:.2f}s, "
+          f"{total_pages / seconds:.0f} pages/s, {len(report.unchanged)} files indexed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# bench_instrumentation.py
+"""
+Microbenchmark of the metrics instrumentation: the cost a node wrapper adds to every
+graph node call and the LLM metrics callback adds to every model call, compared with
+the uninstrumented calls. A fake chat model without latency makes the callback cost
+visible against LangChain's own per-call overhead. Inside a graph run LangGraph always
+attaches callback handlers of its own, so the model call is measured both standalone
+and with such a handler present.
+
+Usage: python -m benchmarks.bench_instrumentation --iterations 20000
+"""
+import time
+import asyncio
+import argparse
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import HumanMessage
+
+from benchmarks.fakes import FakeChatModel
+from portfolio_assistant.utils.metrics import instrument_llm, timed_node
+
+
+async def _per_call_seconds(call, iterations: int) -> float:
+    for _ in range(min(iterations // 10, 500)):
+        await call()
+    started_at = time.perf_counter()
+    for _ in range(iterations):
+        await call()
+    return (time.perf_counter() - started_at) / iterations
+
+
+async def node(state):
+    return {"messages": []}
+
+
+class GraphRunHandler(BaseCallbackHandler):
+    """Stands in for the handlers LangGraph attaches to every run."""
+    run_inline = True
+
+
+async def main(iterations: int):
+    wrapped = timed_node("bench", node)
+    state = {"messages": []}
+    node_raw = await _per_call_seconds(lambda: node(state), iterations)
+    node_timed = await _per_call_seconds(lambda: wrapped(state), iterations)
+
+    model = FakeChatModel(latency=0)
+    instrumented = instrument_llm(FakeChatModel(latency=0), "bench")
+    messages = [HumanMessage(content="What is his tech stack?")]
+    llm_iterations = max(iterations // 10, 100)
+    llm_raw = await _per_call_seconds(lambda: model.ainvoke(messages), llm_iterations)
+    llm_instrumented = await _per_call_seconds(lambda: instrumented.ainvoke(messages), llm_iterations)
+    in_run = {"callbacks": [GraphRunHandler()]}
+    llm_run_raw = await _per_call_seconds(lambda: model.ainvoke(messages, in_run), llm_iterations)
+    llm_run_instrumented = await _per_call_seconds(lambda: instrumented.ainvoke(messages, in_run), llm_iterations)
+
+    print(f"{'call':<30}{'plain us':>10}{'instr. us':>11}{'overhead us':>13}")
+    for name, raw, timed in [
+        ("graph node", node_raw, node_timed),
+        ("LLM call, standalone", llm_raw, llm_instrumented),
+        ("LLM call, inside a graph run", llm_run_raw, llm_run_instrumented),
+    ]:
+        print(f"{name:<30}{raw * 1e6:>10.2f}{timed * 1e6:>11.2f}{(timed - raw) * 1e6:>13.2f}")
+
+    # A search turn runs up to 6 nodes and 3 LLM calls
+    turn_overhead = 6 * (node_timed - node_raw) + 3 * (llm_run_instrumented - llm_run_raw)
+    print(f"estimated overhead per search turn: {turn_overhead * 1e6:.0f} us "
+          f"({turn_overhead * 100:.3f}% of a 1 s turn)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    asyncio.run(main(parser.parse_args().iterations))
@@ -0,0 +1,110 @@
+# bench_question_log.py
+"""
+Write-throughput benchmark for the unanswered-question log. Compares the
+per-call path (one connection and one commit per question, run in the thread
+pool) with the batched UnansweredQuestionWriter, for N concurrent "requests"
+that log a question each. A share of the questions repeats, like bot traffic
+asking the same thing, and is merged into counted rows.
+
+Usage: python -m benchmarks.bench_question_log --questions 2000 --concurrency 64 --repeat-ratio 0.5
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+import datetime
+import tempfile
+
+from portfolio_assistant.tools.db_manager import (
+    UnansweredQuestionWriter,
+    connect,
+    insert_unanswered_question,
+    setup_database,
+)
+
+
+def make_questions(count: int, repeat_ratio: float) -> list:
+    rng = random.Random(0)
+    questions = []
+    for i in range(count):
+        if questions and rng.random() < repeat_ratio:
+            # Same question, different casing and punctuation
+            questions.append(rng.choice(questions[:50]).upper().rstrip("?") + " ?")
+        else:
+            questions.append(f"What did he do in project number {i}?")
+    return questions
+
+
+async def _run_concurrently(questions: list, concurrency: int, log_one) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request(question):
+        async with semaphore:
+            await log_one(question)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*[request(question) for question in questions])
+    return time.perf_counter() - started_at
+
+
+async def bench_per_call(db_path: str, questions: list, concurrency: int) -> float:
+    setup_database(db_path)
+
+    async def log_one(question):
+        timestamp = datetime.datetime.now().isoformat()
+        await asyncio.to_thread(insert_unanswered_question, question, "bench", timestamp, db_path)
+
+    return await _run_concurrently(questions, concurrency, log_one)
+
+
+async def bench_writer(db_path: str, questions: list, concurrency: int, batch_size: int) -> tuple:
+    writer = UnansweredQuestionWriter(db_path, batch_size=batch_size, flush_interval_seconds=0.05)
+    await writer.start()
+
+    async def log_one(question):
+        writer.enqueue(question, "bench", datetime.datetime.now().isoformat())
+
+    enqueue_seconds = await _run_concurrently(questions, concurrency, log_one)
+    started_at = time.perf_counter()
+    await writer.aclose()
+    return enqueue_seconds, enqueue_seconds + time.perf_counter() - started_at, writer.stats()
+
+
+def count_rows(db_path: str) -> tuple:
+    conn = connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*), SUM(ask_count) FROM unanswered_questions").fetchone()
+    finally:
+        conn.close()
+
+
+async def main(args):
+    questions = make_questions(args.questions, args.repeat_ratio)
+    scratch = tempfile.mkdtemp(prefix="bench_question_log_")
+
+    per_call_db = os.path.join(scratch, "per_call.db")
+    per_call_seconds = await bench_per_call(per_call_db, questions, args.concurrency)
+
+    writer_db = os.path.join(scratch, "writer.db")
+    enqueue_seconds, writer_seconds, stats = await bench_writer(writer_db, questions, args.concurrency, args.batch_size)
+
+    print(f"{len(questions)} questions, concurrency {args.concurrency}, repeat ratio {args.repeat_ratio}")
+    print(f"{'path':<22}{'seconds':>10}{'questions/s':>14}{'rows':>8}{'asked':>8}")
+    for name, seconds, db_path in [
+        ("per-call connect", per_call_seconds, per_call_db),
+        ("batched writer", writer_seconds, writer_db),
+    ]:
+        rows, asked = count_rows(db_path)
+        print(f"{name:<22}{seconds:>10.3f}{len(questions) / seconds:>14.0f}{rows:>8}{asked:>8}")
+    print(f"request path of the batched writer (enqueue only): {enqueue_seconds * 1000:.1f} ms in total")
+    print(f"writer: {stats['batches']} transactions, {stats['rows_written']} row upserts, {stats['dropped']} dropped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--repeat-ratio", type=float, default=0.5)
+    parser.add_argument("--batch-size", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
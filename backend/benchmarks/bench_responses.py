@@ -0,0 +1,130 @@
+# bench_responses.py
+"""
+Bytes on the wire (response bodies) and response time of /chat, /chat/stream and /profile per content encoding
+(identity, gzip and, with the `brotli` package, br), plus the revalidation of /profile with
+If-None-Match. Runs the FastAPI app in-process with fake chat models and embeddings; the
+transfer column estimates the time the bytes take at --bandwidth-mbit.
+
+Usage: python -m benchmarks.bench_responses --requests 50 --files 50 --bandwidth-mbit 5
+"""
+import os
+import time
+import argparse
+import tempfile
+import functools
+import statistics
+
+from benchmarks.bench_startup import write_corpus
+
+ANSWER = (
+    "Michael is a **Software Engineer (M.Sc.)** who works mostly in **C++ and Python**. "
+    "At Hensoldt he developed real-time sensor fusion components for radar tracking, including "
+    "the calibration pipeline and latency-critical embedded modules. His master's thesis covered "
+    "deep learning based object detection for automotive perception. His stack includes:\n\n"
+    "- C++17/20, Python, CMake, Qt\n- PyTorch, OpenCV, ONNX Runtime\n- Docker, GitLab CI, Linux\n\n"
+    "He has worked on projects ranging from embedded real-time systems to computer vision "
+    "prototypes, and he is happy to talk about any of them in more detail via the contact form."
+)
+
+RESUME = """# Curriculum Vitae
+## Profile
+Experienced **Software Engineer** (M.Sc.) specializing in **C++ and Python** in the fields of
+**Embedded Systems**, **Real-Time Applications**, **Computer Vision** and **Sensor Fusion**.
+## Experience
+Hensoldt: development of **radar tracking** and **sensor fusion** components in **C++**.
+## Education
+M.Sc. thesis on **Deep Learning** for object detection.
+"""
+
+
+def write_sources(directory: str, files: int):
+    write_corpus(directory, files)
+    with open(os.path.join(directory, "data", "source", "resume.md"), "w") as f:
+        f.write(RESUME)
+
+
+async def measure(client, send, requests: int) -> dict:
+    times, sizes = [], []
+    for _ in range(requests):
+        started_at = time.perf_counter()
+        response = await send(client)
+        times.append((time.perf_counter() - started_at) * 1000)
+        sizes.append(response.num_bytes_downloaded)
+    return {"bytes": statistics.mean(sizes), "ms": statistics.median(times), "status": response.status_code}
+
+
+async def main(args):
+    import httpx
+    from benchmarks.fakes import FakeEmbeddings, fake_model_factory
+    from portfolio_assistant.tools.rag import set_embeddings
+    from portfolio_assistant.core.assistant import PortfolioAssistant
+    from app import main as app_main
+    from app.responses import brotli
+
+    set_embeddings(FakeEmbeddings())
+    app_main.PortfolioAssistant = functools.partial(
+        PortfolioAssistant, model_factory=fake_model_factory(latency=0.0, response=ANSWER)
+    )
+    # All requests come from one client address, the daily limit would reject them
+    app_main.limiter.enabled = False
+    encodings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+
+    async def chat(client):
+        return await client.post("/chat", json={"message": "What is his tech stack?"})
+
+    async def stream(client):
+        async with client.stream("POST", "/chat/stream", json={"message": "What is his tech stack?"}) as response:
+            await response.aread()
+        return response
+
+    async def profile(client):
+        return await client.get("/profile")
+
+    print(f"{'endpoint':<22}{'encoding':>9}{'body B':>9}{'ms':>8}{f'+ {args.bandwidth_mbit:g} Mbit/s ms':>18}")
+    async with app_main.app.router.lifespan_context(app_main.app):
+        transport = httpx.ASGITransport(app=app_main.app)
+        for name, send in [("POST /chat", chat), ("POST /chat/stream", stream), ("GET /profile", profile)]:
+            for encoding in encodings:
+                headers = {"Accept-Encoding": encoding}
+                async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+                    await send(client)  # warm-up
+                    result = await measure(client, send, args.requests)
+                transfer_ms = result["bytes"] * 8 / (args.bandwidth_mbit * 1e6) * 1000
+                print(f"{name:<22}{encoding:>9}{result['bytes']:>9.0f}{result['ms']:>8.2f}{result['ms'] + transfer_ms:>18.1f}")
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers={"Accept-Encoding": "gzip"}) as client:
+            etag = (await client.get("/profile")).headers["etag"]
+
+            async def revalidate(client):
+                return await client.get("/profile", headers={"If-None-Match": etag})
+
+            result = await measure(client, revalidate, args.requests)
+        print(f"{'GET /profile (304)':<22}{'gzip':>9}{result['bytes']:>9.0f}{result['ms']:>8.2f}"
+              f"{result['ms']:>18.1f}  status {result['status']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--bandwidth-mbit", type=float, default=5.0, help="Client bandwidth for the transfer estimate")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_responses_")
+    write_sources(workdir, args.files)
+    os.chdir(workdir)
+    # Keeps the fake questions out of the real review log
+    os.environ["QUESTION_DB_PATH"] = os.path.abspath(os.path.join("data", "questions", "unanswered_questions.db"))
+    # Every chat should run the graph, and the index is ready before the first request
+    os.environ.setdefault("SEMANTIC_CACHE_ENABLED", "False")
+    # The fake grader accepts any context; the local relevance gate would reject fake embeddings
+    os.environ.setdefault("GRADER_MODE", "llm")
+    os.environ.setdefault("RAG_WARMUP_MODE", "blocking")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # The app validates its model and mail configuration on import
+    for name, value in [("OPENROUTER_API_KEY", "benchmark"), ("MAIL_USERNAME", "benchmark"),
+                        ("MAIL_PASSWORD", "benchmark"), ("MAIL_FROM", "benchmark@example.com")]:
+        os.environ.setdefault(name, value)
+
+    import asyncio
+    asyncio.run(main(args))
@@ -0,0 +1,83 @@
+# bench_retrieval.py
+"""
+Offline retrieval-quality benchmark. Indexes a corpus (by default the project
+descriptions shipped with the frontend), runs labelled questions against the
+dense, bm25 and hybrid retrievers and reports recall@k and latency per mode.
+
+A question counts as recalled at k when one of the top k chunks comes from the
+expected file and contains the expected text.
+
+Usage: python -m benchmarks.bench_retrieval --embeddings fake
+       python -m benchmarks.bench_retrieval --embeddings provider --corpus data/source --labels my_labels.json
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(BENCHMARK_DIR, os.pardir, os.pardir, "frontend", "components", "Common")
+DEFAULT_LABELS = os.path.join(BENCHMARK_DIR, "data", "retrieval_labels.json")
+MODES = ["dense", "bm25", "hybrid"]
+
+
+def is_relevant(doc, label: dict) -> bool:
+    return doc.metadata.get("source_filename") == label["source_filename"] and label["contains"] in doc.page_content
+
+
+def evaluate(retriever, labels: list, ks: list) -> dict:
+    recalled = {k: 0 for k in ks}
+    latencies = []
+    for label in labels:
+        started_at = time.perf_counter()
+        docs = retriever.invoke(label["question"])
+        latencies.append((time.perf_counter() - started_at) * 1000)
+        for k in ks:
+            if any(is_relevant(doc, label) for doc in docs[:k]):
+                recalled[k] += 1
+    return {
+        "recall": {k: recalled[k] / len(labels) for k in ks},
+        "p50_ms": statistics.median(latencies),
+        "max_ms": max(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="Directory with markdown/text/pdf sources")
+    parser.add_argument("--labels", default=DEFAULT_LABELS, help="JSON list of {question, source_filename, contains}")
+    parser.add_argument("--embeddings", choices=["fake", "provider"], default="fake",
+                        help="'fake' uses hash embeddings (dense scores are meaningless), 'provider' the configured model")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    args = parser.parse_args()
+
+    with open(args.labels) as f:
+        labels = json.load(f)
+    corpus = os.path.abspath(args.corpus)
+
+    workdir = tempfile.mkdtemp(prefix="bench_retrieval_")
+    shutil.copytree(corpus, os.path.join(workdir, "data", "source"))
+    os.chdir(workdir)
+
+    from portfolio_assistant.tools import rag
+    if args.embeddings == "fake":
+        from benchmarks.fakes import FakeEmbeddings
+        rag.set_embeddings(FakeEmbeddings())
+
+    vectorstore = rag.open_vectorstore()
+    rag.RETRIEVAL_K = max(args.k)
+
+    header = f"{'mode':>8} " + " ".join(f"{'R@' + str(k):>6}" for k in args.k) + f" {'p50 [ms]':>9} {'max [ms]':>9}"
+    print(f"\n{len(labels)} labelled questions, embeddings: {args.embeddings}")
+    print(header)
+    for mode in MODES:
+        result = evaluate(rag.create_retriever(vectorstore, mode), labels, args.k)
+        recalls = " ".join(f"{result['recall'][k]:>6.2f}" for k in args.k)
+        print(f"{mode:>8} {recalls} {result['p50_ms']:>9.2f} {result['max_ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
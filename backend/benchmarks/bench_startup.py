@@ -0,0 +1,94 @@
+# bench_startup.py
+"""
+Measures server startup for each RAG warm-up mode on a synthetic corpus with a
+fresh index: time to import the app, time until the lifespan is ready to serve
+and time until the first retrieval returned. Embedding requests are simulated
+with a fixed round-trip latency.
+
+Usage: python -m benchmarks.bench_startup --files 50 --embedding-latency 0.2
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+MODES = ["blocking", "background", "lazy"]
+
+
+def write_corpus(directory: str, files: int):
+    source_dir = os.path.join(directory, "data", "source")
+    os.makedirs(source_dir, exist_ok=True)
+    for i in range(files):
+        with open(os.path.join(source_dir, f"doc_{i}.md"), "w") as f:
+            f.write(f"# Document {i}\n")
+            for section in range(5):
+                f.write(f"## Section {section}\nProject {i}.{section} used C++, Python and sensor fusion.\n")
+
+
+async def _measure_child(embedding_latency: float) -> dict:
+    started_at = time.perf_counter()
+    from app.main import app
+    from benchmarks.fakes import FakeEmbeddings
+    from portfolio_assistant.tools.rag import set_embeddings
+    from portfolio_assistant.tools.tools import retrieve_portfolio_info
+    imported_at = time.perf_counter()
+
+    set_embeddings(FakeEmbeddings(latency=embedding_latency))
+    async with app.router.lifespan_context(app):
+        ready_at = time.perf_counter()
+        await retrieve_portfolio_info.ainvoke("Which languages does he use?")
+        first_query_at = time.perf_counter()
+
+    return {
+        "import_s": imported_at - started_at,
+        "ready_s": ready_at - started_at,
+        "first_query_s": first_query_at - started_at,
+    }
+
+
+def run_mode(mode: str, files: int, embedding_latency: float) -> dict:
+    workdir = tempfile.mkdtemp(prefix=f"bench_startup_{mode}_")
+    write_corpus(workdir, files)
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {
+        **os.environ,
+        "RAG_WARMUP_MODE": mode,
+        "PYTHONPATH": backend_dir,
+        # Keeps the fake questions out of the real review log
+        "QUESTION_DB_PATH": os.path.join(workdir, "data", "questions", "unanswered_questions.db"),
+        # The app validates its model and mail configuration on import
+        "OPENROUTER_API_KEY": os.getenv("OPENROUTER_API_KEY", "benchmark"),
+        "MAIL_USERNAME": os.getenv("MAIL_USERNAME", "benchmark"),
+        "MAIL_PASSWORD": os.getenv("MAIL_PASSWORD", "benchmark"),
+        "MAIL_FROM": os.getenv("MAIL_FROM", "benchmark@example.com"),
+    }
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", "--embedding-latency", str(embedding_latency)],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=50, help="Markdown files in the synthetic corpus")
+    parser.add_argument("--embedding-latency", type=float, default=0.2, help="Simulated seconds per embedding request")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_measure_child(args.embedding_latency))))
+        return
+
+    print(f"{'mode':>12} {'import [s]':>12} {'ready [s]':>12} {'1st query [s]':>14}")
+    for mode in MODES:
+        result = run_mode(mode, args.files, args.embedding_latency)
+        print(f"{mode:>12} {result['import_s']:>12.2f} {result['ready_s']:>12.2f} {result['first_query_s']:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
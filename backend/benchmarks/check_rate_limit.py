@@ -0,0 +1,140 @@
+# check_rate_limit.py
+"""
+Starts the server with several uvicorn workers (fake chat models and embeddings),
+sends --requests simultaneous /chat requests from one client and checks that exactly
+--limit of them are accepted and the rest are rejected with 429. The first run uses the
+default shared SQLite storage. For comparison, the second run uses per-worker
+memory:// counters, where every worker grants its own quota. Both runs also check that
+/metrics (prometheus_client multiprocess mode) counts the requests of all workers.
+tests/test_multiworker.py runs the shared SQLite check as part of the test suite.
+
+Usage: python -m benchmarks.check_rate_limit --workers 4 --limit 30 --requests 120
+Exits with status 1 if the shared limit is not enforced exactly or /metrics misses requests.
+"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import functools
+import subprocess
+from collections import Counter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def create_app():
+    """App factory run in every worker: the real app with fake models and embeddings."""
+    from benchmarks.fakes import FakeEmbeddings, fake_model_factory
+    from portfolio_assistant.tools.rag import set_embeddings
+    from portfolio_assistant.core.assistant import PortfolioAssistant
+    from app import main
+
+    set_embeddings(FakeEmbeddings())
+    main.PortfolioAssistant = functools.partial(PortfolioAssistant, model_factory=fake_model_factory(latency=0.01))
+    return main.app
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_until_ready(client, server: subprocess.Popen, timeout: float = 60):
+    import httpx
+
+    started_at = time.perf_counter()
+    while time.perf_counter() - started_at < timeout:
+        if server.poll() is not None:
+            raise RuntimeError("The server exited during startup")
+        try:
+            await client.get("/")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise TimeoutError("The server did not start in time")
+
+
+async def run(storage_uri: str, args) -> tuple:
+    import httpx
+
+    workdir = tempfile.mkdtemp(prefix="check_rate_limit_")
+    os.makedirs(os.path.join(workdir, "metrics"))
+    port = _free_port()
+    env = {
+        **os.environ,
+        "PYTHONPATH": BACKEND_DIR,
+        # Keeps the fake questions out of the real review log
+        "QUESTION_DB_PATH": os.path.join(workdir, "data", "questions", "unanswered_questions.db"),
+        "RATE_LIMIT_STORAGE_URI": storage_uri,
+        "PROMETHEUS_MULTIPROC_DIR": os.path.join(workdir, "metrics"),
+        "CHAT_RATE_LIMIT": f"{args.limit}/day",
+        "SEMANTIC_CACHE_ENABLED": "False",
+        "RAG_WARMUP_MODE": "blocking",
+        "LOG_LEVEL": "WARNING",
+        # The app validates its model and mail configuration on import
+        "OPENROUTER_API_KEY": os.getenv("OPENROUTER_API_KEY", "benchmark"),
+        "MAIL_USERNAME": os.getenv("MAIL_USERNAME", "benchmark"),
+        "MAIL_PASSWORD": os.getenv("MAIL_PASSWORD", "benchmark"),
+        "MAIL_FROM": os.getenv("MAIL_FROM", "benchmark@example.com"),
+    }
+    log_path = os.path.join(workdir, "server.log")
+    with open(log_path, "w") as log:
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "benchmarks.check_rate_limit:create_app", "--factory",
+             "--workers", str(args.workers), "--port", str(port), "--log-level", "info"],
+            cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            await _wait_until_ready(client, server)
+            # Every worker has to be up, otherwise the first ones take all requests
+            await asyncio.sleep(args.startup_seconds)
+            responses = await asyncio.gather(*[
+                client.post("/chat", json={"message": f"Question {i} about his projects"})
+                for i in range(args.requests)
+            ])
+            metrics = (await client.get("/metrics")).text
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    with open(log_path) as log:
+        workers = sum("Started server process" in line for line in log)
+    counted = sum(
+        float(line.rsplit(" ", 1)[1]) for line in metrics.splitlines()
+        if line.startswith("http_request_duration_seconds_count{") and 'route="/chat"' in line
+    )
+    return Counter(response.status_code for response in responses), workers, int(counted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=30)
+    parser.add_argument("--requests", type=int, default=120)
+    parser.add_argument("--startup-seconds", type=float, default=3.0, help="Wait after the first worker answered")
+    args = parser.parse_args()
+
+    failed = False
+    for storage_uri, expect_exact in [("sqlite:///data/ratelimit/limits.db", True), ("memory://", False)]:
+        statuses, workers, counted = asyncio.run(run(storage_uri, args))
+        accepted = statuses.get(200, 0)
+        print(f"{storage_uri:<38} workers={workers} accepted={accepted} rejected={statuses.get(429, 0)} "
+              f"other={sum(n for status, n in statuses.items() if status not in (200, 429))} metrics={counted}")
+        if counted != args.requests:
+            print(f"FAILED: /metrics counted {counted} of {args.requests} /chat requests")
+            failed = True
+        if expect_exact and (accepted != args.limit or statuses.get(429, 0) != args.requests - args.limit):
+            print(f"FAILED: expected exactly {args.limit} accepted requests with shared storage")
+            failed = True
+    if failed:
+        sys.exit(1)
+    print(f"shared limit enforced exactly across {args.workers} workers")
+
+
+if __name__ == "__main__":
+    main()
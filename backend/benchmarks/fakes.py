@@ -0,0 +1,188 @@
+# fakes.py
+"""
+Deterministic stand-ins for the chat models returned by `create_model`.
+They simulate provider latency so benchmarks measure our own overhead
+and concurrency behaviour without any network calls.
+"""
+import time
+import asyncio
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from portfolio_assistant.core.state import RouteQuery, Grade
+from portfolio_assistant.core.context import count_message_tokens
+
+EMAIL_KEYWORDS = ("email", "e-mail", "contact", "reach him", "write to")
+CHAT_KEYWORDS = ("hi", "hello", "hey", "how are you", "thanks", "thank you")
+
+
+def fake_route(messages: List[BaseMessage]) -> RouteQuery:
+    """Keyword routing on the latest user message, mirroring the router prompt."""
+    text = messages[-1].content.lower().strip(" !?.")
+    if any(keyword in text for keyword in EMAIL_KEYWORDS):
+        return RouteQuery(step="email")
+    if text in CHAT_KEYWORDS:
+        return RouteQuery(step="chat")
+    return RouteQuery(step="search", search_query=messages[-1].content)
+
+
+def fake_grade(messages: List[BaseMessage]) -> Grade:
+    """Grades 'good' whenever the grader prompt carries a non-empty context."""
+    context = messages[-1].content.rsplit("Context:", 1)[-1].strip()
+    if context:
+        return Grade(score="good", reason="Context is not empty.")
+    return Grade(score="bad", reason="Context is empty.")
+
+
+class FakeChatModel(BaseChatModel):
+    """Returns `response` after `latency` seconds, streamed word by word."""
+
+    response: str = "Michael is a Software Engineer specializing in C++ and Python."
+    latency: float = 0.05
+    # If set, the estimated prompt tokens of every call are appended here
+    prompt_log: Optional[list] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def _record(self, messages: List[BaseMessage]):
+        if self.prompt_log is not None:
+            self.prompt_log.append(count_message_tokens(messages))
+
+    def _message(self, messages: List[BaseMessage]) -> AIMessage:
+        # Reports usage like the providers do, estimated from the text
+        input_tokens = count_message_tokens(messages)
+        output_tokens = count_message_tokens([AIMessage(content=self.response)])
+        return AIMessage(
+            content=self.response,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+
+    def _chunks(self) -> List[str]:
+        words = self.response.split(" ")
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self._record(messages)
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self._record(messages)
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        self._record(messages)
+        chunks = self._chunks()
+        for text in chunks:
+            time.sleep(self.latency / len(chunks))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        self._record(messages)
+        chunks = self._chunks()
+        for text in chunks:
+            await asyncio.sleep(self.latency / len(chunks))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                await run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema, **kwargs):
+        if schema is RouteQuery:
+            responder = fake_route
+        elif schema is Grade:
+            responder = fake_grade
+        else:
+            raise ValueError(f"FakeChatModel has no structured responder for {schema}")
+
+        def invoke(messages):
+            self._record(messages)
+            time.sleep(self.latency)
+            return responder(messages)
+
+        async def ainvoke(messages):
+            self._record(messages)
+            await asyncio.sleep(self.latency)
+            return responder(messages)
+
+        return RunnableLambda(invoke, afunc=ainvoke)
+
+
+class FakeEmbeddings(DeterministicFakeEmbedding):
+    """Deterministic hash embeddings with a simulated round-trip per request."""
+
+    size: int = 256
+    latency: float = 0.0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return super().embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        return super().embed_query(text)
+
+
+def fake_model_factory(latency: float = 0.05, response: Optional[str] = None, prompt_logs: Optional[list] = None):
+    """
+    Builds a drop-in replacement for `create_model` returning `FakeChatModel`s.
+    With `prompt_logs`, every created model gets its own prompt log appended to it,
+    in creation order (router, grader, generator, ...).
+    """
+    def create_fake_model(dev_mode: bool, temperature: float = 0.7, role: Optional[str] = None):
+        model = FakeChatModel(latency=latency)
+        if prompt_logs is not None:
+            model.prompt_log = []
+            prompt_logs.append(model.prompt_log)
+        if response is not None:
+            model.response = response
+        return model
+    return create_fake_model
@@ -0,0 +1,132 @@
+# answer_cache.py
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+@dataclass
+class CacheEntry:
+    query: str
+    answer: str
+    embedding: np.ndarray
+    created_at: float
+    # Seconds the retrieve -> grade -> generate pipeline needed to produce the answer
+    cost_seconds: float
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(re.findall(r"\w+", query.lower()))
+
+
+class SemanticAnswerCache:
+    """
+    Caches generated answers keyed on the embedding of the router's search query.
+    A lookup hits when a stored query is at least `threshold` cosine-similar.
+    Entries expire after `ttl_seconds` and the least recently used entry is
+    evicted once `max_entries` is reached. The embedding of a missed query is kept
+    here until its answer is stored, it never becomes part of the graph state.
+    """
+
+    def __init__(self, embeddings: Embeddings, threshold: float, ttl_seconds: float, max_entries: int):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        # Normalized query -> embedding of lookups that missed, until `store` (or eviction)
+        self._pending: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def _evict_expired(self, now: float):
+        expired = [key for key, entry in self._entries.items() if now - entry.created_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def _best_match(self, embedding: np.ndarray) -> Tuple[Optional[str], float]:
+        if not self._entries:
+            return None, 0.0
+        keys = list(self._entries.keys())
+        matrix = np.stack([self._entries[key].embedding for key in keys])
+        similarities = matrix @ embedding
+        best = int(np.argmax(similarities))
+        return keys[best], float(similarities[best])
+
+    async def aembed(self, query: str) -> List[float]:
+        return await self.embeddings.aembed_query(query)
+
+    async def alookup(self, query: str) -> Optional[str]:
+        """
+        Returns the cached answer, or None on a miss. The query embedding of a miss
+        is remembered, so storing the new answer does not embed the query again.
+        """
+        now = time.time()
+        self._evict_expired(now)
+
+        # Identical questions are answered without embedding them at all
+        key = normalize_query(query)
+        if key in self._entries:
+            return self._hit(key)
+
+        embedding = self._normalize(await self.aembed(query))
+        best_key, similarity = self._best_match(embedding)
+        if best_key is not None and similarity >= self.threshold:
+            return self._hit(best_key)
+
+        self.misses += 1
+        self._pending[key] = embedding
+        self._pending.move_to_end(key)
+        # Turns that end without a stored answer (e.g. a 'bad' grade) leave theirs behind
+        while len(self._pending) > max(self.max_entries, 1):
+            self._pending.popitem(last=False)
+        return None
+
+    def _hit(self, key: str) -> str:
+        self._entries.move_to_end(key)
+        entry = self._entries[key]
+        self.hits += 1
+        self.saved_seconds += entry.cost_seconds
+        return entry.answer
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def store(self, query: str, answer: str, cost_seconds: float):
+        """Caches the answer of a query that missed in `alookup`."""
+        key = normalize_query(query)
+        embedding = self._pending.pop(key, None)
+        if embedding is None or self.max_entries <= 0:
+            return
+        self._entries[key] = CacheEntry(
+            query=query,
+            answer=answer,
+            embedding=embedding,
+            created_at=time.time(),
+            cost_seconds=cost_seconds,
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self._pending.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "saved_latency_seconds": round(self.saved_seconds, 3),
+        }
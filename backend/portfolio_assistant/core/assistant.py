@@ -1,101 +1,278 @@
 # assistant.py
 import os
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
 import datetime
-from typing import List
+import contextlib
+import functools
+from dataclasses import asdict
+from typing import AsyncIterator, List, Optional
 
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, RemoveMessage
+from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.graph import StateGraph, START, END
 
-from ..tools.tools import retrieve_portfolio_info, log_unanswered_question
-from ..utils.utils import load_prompt
+from ..tools.tools import aretrieve_documents, format_documents, log_unanswered_question
+from ..tools.db_manager import question_writer, normalize_question
+from ..tools.rag import get_embeddings, register_rebuild_listener
+from ..tools.embedding_cache import CachedEmbeddings
 from .state import State, RouteQuery, Grade
-from .config import create_model, FrontendCommands
+from .config import (
+    create_model,
+    ConcurrencyLimit,
+    MODEL_PROFILES,
+    FrontendCommands,
+    INTENT_CONFIDENCE_THRESHOLD,
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL_SECONDS,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    GRADER_MODE,
+    GRADER_GOOD_THRESHOLD,
+    GRADER_BAD_THRESHOLD,
+    GRADER_CROSS_ENCODER_MODEL,
+    MULTI_QUERY_ENABLED,
+    MULTI_QUERY_MAX_SUB_QUERIES,
+    MULTI_QUERY_MAX_CHUNKS,
+    CONTEXT_MAX_RECENT_MESSAGES,
+    CONTEXT_MAX_TOKENS,
+    CONTEXT_SUMMARY_STEP,
+    ROUTER_HISTORY_WINDOW,
+    SESSION_MAX_MESSAGES,
+    COALESCE_ENABLED,
+    PROMPT_RELOAD_INTERVAL_SECONDS,
+)
+from .intent import IntentPreClassifier
+from .answer_cache import SemanticAnswerCache
+from .grading import LocalGrader
+from .query_expansion import split_query, merge_results
+from .context import ConversationContext, assign_prefix_ids
+from .prompts import PromptRegistry
+from .coalescing import SingleFlight
+from ..utils.metrics import (
+    instrument_llm,
+    timed_node,
+    COALESCED_REQUESTS,
+    RETRIEVAL_DOCUMENTS,
+    RETRIEVAL_SUB_QUERIES,
+    RELEVANCE_SCORE,
+)
+
+logger = logging.getLogger(__name__)
+
+# Progress label sent to streaming clients when a node starts running
+NODE_PROGRESS = {
+    "router": "routing",
+    "cache_lookup": "checking cache",
+    "retrieve": "retrieving",
+    "grade": "grading",
+    "generate_answer_good": "generating",
+    "generate_answer_bad": "generating",
+    "chat": "generating",
+    "email": "generating",
+}
+# Nodes whose generator LLM output is forwarded token by token
+TOKEN_STREAMING_NODES = {"generate_answer_good", "chat"}
+# State that only belongs to a single turn and must not leak into the next one of a session
+TURN_STATE_RESET = {
+    "router_decision": {},
+    "next_action": "none",
+    "cache_hit": False,
+    "search_context": "",
+    "search_chunks": [],
+    "retrieval_timings": {},
+}
 
 
 class PortfolioAssistant:
-    def __init__(self, dev_mode: bool = False):
+    def __init__(self, dev_mode: bool = False, model_factory=create_model, embeddings=None, checkpointer=None):
+        """
+        `model_factory` has the signature of `create_model` and can be replaced
+        by a factory returning fake chat models for tests and benchmarks.
+        `embeddings` defaults to the embedding model of the vector store.
+        `checkpointer` persists session state (see SessionManager), in memory by default.
+        """
         self.dev_mode = dev_mode
-        self.router_llm = create_model(self.dev_mode, temperature=0).with_structured_output(RouteQuery)
-        self.grader_llm = create_model(self.dev_mode, temperature=0.5).with_structured_output(Grade)
-        self.generator_llm = create_model(self.dev_mode, temperature=0.7)
-        self.system_instruction = load_prompt("system_prompt.md")
+        self.checkpointer = checkpointer or InMemorySaver()
+        self.llm_limits = {role: ConcurrencyLimit(profile.max_concurrency) for role, profile in MODEL_PROFILES.items()}
+        self.single_flight = SingleFlight() if COALESCE_ENABLED else None
+        self.router_llm = self._create_llm(model_factory, "router", RouteQuery)
+        self.grader_llm = self._create_llm(model_factory, "grader", Grade)
+        self.generator_llm = self._create_llm(model_factory, "generator")
+        self.context = ConversationContext(
+            summarizer_llm=self._create_llm(model_factory, "summarizer"),
+            summarizer_limit=self.llm_limits["summarizer"],
+            max_recent_messages=CONTEXT_MAX_RECENT_MESSAGES,
+            max_context_tokens=CONTEXT_MAX_TOKENS,
+            router_window=ROUTER_HISTORY_WINDOW,
+            summary_step=CONTEXT_SUMMARY_STEP,
+        )
+        self.intent_classifier = IntentPreClassifier(threshold=INTENT_CONFIDENCE_THRESHOLD)
+        self.embeddings = embeddings or get_embeddings()
+        self.answer_cache = None
+        if SEMANTIC_CACHE_ENABLED:
+            self.answer_cache = SemanticAnswerCache(
+                embeddings=self.embeddings,
+                threshold=SEMANTIC_CACHE_THRESHOLD,
+                ttl_seconds=SEMANTIC_CACHE_TTL_SECONDS,
+                max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+            )
+            # Cached answers may be outdated once the source documents changed
+            register_rebuild_listener(self.answer_cache.clear)
+        self.grader_mode = GRADER_MODE
+        self.local_grader = None
+        if self.grader_mode in ("local", "hybrid"):
+            self.local_grader = LocalGrader(
+                embeddings=self.embeddings,
+                good_threshold=GRADER_GOOD_THRESHOLD,
+                bad_threshold=GRADER_BAD_THRESHOLD,
+                cross_encoder_model=GRADER_CROSS_ENCODER_MODEL,
+            )
+        self.grader_decisions = {"local_good": 0, "local_bad": 0, "llm": 0}
+        self.retrieval_stats = {
+            "single_queries": 0,
+            "single_seconds": 0.0,
+            "multi_queries": 0,
+            "multi_wall_seconds": 0.0,
+            "multi_sub_query_seconds": 0.0,
+        }
+        self.prompts = PromptRegistry(reload_interval_seconds=PROMPT_RELOAD_INTERVAL_SECONDS)
         self.workflow = self._build_graph()
         
-    def _router_node(self, state: State) -> State:
+    def _create_llm(self, model_factory, role: str, schema=None):
+        """The instrumented model of `role`, configured by its profile in MODEL_PROFILES."""
+        llm = instrument_llm(model_factory(self.dev_mode, temperature=MODEL_PROFILES[role].temperature, role=role), role)
+        return llm.with_structured_output(schema) if schema is not None else llm
+
+    async def _router_node(self, state: State) -> State:
         messages = state["messages"]
         last_msg_content = messages[-1].content
-        router_system_msg = SystemMessage(content=(
-            f"You are a router. Your task is to classify the user's intent based ONLY on their LATEST message.\n"
-            f"Ignore previous topics unless the user specifically references them (e.g., 'tell me more about that').\n"
-            f"- If the user asks a question about Michael's background, skills, or career -> 'search'.\n"
-            f"- If the user wants to send an email or contact Michael -> 'email'.\n"
-            f"- If the user is just saying hello, asking 'how are you', or chatting -> 'chat'."
-            f"CRITICAL:"
-            f"- If 'step' is 'search', extract the search_query from this message."
-            f"The user just said: '{last_msg_content}"
-        ))
-        messages = [router_system_msg] + state["messages"]
-        decision = self.router_llm.invoke(messages)
-        print(decision)
-        return {"router_decision": decision.dict()}
-
-    def _retrieve_node(self, state: State) -> State:
+
+        local_decision = self.intent_classifier.classify(last_msg_content)
+        if local_decision:
+            logger.info("Intent resolved locally", extra={"step": local_decision.step})
+            return {"router_decision": local_decision.model_dump()}
+
+        # The latest message is the last one of the window, after the static instructions
+        messages = self.prompts.format("router", history=self.context.router_messages(state["messages"]))
+        async with self.llm_limits["router"]:
+            decision = await self.router_llm.ainvoke(messages)
+        logger.info("Intent routed by LLM", extra={"step": decision.step})
+        return {"router_decision": decision.model_dump()}
+
+    async def _cache_lookup_node(self, state: State) -> State:
         query = state["router_decision"].get("search_query")
-        
-        print(f"--- RETRIEVE: Executing Search for '{query}' ---")
-        context = retrieve_portfolio_info.invoke(query)
-        print(f"--- RETRIEVE: CONTEXT retrieved: {context} ---")
+        if not self.answer_cache:
+            return {"cache_hit": False}
 
-        return {"search_context": context}
+        answer = await self.answer_cache.alookup(query)
+        if answer is not None:
+            logger.info("Answer served from cache", extra={"query": query})
+            return {"cache_hit": True, "messages": [AIMessage(content=answer)]}
 
-    def _grade_node(self, state: State) -> State:
+        # The query embedding stays in the cache (see SemanticAnswerCache), the state is checkpointed
+        return {"cache_hit": False, "pipeline_started_at": time.perf_counter()}
+
+    async def _timed_retrieval(self, query: str):
+        started_at = time.perf_counter()
+        docs = await aretrieve_documents(query)
+        return docs, time.perf_counter() - started_at
+
+    async def _retrieve_node(self, state: State) -> State:
         query = state["router_decision"].get("search_query")
-        context = state["search_context"]
         
-        print("--- GRADER: Grading Retrieved Context ---")
+        logger.info("Executing search", extra={"query": query})
+        queries = [query]
+        if MULTI_QUERY_ENABLED:
+            sub_queries = state["router_decision"].get("sub_queries") or []
+            if len(sub_queries) > 1:
+                queries = list(dict.fromkeys([query] + sub_queries))[:MULTI_QUERY_MAX_SUB_QUERIES]
+            else:
+                queries = split_query(query, MULTI_QUERY_MAX_SUB_QUERIES)
 
-        grader_prompt = (
-            "You are a context grader. Your goal is to determine if the provided 'Context' "
-            "is sufficient to answer the 'Question'.\n"
-            "Score 'good' if the Context contains the answer to the Question. "
-            "Score 'bad' if the Context is empty, irrelevant, or is not sufficient to answer the Question.\n"
-            "Give a reason why you decided if it should be graded as 'good' or 'bad'."
-            f"Question: {query}\n"
-            f"Context: {context}"
-        )
-        
-        grade_result = self.grader_llm.invoke([HumanMessage(content=grader_prompt)])
+        started_at = time.perf_counter()
+        results = await asyncio.gather(*[self._timed_retrieval(q) for q in queries])
+        wall_seconds = time.perf_counter() - started_at
+        timings = {q: round(seconds, 4) for q, (_, seconds) in zip(queries, results)}
+
+        if len(queries) == 1:
+            docs = results[0][0]
+            self.retrieval_stats["single_queries"] += 1
+            self.retrieval_stats["single_seconds"] += wall_seconds
+        else:
+            docs = merge_results([docs for docs, _ in results], MULTI_QUERY_MAX_CHUNKS)
+            self.retrieval_stats["multi_queries"] += 1
+            self.retrieval_stats["multi_wall_seconds"] += wall_seconds
+            self.retrieval_stats["multi_sub_query_seconds"] += sum(seconds for _, seconds in results)
+            logger.info("Retrieved sub-queries", extra={"sub_queries": len(queries), "wall_seconds": round(wall_seconds, 4)})
+
+        RETRIEVAL_DOCUMENTS.observe(len(docs))
+        RETRIEVAL_SUB_QUERIES.observe(len(queries))
+        context = format_documents(docs)
+        logger.debug("Retrieved context", extra={"chunks": len(docs), "context": context})
+
+        return {
+            "search_context": context,
+            "search_chunks": [doc.page_content for doc in docs],
+            "retrieval_timings": {"wall_seconds": round(wall_seconds, 4), "sub_queries": timings},
+        }
+
+    async def _grade_node(self, state: State) -> State:
+        query = state["router_decision"].get("search_query")
+
+        if self.local_grader:
+            score = await self.local_grader.ascore(query, state.get("search_chunks", []))
+            RELEVANCE_SCORE.observe(score)
+            grade = self.local_grader.decide(score)
+            if self.grader_mode == "local" and grade is None:
+                # Without the LLM fallback the band is split in the middle
+                midpoint = (self.local_grader.good_threshold + self.local_grader.bad_threshold) / 2
+                grade = "good" if score >= midpoint else "bad"
+            if grade is not None:
+                self.grader_decisions[f"local_{grade}"] += 1
+                logger.info("Graded locally", extra={"score": round(score, 3), "grade": grade})
+                return {"grade": grade}
+            logger.info("Local relevance score is ambiguous, asking the LLM", extra={"score": round(score, 3)})
+
+        self.grader_decisions["llm"] += 1
+        return {"grade": await self._llm_grade(query, state["search_context"])}
+
+    async def _llm_grade(self, query: str, context: str) -> str:
+        messages = self.prompts.format("grader", query=query, context=context)
+        async with self.llm_limits["grader"]:
+            grade_result = await self.grader_llm.ainvoke(messages)
         grade = grade_result.score
         
-        print(f"--- GRADER: Score is '{grade}' ---")
-        print(f"--- GRADER: Reason: '{grade_result.reason}' ---")
+        logger.info("Graded by LLM", extra={"grade": grade, "reason": grade_result.reason})
 
-        return {"grade": grade}
+        return grade
 
-    def _generate_answer_good_node(self, state: State) -> State:
+    async def _generate_answer_good_node(self, state: State) -> State:
         """Generates the final answer when context is 'good'."""
         query = state["router_decision"].get("search_query")
         context = state["search_context"]
         current_date = datetime.date.today().strftime("%Y-%m-%d")
-        prompt = (
-            f"SYSTEM: {self.system_instruction}\n\n"
-            f"Answer the user question based strictly on the context provided below. "
-            f"**Synthesize a comprehensive summary** from all relevant sections in the context."
-            f"**DO NOT reference the context or the database in your final answer.** "
-            f"Keep the final answer concise.\n"
-            f"**Today's Date is: {current_date}**\n\n"
-            f"Question: {query}\n"
-            f"Context: {context}"
-        )
-        response = self.generator_llm.invoke([HumanMessage(content=prompt)])
+        messages = self.prompts.format("generator", query=query, context=context, current_date=current_date)
+        async with self.llm_limits["generator"]:
+            response = await self.generator_llm.ainvoke(messages)
+
+        if self.answer_cache:
+            self.answer_cache.store(
+                query,
+                response.content,
+                cost_seconds=time.perf_counter() - state["pipeline_started_at"],
+            )
         return {"messages": [response]}
         
-    def _generate_answer_bad_node(self, state: State) -> State:
+    async def _generate_answer_bad_node(self, state: State) -> State:
         query = state["router_decision"].get("search_query")
         
-        print("--- NO INFO: Logging and Offering Email ---")
+        logger.info("No information found, logging the question and offering email", extra={"query": query})
         
-        log_unanswered_question.invoke({"question": query})
+        await log_unanswered_question.ainvoke({"question": query})
         
         refusal_content = (
             f"I couldn't find specific details about '{query}' in Michael Schlosser's database. "
@@ -106,7 +283,7 @@ class PortfolioAssistant:
         response = AIMessage(content=refusal_content)        
         return {"messages": [response]}
 
-    def _email_node(self, state: State) -> State:
+    async def _email_node(self, state: State) -> State:
         user_facing_message = (
             f"Absolutely! I detected your intent to send an email. "
             f"I have scrolled down to the contact form for you. "
@@ -118,25 +295,27 @@ class PortfolioAssistant:
             "next_action": FrontendCommands.EMAIL_ACTION_COMMAND # <--- Set the action here
         }
 
-    def _chat_node(self, state: State) -> State:
-        print(f"--- ROUTER: Direct Chat ---")
+    async def _chat_node(self, state: State) -> State:
+        logger.info("Direct chat")
         
-        messages = [SystemMessage(content=self.system_instruction)] + state["messages"]
+        messages = self.prompts.format("chat", history=self.context.build(state["messages"]))
         
-        response = self.generator_llm.invoke(messages)
+        async with self.llm_limits["generator"]:
+            response = await self.generator_llm.ainvoke(messages)
         return {"messages": [response]}
 
     def _build_graph(self):
         graph_builder = StateGraph(State)
         
-        graph_builder.add_node("router", self._router_node)
-        graph_builder.add_node("email", self._email_node)
-        graph_builder.add_node("chat", self._chat_node)
+        graph_builder.add_node("router", timed_node("router", self._router_node))
+        graph_builder.add_node("email", timed_node("email", self._email_node))
+        graph_builder.add_node("chat", timed_node("chat", self._chat_node))
         
-        graph_builder.add_node("retrieve", self._retrieve_node)
-        graph_builder.add_node("grade", self._grade_node)
-        graph_builder.add_node("generate_answer_good", self._generate_answer_good_node)
-        graph_builder.add_node("generate_answer_bad", self._generate_answer_bad_node)
+        graph_builder.add_node("cache_lookup", timed_node("cache_lookup", self._cache_lookup_node))
+        graph_builder.add_node("retrieve", timed_node("retrieve", self._retrieve_node))
+        graph_builder.add_node("grade", timed_node("grade", self._grade_node))
+        graph_builder.add_node("generate_answer_good", timed_node("generate_answer_good", self._generate_answer_good_node))
+        graph_builder.add_node("generate_answer_bad", timed_node("generate_answer_bad", self._generate_answer_bad_node))
 
         graph_builder.add_edge(START, "router")
         
@@ -147,12 +326,24 @@ class PortfolioAssistant:
             "router",
             route_decision,
             {
-                "search": "retrieve",
+                "search": "cache_lookup",
                 "email": "email",
                 "chat": "chat"
             }
         )
         
+        def cache_decision(state: State):
+            return "hit" if state["cache_hit"] else "miss"
+
+        graph_builder.add_conditional_edges(
+            "cache_lookup",
+            cache_decision,
+            {
+                "hit": END,
+                "miss": "retrieve"
+            }
+        )
+
         graph_builder.add_edge("retrieve", "grade")
 
         def grade_decision(state: State):
@@ -172,12 +363,35 @@ class PortfolioAssistant:
         graph_builder.add_edge("email", END)
         graph_builder.add_edge("chat", END) 
         
-        graph = graph_builder.compile()
+        graph = graph_builder.compile(checkpointer=self.checkpointer)
         if self.dev_mode:
             graph.get_graph().draw_mermaid_png(output_file_path="res/assistant_graph.png")
         return graph
 
-    async def chat(self, user_input: str, history: List[dict]) -> State:
+    def stats(self) -> dict:
+        stats = {"intent_prefilter": self.intent_classifier.stats()}
+        if self.answer_cache:
+            stats["answer_cache"] = self.answer_cache.stats()
+        stats["grader"] = {"mode": self.grader_mode, **self.grader_decisions}
+        retrieval = self.retrieval_stats
+        stats["retrieval"] = {
+            "single_queries": retrieval["single_queries"],
+            "avg_single_seconds": retrieval["single_seconds"] / max(retrieval["single_queries"], 1),
+            "multi_queries": retrieval["multi_queries"],
+            # Wall-clock of a fan-out vs. the summed time of its sub-queries shows the concurrency gain
+            "avg_multi_wall_seconds": retrieval["multi_wall_seconds"] / max(retrieval["multi_queries"], 1),
+            "avg_multi_sub_query_seconds": retrieval["multi_sub_query_seconds"] / max(retrieval["multi_queries"], 1),
+        }
+        if isinstance(self.embeddings, CachedEmbeddings):
+            stats["embedding_cache"] = self.embeddings.stats()
+        stats["unanswered_questions"] = question_writer.stats()
+        stats["prompts"] = self.prompts.stats()
+        if self.single_flight:
+            stats["coalescing"] = self.single_flight.stats()
+        stats["models"] = {role: asdict(profile) for role, profile in MODEL_PROFILES.items()}
+        return stats
+
+    def _build_messages(self, user_input: str, history: List[dict]) -> List[BaseMessage]:
         messages: List[BaseMessage] = []
         for msg in history:
             if msg['role'] == 'user':
@@ -185,5 +399,157 @@ class PortfolioAssistant:
             elif msg['role'] == 'ai':
                 messages.append(AIMessage(content=msg['text']))
         messages.append(HumanMessage(content=user_input))
-        result = await self.workflow.ainvoke({"messages": messages, "router_decision": {}})
-        return result
\ No newline at end of file
+        return assign_prefix_ids(messages)
+
+    async def _prepare_turn(self, user_input: str, history: List[dict], session_id: Optional[str]):
+        """
+        Returns the graph input, config and the earlier messages of the conversation for one turn.
+        With a session the history comes from the checkpointer and only the new message is added;
+        without one the client-sent history runs on a throwaway thread.
+        """
+        if session_id:
+            config = {"configurable": {"thread_id": session_id}}
+            snapshot = await self.workflow.aget_state(config)
+            stored = snapshot.values.get("messages", [])
+            # Cap what a single session can store, the oldest messages go first
+            overflow = len(stored) + 1 - SESSION_MAX_MESSAGES
+            messages = [RemoveMessage(id=m.id) for m in stored[:max(overflow, 0)]]
+            messages.append(HumanMessage(content=user_input))
+            earlier = stored
+        else:
+            config = {"configurable": {"thread_id": f"ephemeral-{uuid.uuid4().hex}"}}
+            messages = self._build_messages(user_input, history)
+            earlier = messages[:-1]
+        return {**TURN_STATE_RESET, "messages": messages}, config, earlier
+
+    def _coalescing_key(self, user_input: str, earlier: List[BaseMessage]) -> Optional[str]:
+        """
+        Turns with the same normalized message and the same visible history get the same key.
+        Histories beyond the verbatim window are summarized and always run on their own.
+        """
+        if self.single_flight is None or len(earlier) > CONTEXT_MAX_RECENT_MESSAGES:
+            return None
+        digest = hashlib.sha256(normalize_question(user_input).encode("utf-8"))
+        for message in earlier:
+            digest.update(f"\0{message.type}\0{message.content}".encode("utf-8"))
+        return digest.hexdigest()
+
+    async def chat(self, user_input: str, history: List[dict], session_id: Optional[str] = None) -> State:
+        turn_input, config, earlier = await self._prepare_turn(user_input, history, session_id)
+        final_state: State = {}
+        async for event in self._run_turn(
+            turn_input, config, session_id, self._coalescing_key(user_input, earlier), stream=False
+        ):
+            final_state = event["data"]
+        return final_state
+
+    async def astream_chat(
+        self, user_input: str, history: List[dict], session_id: Optional[str] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Runs the graph like `chat`, but yields events while it executes:
+        - {"event": "progress", "data": {"node": ..., "status": ...}} when a node starts
+        - {"event": "token", "data": {"text": ...}} for every generator chunk
+        - {"event": "final", "data": {"response": ..., "action": ...}} once the graph finished
+        """
+        turn_input, config, earlier = await self._prepare_turn(user_input, history, session_id)
+        final_state: State = {}
+        streamed_tokens = False
+
+        async for event in self._run_turn(
+            turn_input, config, session_id, self._coalescing_key(user_input, earlier), stream=True
+        ):
+            if event["event"] == "token":
+                streamed_tokens = True
+            if event["event"] == "state":
+                final_state = event["data"]
+            else:
+                yield event
+
+        response_text = final_state["messages"][-1].content
+        if not streamed_tokens:
+            # Email and refusal answers are not generated by an LLM, send them as one chunk
+            yield {"event": "token", "data": {"text": response_text}}
+
+        yield {
+            "event": "final",
+            "data": {
+                "response": response_text,
+                "action": final_state.get("next_action", "none"),
+            },
+        }
+
+    async def _run_turn(
+        self, turn_input: dict, config: dict, session_id: Optional[str], key: Optional[str], stream: bool
+    ) -> AsyncIterator[dict]:
+        """
+        Yields the events of one turn, ending with a 'state' event (without `stream` only that one).
+        While a turn with the same key is running, this one subscribes to it instead of running the
+        graph: it receives the same events and the shared answer is recorded as its own turn.
+        """
+        mode = "stream" if stream else "invoke"
+        produce = functools.partial(
+            self._astream_turn if stream else self._invoke_turn, turn_input, config, session_id
+        )
+        if key is None:
+            async with contextlib.aclosing(produce()) as events:
+                async for event in events:
+                    yield event
+            return
+
+        flight, leader = self.single_flight.join(f"{mode}:{key}", produce)
+        if not leader:
+            COALESCED_REQUESTS.labels(mode=mode).inc()
+        async for event in flight.listen():
+            if event["event"] == "state" and not leader:
+                event = {"event": "state", "data": await self._adopt_shared_turn(event["data"], turn_input, config, session_id)}
+            yield event
+
+    async def _adopt_shared_turn(self, shared: State, turn_input: dict, config: dict, session_id: Optional[str]) -> State:
+        """Records the answer of a shared execution as this caller's turn."""
+        answer = AIMessage(content=shared["messages"][-1].content)
+        values = {key: value for key, value in shared.items() if key != "messages"}
+        if session_id:
+            await self.workflow.aupdate_state(config, {**values, "messages": [*turn_input["messages"], answer]}, as_node="chat")
+        router_decision = values.get("router_decision") or {}
+        if router_decision.get("step") == "search" and not values.get("cache_hit") and values.get("grade") == "bad":
+            # Every asker counts in the missing-topics analytics, not only the one that ran the graph
+            await log_unanswered_question.ainvoke({"question": router_decision.get("search_query")})
+        messages = [message for message in turn_input["messages"] if not isinstance(message, RemoveMessage)]
+        return {**values, "messages": [*messages, answer]}
+
+    async def _invoke_turn(self, turn_input: dict, config: dict, session_id: Optional[str]) -> AsyncIterator[dict]:
+        try:
+            # Only the final state of a turn is checkpointed, not every node
+            yield {"event": "state", "data": await self.workflow.ainvoke(turn_input, config, durability="exit")}
+        finally:
+            if not session_id:
+                await self.checkpointer.adelete_thread(config["configurable"]["thread_id"])
+
+    async def _astream_turn(self, turn_input: dict, config: dict, session_id: Optional[str]) -> AsyncIterator[dict]:
+        """Translates the LangGraph stream into progress/token events and a closing 'state' event."""
+        final_state: State = {}
+        try:
+            async for mode, payload in self.workflow.astream(
+                turn_input,
+                config,
+                stream_mode=["tasks", "messages", "values"],
+                durability="exit",
+            ):
+                if mode == "tasks":
+                    # Task events are emitted twice, on start (with 'input') and on finish (with 'result')
+                    if "input" in payload and payload["name"] in NODE_PROGRESS:
+                        yield {
+                            "event": "progress",
+                            "data": {"node": payload["name"], "status": NODE_PROGRESS[payload["name"]]},
+                        }
+                elif mode == "messages":
+                    chunk, metadata = payload
+                    if metadata.get("langgraph_node") in TOKEN_STREAMING_NODES and chunk.content:
+                        yield {"event": "token", "data": {"text": chunk.content}}
+                elif mode == "values":
+                    final_state = payload
+        finally:
+            if not session_id:
+                await self.checkpointer.adelete_thread(config["configurable"]["thread_id"])
+        yield {"event": "state", "data": final_state}
@@ -0,0 +1,94 @@
+# coalescing.py
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One running execution and the events it produced so far."""
+
+    def __init__(self):
+        self.events: List[dict] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 1
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, event: dict):
+        self.events.append(event)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.finished = True
+        self.error = error
+        self._notify()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def listen(self) -> AsyncIterator[dict]:
+        """Yields every event from the start, also to subscribers that joined late."""
+        position = 0
+        while True:
+            while position < len(self.events):
+                yield self.events[position]
+                position += 1
+            if self.finished:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class SingleFlight:
+    """
+    Single-flight execution: while an execution for a key is running, callers with the same key
+    subscribe to it instead of starting their own. The execution runs in its own task, so it
+    finishes even if the caller that started it goes away, and every subscriber receives the
+    same events. Finished flights are dropped, later callers start a new execution.
+    """
+
+    def __init__(self):
+        self.flights = 0
+        self.coalesced = 0
+        self._running: Dict[str, _Flight] = {}
+
+    def join(self, key: str, start: Callable[[], AsyncIterator[dict]]) -> Tuple[_Flight, bool]:
+        """Returns the flight for `key` and whether this caller started it (the leader)."""
+        flight = self._running.get(key)
+        if flight is not None:
+            flight.subscribers += 1
+            self.coalesced += 1
+            return flight, False
+
+        flight = _Flight()
+        self._running[key] = flight
+        self.flights += 1
+        flight.task = asyncio.create_task(self._run(key, flight, start))
+        return flight, True
+
+    async def _run(self, key: str, flight: _Flight, start: Callable[[], AsyncIterator[dict]]):
+        error = None
+        try:
+            async for event in start():
+                flight.publish(event)
+        except asyncio.CancelledError as e:
+            error = e
+            raise
+        except Exception as e:
+            logger.exception("Shared execution failed", extra={"subscribers": flight.subscribers})
+            error = e
+        finally:
+            self._running.pop(key, None)
+            flight.finish(error)
+
+    def stats(self) -> dict:
+        return {
+            "flights": self.flights,
+            "coalesced_requests": self.coalesced,
+            "in_flight": len(self._running),
+        }
@@ -1,4 +1,13 @@
 import os
+import json
+import asyncio
+import logging
+import threading
+import importlib.util
+from dataclasses import dataclass, fields, replace
+from typing import Dict, Optional
+
+import httpx
 from langchain_openai import ChatOpenAI
 from langchain_ollama import ChatOllama
 from dotenv import load_dotenv
@@ -8,30 +17,244 @@ load_dotenv()
 class FrontendCommands:
     EMAIL_ACTION_COMMAND = "SCROLL_TO_CONTACT"
 
-def _get_ollama_model(temperature: float):
-    model_name = os.getenv("OLLAMA_MODEL")
+# Minimum confidence of the local intent pre-classifier to skip the LLM router
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.75"))
+
+# Semantic answer cache in front of retrieve -> grade -> generate
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "True").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "86400"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "256"))
+
+# Compound questions are split into sub-queries that are retrieved concurrently
+MULTI_QUERY_ENABLED = os.getenv("MULTI_QUERY_ENABLED", "True").lower() == "true"
+MULTI_QUERY_MAX_SUB_QUERIES = int(os.getenv("MULTI_QUERY_MAX_SUB_QUERIES", "4"))
+MULTI_QUERY_MAX_CHUNKS = int(os.getenv("MULTI_QUERY_MAX_CHUNKS", "8"))
+
+# Conversation context sent to the LLMs: the most recent messages are kept verbatim,
+# older ones are replaced by a rolling summary; the router only sees a short window
+CONTEXT_MAX_RECENT_MESSAGES = int(os.getenv("CONTEXT_MAX_RECENT_MESSAGES", "8"))
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "3000"))
+CONTEXT_SUMMARY_STEP = int(os.getenv("CONTEXT_SUMMARY_STEP", "6"))
+ROUTER_HISTORY_WINDOW = int(os.getenv("ROUTER_HISTORY_WINDOW", "4"))
+
+# Server-side chat sessions persisted by the LangGraph SQLite checkpointer
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "data/sessions/sessions.db")
+SESSION_IDLE_TTL_SECONDS = float(os.getenv("SESSION_IDLE_TTL_SECONDS", "7200"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "200"))
+
+# Identical questions (same normalized message and visible history) that arrive while one is
+# being answered share its graph execution instead of running their own
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "True").lower() == "true"
+
+# Context grading: 'llm' always asks the grader LLM, 'local' decides from relevance scores only,
+# 'hybrid' decides locally and asks the LLM only for scores between the two thresholds
+GRADER_MODE = os.getenv("GRADER_MODE", "hybrid")
+GRADER_GOOD_THRESHOLD = float(os.getenv("GRADER_GOOD_THRESHOLD", "0.7"))
+GRADER_BAD_THRESHOLD = float(os.getenv("GRADER_BAD_THRESHOLD", "0.3"))
+# Optional CPU cross-encoder (requires sentence-transformers), e.g. 'cross-encoder/ms-marco-MiniLM-L-6-v2'
+GRADER_CROSS_ENCODER_MODEL = os.getenv("GRADER_CROSS_ENCODER_MODEL")
+
+# Seconds between checks of prompts/*.md for changes (0 loads the prompts once)
+PROMPT_RELOAD_INTERVAL_SECONDS = float(os.getenv("PROMPT_RELOAD_INTERVAL_SECONDS", "2"))
+
+logger = logging.getLogger(__name__)
+
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "google/gemini-2.0-flash-lite-001")
+# JSON file with per-role overrides, e.g. {"router": {"model": "...", "max_tokens": 128}}
+MODEL_PROFILES_FILE = os.getenv("MODEL_PROFILES_FILE", "model_profiles.json")
+# Connections of the HTTP client shared by all OpenRouter models and the embeddings
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "32"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
+
+# Embeddings for the index and queries: 'openrouter' (remote), 'onnx' (in-process CPU model, the
+# `onnx` extra) or 'ollama' (local Ollama server). Dev mode embeds locally by default: with 'onnx'
+# if its packages and model files are available, otherwise with Ollama
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "onnx" if os.getenv("APP_ENV") == "dev" else "openrouter")
+OPENROUTER_EMBEDDING_MODEL = os.getenv("OPENROUTER_EMBEDDING_MODEL", "text-embedding-3-small")
+# Hugging Face repo or local directory with tokenizer.json and the ONNX file (int8 quantized by default)
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "Xenova/all-MiniLM-L6-v2")
+LOCAL_EMBEDDING_ONNX_FILE = os.getenv("LOCAL_EMBEDDING_ONNX_FILE", "onnx/model_quantized.onnx")
+# onnxruntime threads per inference (0 uses all cores)
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", "0"))
+OLLAMA_EMBEDDING_MODEL = os.getenv("OLLAMA_EMBEDDING_MODEL", "nomic-embed-text")
+# Concurrent queries arriving within this window share one local forward pass
+EMBEDDING_QUERY_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_QUERY_BATCH_WAIT_MS", "2"))
+
+
+@dataclass(frozen=True)
+class ModelProfile:
+    """
+    Model settings of one role. `model` None uses OPENROUTER_MODEL (OLLAMA_MODEL in dev mode),
+    `max_concurrency` bounds the simultaneous calls of the role (0 is unbounded).
+    """
+    model: Optional[str] = None
+    temperature: float = 0.7
+    timeout: float = 60.0
+    max_tokens: Optional[int] = None
+    max_concurrency: int = 0
+
+
+# Router and grader answer with a few structured fields, they get short limits
+DEFAULT_MODEL_PROFILES = {
+    "router": ModelProfile(temperature=0, timeout=15, max_tokens=256, max_concurrency=32),
+    "grader": ModelProfile(temperature=0.5, timeout=15, max_tokens=256, max_concurrency=32),
+    "generator": ModelProfile(temperature=0.7, timeout=60, max_tokens=1024, max_concurrency=32),
+    "summarizer": ModelProfile(temperature=0, timeout=60, max_tokens=512, max_concurrency=4),
+}
+
+
+def load_model_profiles(path: str = MODEL_PROFILES_FILE) -> Dict[str, ModelProfile]:
+    """
+    Default profiles, overridden by the roles in the JSON file at `path` (if it exists) and by
+    `<ROLE>_MODEL` environment variables (e.g. ROUTER_MODEL).
+    """
+    overrides = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            overrides = json.load(f)
+    known_fields = {f.name for f in fields(ModelProfile)}
+
+    profiles = {}
+    for role in {**DEFAULT_MODEL_PROFILES, **overrides}:
+        values = overrides.get(role, {})
+        unknown = set(values) - known_fields
+        if unknown:
+            raise ValueError(f"Unknown fields {sorted(unknown)} in model profile '{role}' ({path})")
+        profile = replace(DEFAULT_MODEL_PROFILES.get(role, ModelProfile()), **values)
+        if os.getenv(f"{role.upper()}_MODEL"):
+            profile = replace(profile, model=os.getenv(f"{role.upper()}_MODEL"))
+        profiles[role] = profile
+    return profiles
+
+
+MODEL_PROFILES = load_model_profiles()
+
+_http_clients = None
+_http_clients_lock = threading.Lock()
+
+
+def get_http_clients() -> tuple[httpx.Client, httpx.AsyncClient]:
+    """
+    The (sync, async) HTTP clients shared by all provider calls, so every role reuses the same
+    pooled keep-alive connections instead of a TLS handshake per client. HTTP/2 is used when
+    the `h2` package (the `http2` extra) is installed, HTTP/1.1 otherwise.
+    """
+    global _http_clients
+    with _http_clients_lock:
+        if _http_clients is None:
+            http2 = importlib.util.find_spec("h2") is not None
+            limits = httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_SECONDS,
+            )
+            _http_clients = (
+                httpx.Client(http2=http2, limits=limits),
+                httpx.AsyncClient(http2=http2, limits=limits),
+            )
+        return _http_clients
+
+
+async def aclose_http_clients():
+    global _http_clients
+    with _http_clients_lock:
+        clients, _http_clients = _http_clients, None
+    if clients:
+        clients[0].close()
+        await clients[1].aclose()
+
+
+class ConcurrencyLimit:
+    """Async context manager that bounds the simultaneous calls of one role (0 is unbounded)."""
+
+    def __init__(self, max_concurrency: int):
+        self._slots = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+
+    async def __aenter__(self):
+        if self._slots:
+            await self._slots.acquire()
+
+    async def __aexit__(self, *exc_info):
+        if self._slots:
+            self._slots.release()
+
+
+def _get_ollama_model(profile: ModelProfile):
+    model_name = profile.model or os.getenv("OLLAMA_MODEL")
     if not model_name:
         raise EnvironmentError(
             "Environment variable OLLAMA_MODEL not set. Cannot run in development mode."
         )
-    return ChatOllama(model=model_name, temperature=temperature)
+    return ChatOllama(
+        model=model_name,
+        temperature=profile.temperature,
+        num_predict=profile.max_tokens,
+        client_kwargs={"timeout": profile.timeout},
+    )
 
-def _get_openrouter_model(temperature: float):
+def _get_openrouter_model(profile: ModelProfile):
     api_key = os.getenv("OPENROUTER_API_KEY")
     if not api_key:
         raise EnvironmentError(
             "Environment variable OPENROUTER_API_KEY not set. Cannot run in production mode."
         )
-    
+
+    http_client, http_async_client = get_http_clients()
     return ChatOpenAI(
-        base_url="https://openrouter.ai/api/v1",
+        base_url=OPENROUTER_BASE_URL,
         api_key=api_key,
-        temperature=temperature,
-        model="google/gemini-2.0-flash-lite-001"
+        temperature=profile.temperature,
+        model=profile.model or OPENROUTER_MODEL,
+        timeout=profile.timeout,
+        max_tokens=profile.max_tokens,
+        http_client=http_client,
+        http_async_client=http_async_client,
     )
 
-def create_model(dev_mode: bool, temperature: float = 0.7):
+def create_model(dev_mode: bool, temperature: float = 0.7, role: Optional[str] = None):
+    """Creates the chat model of `role` from its profile; without a role, the default profile with `temperature`."""
+    profile = MODEL_PROFILES[role] if role in MODEL_PROFILES else ModelProfile(temperature=temperature)
     if dev_mode:
-        return _get_ollama_model(temperature)
+        return _get_ollama_model(profile)
+    else:
+        return _get_openrouter_model(profile)
+
+def create_embeddings(backend: str = EMBEDDING_BACKEND):
+    """
+    Creates the embedding model of `backend` and returns it with the name its vectors are
+    cached and indexed under (a different name rebuilds the index).
+    """
+    if backend == "openrouter":
+        from langchain_openai import OpenAIEmbeddings
+        http_client, http_async_client = get_http_clients()
+        embeddings = OpenAIEmbeddings(
+            model=OPENROUTER_EMBEDDING_MODEL,
+            base_url=OPENROUTER_BASE_URL,
+            api_key=os.getenv("OPENROUTER_API_KEY"),
+            # Same pooled connections as the chat models
+            http_client=http_client,
+            http_async_client=http_async_client,
+        )
+        return embeddings, OPENROUTER_EMBEDDING_MODEL
+
+    from ..tools.local_embeddings import BatchedQueryEmbeddings, OnnxEmbeddings
+    if backend == "onnx":
+        try:
+            model = OnnxEmbeddings(LOCAL_EMBEDDING_MODEL, LOCAL_EMBEDDING_ONNX_FILE, threads=LOCAL_EMBEDDING_THREADS)
+        except (ImportError, OSError) as e:
+            # Only the dev mode default falls back, an explicitly chosen backend fails
+            if os.getenv("EMBEDDING_BACKEND"):
+                raise
+            logger.warning("Local ONNX embeddings are not available, using Ollama", extra={"error": str(e)})
+            return create_embeddings("ollama")
+        model_name = f"onnx:{LOCAL_EMBEDDING_MODEL}/{LOCAL_EMBEDDING_ONNX_FILE}"
+    elif backend == "ollama":
+        from langchain_ollama import OllamaEmbeddings
+        model = OllamaEmbeddings(model=OLLAMA_EMBEDDING_MODEL)
+        model_name = f"ollama:{OLLAMA_EMBEDDING_MODEL}"
     else:
-        return _get_openrouter_model(temperature)
\ No newline at end of file
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}'. Use 'openrouter', 'onnx' or 'ollama'.")
+    return BatchedQueryEmbeddings(model, max_wait_seconds=EMBEDDING_QUERY_BATCH_WAIT_MS / 1000), model_name
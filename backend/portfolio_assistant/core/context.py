@@ -0,0 +1,146 @@
+# context.py
+import asyncio
+import hashlib
+import contextlib
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "Summarize the following conversation between a visitor and Michael Schlosser's portfolio "
+    "assistant in at most 5 short sentences. Keep names, topics and open questions, drop small talk.\n\n"
+    "Previous summary: {previous_summary}\n\n"
+    "New messages:\n{transcript}"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+def count_message_tokens(messages: List[BaseMessage]) -> int:
+    return sum(estimate_tokens(str(message.content)) for message in messages)
+
+
+def _transcript(messages: List[BaseMessage]) -> str:
+    return "\n".join(
+        f"{'Visitor' if isinstance(message, HumanMessage) else 'Assistant'}: {message.content}"
+        for message in messages
+    )
+
+
+def _prefix_digests(messages: List[BaseMessage]) -> List[str]:
+    """digests[i] identifies messages[:i + 1]; a rolling hash keeps this linear in the history length."""
+    digest = hashlib.sha256()
+    digests = []
+    for message in messages:
+        digest.update(f"{message.type}\0{message.content}\0".encode("utf-8"))
+        digests.append(digest.hexdigest())
+    return digests
+
+
+def assign_prefix_ids(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """
+    Gives messages without an id one derived from the conversation up to them, so a client
+    re-sending the same history gets the same ids (and summaries) as before.
+    """
+    for message, digest in zip(messages, _prefix_digests(messages)):
+        if message.id is None:
+            message.id = digest[:32]
+    return messages
+
+
+class ConversationContext:
+    """
+    Bounds the history that is sent to the LLMs. The last `max_recent_messages` are kept
+    verbatim, older messages are replaced by a rolling summary. Summaries are computed in the
+    background every `summary_step` messages, each one from the previous summary and the
+    messages after it, so a request never waits for the summarizer. They are cached by the id
+    of the last message they cover, which stays valid when a session drops its oldest messages.
+    """
+
+    def __init__(
+        self,
+        summarizer_llm,
+        max_recent_messages: int,
+        max_context_tokens: int,
+        router_window: int,
+        summary_step: int = 6,
+        max_cached_summaries: int = 512,
+        summarizer_limit=None,
+    ):
+        self.summarizer_llm = summarizer_llm
+        # Optional async context manager (ConcurrencyLimit) around every summarizer call
+        self.summarizer_limit = summarizer_limit or contextlib.nullcontext()
+        self.max_recent_messages = max_recent_messages
+        self.max_context_tokens = max_context_tokens
+        self.router_window = router_window
+        self.summary_step = summary_step
+        self.max_cached_summaries = max_cached_summaries
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def _position_keys(messages: List[BaseMessage]) -> List[str]:
+        """keys[i] identifies messages[:i] by its last message, messages without an id by the whole prefix."""
+        return [""] + [message.id or digest for message, digest in zip(messages, _prefix_digests(messages))]
+
+    def _latest_summary(self, keys: List[str]) -> Tuple[int, Optional[str]]:
+        for position in range(len(keys) - 1, 0, -1):
+            summary = self._summaries.get(keys[position])
+            if summary is not None:
+                self._summaries.move_to_end(keys[position])
+                return position, summary
+        return 0, None
+
+    async def _summarize(self, key: str, previous_summary: Optional[str], messages: List[BaseMessage]):
+        try:
+            prompt = SUMMARY_PROMPT.format(previous_summary=previous_summary or "none", transcript=_transcript(messages))
+            async with self.summarizer_limit:
+                response = await self.summarizer_llm.ainvoke([HumanMessage(content=prompt)])
+            self._summaries[key] = response.content
+            while len(self._summaries) > self.max_cached_summaries:
+                self._summaries.popitem(last=False)
+        except Exception:
+            logger.exception("Summarization failed")
+        finally:
+            self._pending.pop(key, None)
+
+    def _schedule_summary(self, key: str, previous_summary: Optional[str], messages: List[BaseMessage]):
+        if key not in self._pending and key not in self._summaries:
+            self._pending[key] = asyncio.create_task(self._summarize(key, previous_summary, messages))
+
+    def build(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """Returns the bounded history: [rolling summary] + not yet summarized + recent messages."""
+        if len(messages) <= self.max_recent_messages:
+            return self._trim_to_budget(list(messages))
+
+        older = messages[:-self.max_recent_messages]
+        keys = self._position_keys(older)
+        summarized_until, summary = self._latest_summary(keys)
+        # Counted from the latest summary, the boundaries move along when the oldest messages are dropped
+        boundary = summarized_until + (len(older) - summarized_until) // self.summary_step * self.summary_step
+        if summarized_until < boundary:
+            # Summarize up to the current boundary for the next turns, without waiting for it
+            self._schedule_summary(keys[boundary], summary, older[summarized_until:boundary])
+
+        context = list(older[summarized_until:]) + list(messages[-self.max_recent_messages:])
+        if summary:
+            context.insert(0, SystemMessage(content=f"Summary of the earlier conversation: {summary}"))
+        return self._trim_to_budget(context)
+
+    def _trim_to_budget(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """Drops the oldest messages (but never the summary or the latest one) until the budget fits."""
+        start = 1 if messages and isinstance(messages[0], SystemMessage) else 0
+        while len(messages) - start > 1 and count_message_tokens(messages) > self.max_context_tokens:
+            del messages[start]
+        return messages
+
+    def router_messages(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """The router only needs the latest message plus a short window for references like 'tell me more'."""
+        return list(messages[-self.router_window:])
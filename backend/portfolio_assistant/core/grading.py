@@ -0,0 +1,84 @@
+# grading.py
+import asyncio
+import math
+from typing import List, Literal, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from ..tools.hybrid import tokenize
+
+# Words that carry no information about whether a chunk answers the question
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "in", "on", "at", "to", "for", "with", "about", "from", "by",
+    "is", "are", "was", "were", "be", "been", "do", "does", "did", "has", "have", "had", "can", "could",
+    "what", "which", "who", "whom", "where", "when", "why", "how", "his", "he", "him", "michael",
+    "schlosser", "me", "tell", "any", "there", "it", "its", "that", "this", "as", "much", "many",
+}
+
+
+def query_coverage(query: str, chunks: List[str]) -> float:
+    """Fraction of the query's content words that occur in the retrieved chunks."""
+    terms = {term for term in tokenize(query) if term not in STOPWORDS}
+    if not terms:
+        return 0.0
+    context_terms = set(tokenize(" ".join(chunks)))
+    return len(terms & context_terms) / len(terms)
+
+
+class LocalGrader:
+    """
+    Grades retrieved context without an LLM. The relevance score in [0, 1] blends the best
+    query/chunk cosine similarity (or a cross-encoder score, if configured) with the
+    coverage of the query's content words. Scores between the two thresholds are
+    ambiguous and left to the LLM grader.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        good_threshold: float,
+        bad_threshold: float,
+        coverage_weight: float = 0.5,
+        cross_encoder_model: Optional[str] = None,
+    ):
+        self.embeddings = embeddings
+        self.good_threshold = good_threshold
+        self.bad_threshold = bad_threshold
+        self.coverage_weight = coverage_weight
+        self.cross_encoder = None
+        if cross_encoder_model:
+            try:
+                from sentence_transformers import CrossEncoder
+            except ImportError as e:
+                raise ImportError(
+                    "GRADER_CROSS_ENCODER_MODEL requires the 'sentence-transformers' package."
+                ) from e
+            self.cross_encoder = CrossEncoder(cross_encoder_model, device="cpu")
+
+    async def _semantic_score(self, query: str, chunks: List[str]) -> float:
+        if self.cross_encoder is not None:
+            logits = await asyncio.to_thread(self.cross_encoder.predict, [(query, chunk) for chunk in chunks])
+            return 1 / (1 + math.exp(-float(np.max(logits))))
+
+        # Chunk vectors are usually served by the embedding cache, they were embedded at index time
+        query_vector = np.asarray(await self.embeddings.aembed_query(query), dtype=np.float32)
+        chunk_vectors = np.asarray(await self.embeddings.aembed_documents(chunks), dtype=np.float32)
+        norms = np.linalg.norm(chunk_vectors, axis=1) * np.linalg.norm(query_vector)
+        similarities = (chunk_vectors @ query_vector) / np.where(norms == 0, 1, norms)
+        return float(max(0.0, np.max(similarities)))
+
+    async def ascore(self, query: str, chunks: List[str]) -> float:
+        if not chunks:
+            return 0.0
+        semantic = await self._semantic_score(query, chunks)
+        coverage = query_coverage(query, chunks)
+        return (1 - self.coverage_weight) * semantic + self.coverage_weight * coverage
+
+    def decide(self, score: float) -> Optional[Literal["good", "bad"]]:
+        """Returns the grade, or None if the score lies in the ambiguous band."""
+        if score >= self.good_threshold:
+            return "good"
+        if score <= self.bad_threshold:
+            return "bad"
+        return None
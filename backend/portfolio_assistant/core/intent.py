@@ -0,0 +1,136 @@
+# intent.py
+import re
+import math
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from .state import RouteQuery
+
+# Unambiguous short messages that never need the LLM router
+GREETING_PATTERN = re.compile(
+    r"^(hi|hello|hey|hallo|servus|good (morning|afternoon|evening)|how are you( doing)?|"
+    r"what'?s up|thanks?( you)?( a lot| so much)?|bye|goodbye|see you|nice to meet you)"
+    r"( there)?[\s!.?,:)]*$",
+    re.IGNORECASE,
+)
+# Only requests: the whole message is an imperative or a wish ("I want to / can you / let me ..."),
+# so questions about him ("how did he get in touch with ...") never match
+EMAIL_PATTERN = re.compile(
+    r"^(please\s+)?"
+    r"((i\s+(want|wanna|would\s+like|'d\s+like|'d\s+love)\s+to|i'd\s+(like|love)\s+to|(can|could)\s+(i|you)|"
+    r"may\s+i|let\s+me|help\s+me)\s+(please\s+)?)?"
+    r"(send\s+(him\s+|michael\s+)?an?\s+(e-?mail|message)|e-?mail\s+(him|michael)|contact\s+(him|michael)|"
+    r"get\s+in\s+touch(\s+with\s+(him|michael))?|reach\s+out\s+to\s+(him|michael)|"
+    r"write\s+(to\s+)?(him|michael)(\s+an?\s+(e-?mail|message))?)"
+    r"(\s+for\s+me)?(\s+please)?[\s!.?]*$",
+    re.IGNORECASE,
+)
+# Messages opening with a question word usually ask about him, even when they resemble a
+# greeting or a contact request ("what do you do?"), so the LLM router decides them
+QUESTION_PATTERN = re.compile(
+    r"^(what|how|why|who|whom|whose|where|when|which|is|are|was|were|do|does|did|has|have|had)\b",
+    re.IGNORECASE,
+)
+# Longer messages are more likely to contain an actual question, leave them to the LLM
+MAX_RULE_WORDS = 12
+# Questions are capped to this fraction of the threshold
+QUESTION_CONFIDENCE_FACTOR = 0.9
+
+# Labelled example utterances for the similarity classifier
+LABELLED_EXAMPLES: Dict[str, List[str]] = {
+    "chat": [
+        "hi", "hello there", "hey, how are you?", "good morning",
+        "thanks for the help", "thank you!", "nice to meet you", "bye",
+        "who are you?", "what can you do?", "how is it going?",
+    ],
+    "email": [
+        "I want to email him", "can I contact michael", "how can I reach him",
+        "I would like to send him a message", "please open the contact form",
+        "I want to get in touch with him", "let me write him an email",
+        "can you help me contact him", "I'd like to send an email",
+    ],
+    "search": [
+        "what is his tech stack", "where did he study", "what did he do at hensoldt",
+        "which programming languages does he know", "tell me about his master thesis",
+        "what projects has he worked on", "does he have experience with c++",
+        "what is his current job", "what are his skills in computer vision",
+        "how many years of experience does he have", "what is his email address",
+    ],
+}
+
+
+def _vectorize(text: str) -> Counter:
+    """Bag of character trigrams, a tiny local embedding that needs no model download."""
+    normalized = f"  {' '.join(re.findall(r'[a-z0-9+#]+', text.lower()))}  "
+    return Counter(normalized[i:i + 3] for i in range(len(normalized) - 2))
+
+
+def _norm(vector: Counter) -> float:
+    return math.sqrt(sum(v * v for v in vector.values()))
+
+
+class IntentPreClassifier:
+    """
+    Resolves obvious 'chat' and 'email' intents locally so the LLM router can be skipped.
+    Returns None whenever it is not confident enough; the caller then falls back to the LLM.
+    """
+
+    def __init__(self, threshold: float, examples: Dict[str, List[str]] = LABELLED_EXAMPLES):
+        self.threshold = threshold
+        self.examples: List[Tuple[str, Counter, float]] = []
+        for label, texts in examples.items():
+            for text in texts:
+                vector = _vectorize(text)
+                self.examples.append((label, vector, _norm(vector)))
+        self.hits = 0
+        self.misses = 0
+
+    def _similarity_scores(self, text: str) -> Dict[str, float]:
+        vector = _vectorize(text)
+        norm = _norm(vector)
+        scores: Dict[str, float] = {}
+        for label, example, example_norm in self.examples:
+            similarity = 0.0
+            if norm:
+                dot = sum(count * example[gram] for gram, count in vector.items() if gram in example)
+                similarity = dot / (norm * example_norm)
+            scores[label] = max(scores.get(label, 0.0), similarity)
+        return scores
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """
+        Returns the most likely intent and a confidence between 0 and 1. Apart from greetings,
+        questions stay below the threshold, whatever the rules or the similarity say.
+        """
+        stripped = text.strip()
+        if len(stripped.split()) <= MAX_RULE_WORDS:
+            if GREETING_PATTERN.match(stripped):
+                return "chat", 1.0
+            if EMAIL_PATTERN.match(stripped):
+                return "email", 1.0
+
+        scores = self._similarity_scores(stripped)
+        label = max(scores, key=scores.get)
+        confidence = scores[label]
+        if QUESTION_PATTERN.match(stripped):
+            confidence = min(confidence, self.threshold * QUESTION_CONFIDENCE_FACTOR)
+        return label, confidence
+
+    def classify(self, text: str) -> Optional[RouteQuery]:
+        label, confidence = self.predict(text)
+        # 'search' always needs the LLM to extract a proper search query
+        if label in ("chat", "email") and confidence >= self.threshold:
+            self.hits += 1
+            return RouteQuery(step=label)
+        self.misses += 1
+        return None
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "llm_calls_saved": self.hits,
+            "threshold": self.threshold,
+        }
@@ -0,0 +1,163 @@
+# prompts.py
+import os
+import time
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+from .context import count_message_tokens
+
+logger = logging.getLogger(__name__)
+
+PROMPTS_DIRECTORY = os.path.join(os.path.dirname(__file__), os.pardir, "prompts")
+
+
+@dataclass
+class PromptSpec:
+    """
+    Layout of one prompt: the static system part (prompt files, joined) always comes first and
+    is byte-identical between requests, so provider-side prompt caching can reuse it. The
+    history and the per-request input template follow.
+    """
+    system_files: List[str]
+    input_template: Optional[str] = None
+    history: bool = False
+
+
+# Variable parts (question, context, date) only ever appear in the input template
+PROMPT_SPECS = {
+    "router": PromptSpec(["router_prompt.md"], history=True),
+    "grader": PromptSpec(["grader_prompt.md"], input_template="Question: {query}\nContext: {context}"),
+    "generator": PromptSpec(
+        ["system_prompt.md", "generator_prompt.md"],
+        input_template="**Today's Date is: {current_date}**\n\nQuestion: {query}\nContext: {context}",
+    ),
+    "chat": PromptSpec(["system_prompt.md"], history=True),
+}
+
+
+@dataclass
+class _CompiledPrompt:
+    template: ChatPromptTemplate
+    version: str
+    system_tokens: int
+    calls: int = 0
+    section_tokens: Dict[str, int] = field(default_factory=lambda: {"system": 0, "history": 0, "input": 0})
+
+
+class PromptRegistry:
+    """
+    Loads the prompt files once and compiles every PromptSpec into a ChatPromptTemplate,
+    versioned by the hash of its static part. Files are checked for changes at most every
+    `reload_interval_seconds` (0 disables reloading); changed prompts are recompiled
+    without a restart.
+    """
+
+    def __init__(
+        self,
+        specs: Dict[str, PromptSpec] = PROMPT_SPECS,
+        prompts_directory: str = PROMPTS_DIRECTORY,
+        reload_interval_seconds: float = 2.0,
+    ):
+        self.specs = specs
+        self.prompts_directory = prompts_directory
+        self.reload_interval_seconds = reload_interval_seconds
+        self.reloads = 0
+        self._mtimes: Dict[str, int] = {}
+        self._texts: Dict[str, str] = {}
+        self._compiled: Dict[str, _CompiledPrompt] = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _files(self) -> List[str]:
+        return sorted({file_name for spec in self.specs.values() for file_name in spec.system_files})
+
+    def _mtime(self, file_name: str) -> int:
+        try:
+            return os.stat(os.path.join(self.prompts_directory, file_name)).st_mtime_ns
+        except FileNotFoundError:
+            return -1
+
+    def _read(self, file_name: str) -> str:
+        try:
+            with open(os.path.join(self.prompts_directory, file_name), "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            logger.error("Prompt file not found, using fallback", extra={"file": file_name, "directory": self.prompts_directory})
+            return ""
+
+    def _load(self, changed_files: Optional[List[str]] = None):
+        for file_name in changed_files or self._files():
+            self._mtimes[file_name] = self._mtime(file_name)
+            self._texts[file_name] = self._read(file_name)
+
+        for name, spec in self.specs.items():
+            if changed_files is not None and not set(spec.system_files) & set(changed_files):
+                continue
+            system = SystemMessage(content="\n\n".join(self._texts[file_name] for file_name in spec.system_files))
+            # The static part is a message, not a template, so braces in the prompt files stay literal
+            messages = [system]
+            if spec.history:
+                messages.append(MessagesPlaceholder("history"))
+            if spec.input_template:
+                messages.append(("human", spec.input_template))
+            previous = self._compiled.get(name)
+            compiled = _CompiledPrompt(
+                template=ChatPromptTemplate.from_messages(messages),
+                version=hashlib.sha256(system.content.encode("utf-8")).hexdigest()[:12],
+                system_tokens=count_message_tokens([system]),
+            )
+            if previous:
+                compiled.calls, compiled.section_tokens = previous.calls, previous.section_tokens
+            self._compiled[name] = compiled
+
+    def _maybe_reload(self):
+        if self.reload_interval_seconds <= 0:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval_seconds:
+            return
+        with self._lock:
+            if now - self._checked_at < self.reload_interval_seconds:
+                return
+            self._checked_at = now
+            changed = [file_name for file_name in self._files() if self._mtime(file_name) != self._mtimes.get(file_name)]
+            if changed:
+                self._load(changed)
+                self.reloads += 1
+                logger.info("Reloaded prompts", extra={"files": changed})
+
+    def format(self, name: str, history: Optional[List[BaseMessage]] = None, **variables) -> List[BaseMessage]:
+        """Returns the messages of the named prompt and records their tokens per section."""
+        self._maybe_reload()
+        compiled = self._compiled[name]
+        if self.specs[name].history:
+            variables["history"] = history or []
+        messages = compiled.template.format_messages(**variables)
+
+        history_tokens = count_message_tokens(history or [])
+        compiled.calls += 1
+        compiled.section_tokens["system"] += compiled.system_tokens
+        compiled.section_tokens["history"] += history_tokens
+        compiled.section_tokens["input"] += count_message_tokens(messages) - compiled.system_tokens - history_tokens
+        return messages
+
+    def stats(self) -> dict:
+        stats = {"reloads": self.reloads}
+        for name, compiled in self._compiled.items():
+            stats[name] = {
+                "version": compiled.version,
+                "calls": compiled.calls,
+                # Estimated tokens per request; the 'system' part is the cacheable prefix
+                "avg_tokens": {
+                    section: round(tokens / max(compiled.calls, 1), 1)
+                    for section, tokens in compiled.section_tokens.items()
+                },
+            }
+        return stats
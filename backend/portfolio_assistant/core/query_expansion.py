@@ -0,0 +1,49 @@
+# query_expansion.py
+import re
+import hashlib
+from typing import List
+
+from langchain_core.documents import Document
+
+# Splits compound questions at separators that start a new clause, e.g.
+# "his education and his work at Hensoldt" but not "C++ and Python experience"
+CLAUSE_SPLIT_PATTERN = re.compile(
+    r"\?\s+|;\s*|\s+(?:and also|as well as|and|also|plus)\s+"
+    r"(?=(?:his|her|the|what|where|which|how|when|who|whom|why|does|did|do|is|was|has|had|about)\b)",
+    re.IGNORECASE,
+)
+MIN_SUB_QUERY_WORDS = 2
+
+
+def split_query(query: str, max_sub_queries: int) -> List[str]:
+    """
+    Returns the sub-queries to retrieve for. The full query always comes first, the
+    clauses of a compound question follow. A simple question yields just [query].
+    """
+    clauses = [part.strip(" ,.?!") for part in CLAUSE_SPLIT_PATTERN.split(query)]
+    clauses = [clause for clause in clauses if len(clause.split()) >= MIN_SUB_QUERY_WORDS]
+    if len(clauses) < 2:
+        return [query]
+    return list(dict.fromkeys([query] + clauses))[:max_sub_queries]
+
+
+def merge_results(results: List[List[Document]], max_documents: int) -> List[Document]:
+    """
+    Interleaves the ranked results of all sub-queries and drops duplicate chunks,
+    identified by chunk id or, for identical text under another id, by content hash.
+    """
+    merged = []
+    seen = set()
+    for rank in range(max((len(docs) for docs in results), default=0)):
+        for docs in results:
+            if rank >= len(docs):
+                continue
+            doc = docs[rank]
+            keys = {hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()}
+            if doc.id:
+                keys.add(doc.id)
+            if keys & seen:
+                continue
+            seen |= keys
+            merged.append(doc)
+    return merged[:max_documents]
@@ -0,0 +1,142 @@
+# sessions.py
+import os
+import time
+import uuid
+import asyncio
+import logging
+from typing import Optional, Tuple
+
+import aiosqlite
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+logger = logging.getLogger(__name__)
+
+
+class SessionManager:
+    """
+    Server-side chat sessions. The conversation state of every session is persisted by a
+    LangGraph SQLite checkpointer (one thread per session), so clients only send the new
+    message. Sessions idle for longer than `idle_ttl_seconds` are deleted, and at most
+    `max_sessions` are kept (least recently used first out).
+    """
+
+    def __init__(self, db_path: str, idle_ttl_seconds: float, max_sessions: int):
+        self.db_path = db_path
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_sessions = max_sessions
+        self.checkpointer: Optional[AsyncSqliteSaver] = None
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._checkpoint_conn: Optional[aiosqlite.Connection] = None
+        self._purge_task: Optional[asyncio.Task] = None
+
+    async def aopen(self, purge_interval_seconds: float = 300):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._conn = await aiosqlite.connect(self.db_path)
+        await self._conn.execute("PRAGMA journal_mode=WAL")
+        await self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS chat_sessions (
+                session_id TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+        """)
+        await self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_last_access ON chat_sessions (last_access);")
+        await self._conn.commit()
+
+        # The checkpointer runs its own transactions, it gets a separate connection
+        self._checkpoint_conn = await aiosqlite.connect(self.db_path)
+        self.checkpointer = AsyncSqliteSaver(self._checkpoint_conn)
+        await self.checkpointer.setup()
+        self._purge_task = asyncio.create_task(self._purge_periodically(purge_interval_seconds))
+
+    async def aclose(self):
+        if self._purge_task:
+            self._purge_task.cancel()
+        for conn in (self._conn, self._checkpoint_conn):
+            if conn:
+                await conn.close()
+
+    async def resolve(self, session_id: Optional[str]) -> Tuple[str, bool]:
+        """
+        Returns (session_id, is_new). Unknown or expired ids start a new session under a
+        fresh server-issued id, so clients cannot pick the ids of other sessions.
+        """
+        now = time.time()
+        if session_id:
+            cursor = await self._conn.execute(
+                "SELECT last_access FROM chat_sessions WHERE session_id = ?", (session_id,)
+            )
+            row = await cursor.fetchone()
+            if row and now - row[0] <= self.idle_ttl_seconds:
+                return session_id, False
+
+        session_id = uuid.uuid4().hex
+        await self._conn.execute(
+            "INSERT INTO chat_sessions (session_id, created_at, last_access) VALUES (?, ?, ?)",
+            (session_id, now, now)
+        )
+        await self._conn.commit()
+        return session_id, True
+
+    async def touch(self, session_id: str):
+        """Marks the session as used and drops all but its latest checkpoint."""
+        await self._conn.execute(
+            "UPDATE chat_sessions SET last_access = ? WHERE session_id = ?", (time.time(), session_id)
+        )
+        await self._conn.commit()
+        await self._prune_checkpoints(session_id)
+
+    async def _prune_checkpoints(self, session_id: str):
+        """
+        Deletes all but the latest checkpoint of every namespace of the session. AsyncSqliteSaver
+        does not implement `aprune`, so this works on its tables directly: the layout of
+        `checkpoints` and `writes` is the one of the langgraph-checkpoint-sqlite version pinned
+        in pyproject.toml, and checkpoint ids are time-ordered (uuid6).
+        """
+        for table in ("writes", "checkpoints"):
+            await self._conn.execute(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_id < ("
+                f"SELECT MAX(latest.checkpoint_id) FROM checkpoints AS latest "
+                f"WHERE latest.thread_id = {table}.thread_id AND latest.checkpoint_ns = {table}.checkpoint_ns)",
+                (session_id,)
+            )
+        await self._conn.commit()
+
+    async def delete(self, session_ids):
+        if not session_ids:
+            return
+        for session_id in session_ids:
+            await self.checkpointer.adelete_thread(session_id)
+        await self._conn.executemany(
+            "DELETE FROM chat_sessions WHERE session_id = ?", [(session_id,) for session_id in session_ids]
+        )
+        await self._conn.commit()
+
+    async def purge(self) -> int:
+        """Deletes idle sessions and the least recently used ones above `max_sessions`."""
+        cursor = await self._conn.execute(
+            "SELECT session_id FROM chat_sessions WHERE last_access < ?", (time.time() - self.idle_ttl_seconds,)
+        )
+        expired = [row[0] for row in await cursor.fetchall()]
+        cursor = await self._conn.execute(
+            "SELECT session_id FROM chat_sessions WHERE last_access >= ? ORDER BY last_access DESC LIMIT -1 OFFSET ?",
+            (time.time() - self.idle_ttl_seconds, self.max_sessions)
+        )
+        overflow = [row[0] for row in await cursor.fetchall()]
+        await self.delete(expired + overflow)
+        return len(expired) + len(overflow)
+
+    async def _purge_periodically(self, interval_seconds: float):
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                purged = await self.purge()
+                if purged:
+                    logger.info("Purged sessions", extra={"purged": purged})
+            except Exception:
+                logger.exception("Purging sessions failed")
+
+    async def count(self) -> int:
+        cursor = await self._conn.execute("SELECT COUNT(*) FROM chat_sessions")
+        (count,) = await cursor.fetchone()
+        return count
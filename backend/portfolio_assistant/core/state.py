@@ -7,14 +7,22 @@ class State(TypedDict):
     messages: Annotated[List[Any], add_messages]
     router_decision: dict
     search_context: str
+    search_chunks: List[str]
+    retrieval_timings: dict
     grade: Literal["good", "bad"]
     next_action: str = "none"
+    cache_hit: bool
+    pipeline_started_at: float
 
 class RouteQuery(BaseModel):
     step: Literal["search", "email", "chat"] = Field(
         description="The next step to take: 'search' for retrieving information about Michael, 'email' to contact Michael, or 'chat' for general conversation."
     )
     search_query: str = Field(default="", description="The search query if step is 'search'.")
+    sub_queries: List[str] = Field(
+        default_factory=list,
+        description="If the search question covers several distinct topics, one short search query per topic."
+    )
 
 class Grade(BaseModel):
     score: Literal["good", "bad"] = Field(
@@ -0,0 +1,124 @@
+# batch_embedding.py
+import os
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Deque, List, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# Embedding requests running at the same time during index updates
+EMBEDDING_MAX_IN_FLIGHT = int(os.getenv("EMBEDDING_MAX_IN_FLIGHT", "4"))
+# Attempts per batch before the index update fails (the provider client retries on its own as well)
+EMBEDDING_MAX_ATTEMPTS = int(os.getenv("EMBEDDING_MAX_ATTEMPTS", "5"))
+EMBEDDING_RETRY_BASE_SECONDS = float(os.getenv("EMBEDDING_RETRY_BASE_SECONDS", "1"))
+
+
+@dataclass
+class EmbeddedBatch:
+    """Chunks with their vectors; `sequence` numbers the batches in the order they were queued."""
+    sequence: int
+    ids: List[str]
+    documents: List[Document]
+    vectors: List[List[float]]
+
+
+class BatchEmbedder:
+    """
+    Embeds (chunk id, document) pairs in batches of `batch_size` on a thread pool, with at most
+    `max_in_flight` requests running. `add` blocks while that many are running, which holds back
+    the producer (file parsing) instead of queueing the whole corpus. Failed batches are retried
+    with exponential backoff and jitter; after `max_attempts` the error is raised by `completed`.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: int = 256,
+        max_in_flight: int = EMBEDDING_MAX_IN_FLIGHT,
+        max_attempts: int = EMBEDDING_MAX_ATTEMPTS,
+        retry_base_seconds: float = EMBEDDING_RETRY_BASE_SECONDS,
+    ):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_in_flight = max(max_in_flight, 1)
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.batches = 0
+        self.retries = 0
+        self._buffer: List[Tuple[str, Document]] = []
+        self._futures: Deque[Future] = deque()
+        self._closed = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="embedding")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        # Batches waiting for a retry give up instead of delaying the shutdown
+        self._closed.set()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def add(self, chunks: List[Tuple[str, Document]]) -> int:
+        """Queues chunks and returns the sequence number of the batch holding the last one."""
+        self._buffer.extend(chunks)
+        while len(self._buffer) >= self.batch_size:
+            self._submit(self._buffer[:self.batch_size])
+            del self._buffer[:self.batch_size]
+        return self.batches if self._buffer else self.batches - 1
+
+    def completed(self) -> List[EmbeddedBatch]:
+        """The batches finished so far, in queue order (a batch waits for the ones before it)."""
+        finished = []
+        while self._futures and self._futures[0].done():
+            finished.append(self._futures.popleft().result())
+        return finished
+
+    def finish(self) -> List[EmbeddedBatch]:
+        """Sends the remaining chunks and waits for all batches."""
+        if self._buffer:
+            self._submit(self._buffer)
+            self._buffer = []
+        finished = []
+        while self._futures:
+            finished.append(self._futures.popleft().result())
+        return finished
+
+    def _submit(self, chunks: List[Tuple[str, Document]]):
+        # Backpressure: wait until fewer than max_in_flight requests are running
+        while sum(not future.done() for future in self._futures) >= self.max_in_flight:
+            wait([future for future in self._futures if not future.done()], return_when=FIRST_COMPLETED)
+        self._futures.append(self._executor.submit(self._embed, self.batches, list(chunks)))
+        self.batches += 1
+
+    def _embed(self, sequence: int, chunks: List[Tuple[str, Document]]) -> EmbeddedBatch:
+        texts = [document.page_content for _, document in chunks]
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+                break
+            except Exception as e:
+                if attempt >= self.max_attempts or self._closed.is_set():
+                    logger.error("Embedding batch failed", extra={"batch": sequence, "attempts": attempt, "error": str(e)})
+                    raise
+                self.retries += 1
+                # Jitter keeps the parallel batches from retrying in lockstep after a rate limit
+                delay = self.retry_base_seconds * 2 ** (attempt - 1) * random.uniform(0.5, 1.0)
+                logger.warning("Embedding batch failed, retrying", extra={"batch": sequence, "error": str(e), "retry_in_seconds": round(delay, 2)})
+                if self._closed.wait(delay):
+                    raise
+        return EmbeddedBatch(
+            sequence=sequence,
+            ids=[chunk_id for chunk_id, _ in chunks],
+            documents=[document for _, document in chunks],
+            vectors=vectors,
+        )
@@ -1,56 +1,294 @@
-import datetime
-from typing import Optional
-from langchain_core.tools import tool
+import re
+import time
+import logging
+import asyncio
+import threading
+from typing import List, Optional, Tuple
 import sqlite3
 import os
 
-DB_PATH = os.path.abspath(
+logger = logging.getLogger(__name__)
+
+# The owner's review log; benchmarks and tests point QUESTION_DB_PATH at a scratch file
+DB_PATH = os.getenv("QUESTION_DB_PATH") or os.path.abspath(
     os.path.join(
-        os.path.dirname(__file__), 
-        os.pardir, 
-        os.pardir, 
-        "data", 
-        "questions", 
+        os.path.dirname(__file__),
+        os.pardir,
+        os.pardir,
+        "data",
+        "questions",
         "unanswered_questions.db"
     )
 )
+# The writer commits once this many questions are queued, or after the interval at the latest
+QUESTION_LOG_BATCH_SIZE = int(os.getenv("QUESTION_LOG_BATCH_SIZE", "100"))
+QUESTION_LOG_FLUSH_INTERVAL_SECONDS = float(os.getenv("QUESTION_LOG_FLUSH_INTERVAL_SECONDS", "2"))
+# Questions beyond this backlog are dropped instead of growing memory under bot traffic
+QUESTION_LOG_MAX_QUEUE = int(os.getenv("QUESTION_LOG_MAX_QUEUE", "10000"))
+
+NORMALIZE_PATTERN = re.compile(r"[^\w\s+#]")
+
+# Repeated questions only bump the counter and the last timestamp of the existing row
+UPSERT_QUESTION_SQL = """
+    INSERT INTO unanswered_questions (question, normalized_question, user_name, timestamp, last_timestamp, ask_count)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (normalized_question) DO UPDATE SET
+        ask_count = ask_count + excluded.ask_count,
+        last_timestamp = excluded.last_timestamp
+"""
+# Materialized per-day counts, kept up to date in the same transaction as the upsert,
+# so time range queries never scan the raw questions
+UPSERT_DAILY_SQL = """
+    INSERT INTO unanswered_question_daily (day, question_id, ask_count)
+    SELECT ?, id, ? FROM unanswered_questions WHERE normalized_question = ?
+    ON CONFLICT (day, question_id) DO UPDATE SET ask_count = ask_count + excluded.ask_count
+"""
+
+_setup_lock = threading.Lock()
+_setup_done = set()
+
+
+def normalize_question(question: str) -> str:
+    """'What is his GPA?' and 'what is his  GPA' are the same question for review purposes."""
+    return " ".join(NORMALIZE_PATTERN.sub(" ", question.lower()).split())
+
+
+def connect(db_path: str = DB_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # WAL makes NORMAL durable enough for a review log and avoids an fsync per commit
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def upsert_questions(conn: sqlite3.Connection, entries: List[Tuple[str, str, str]]) -> int:
+    """
+    Writes (question, user_name, ISO timestamp) entries in one transaction. Repeats within the
+    batch are merged before they reach SQLite. Returns the number of upserted question rows.
+    """
+    merged = {}
+    daily = {}
+    for question, user_name, timestamp in entries:
+        normalized = normalize_question(question)
+        if normalized in merged:
+            row = merged[normalized]
+            row[4] = max(row[4], timestamp)
+            row[5] += 1
+        else:
+            merged[normalized] = [question, normalized, user_name, timestamp, timestamp, 1]
+        day_key = (timestamp[:10], normalized)
+        daily[day_key] = daily.get(day_key, 0) + 1
+    with conn:
+        conn.executemany(UPSERT_QUESTION_SQL, [tuple(row) for row in merged.values()])
+        conn.executemany(UPSERT_DAILY_SQL, [(day, count, normalized) for (day, normalized), count in daily.items()])
+    return len(merged)
 
-def insert_unanswered_question(question: str, user_name: str, timestamp: str) -> str:
+
+def insert_unanswered_question(question: str, user_name: str, timestamp: str, db_path: str = DB_PATH) -> str:
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                "INSERT INTO unanswered_questions (question, user_name, timestamp) VALUES (?, ?, ?)",
-                (question, user_name, timestamp)
-            )
+        setup_database(db_path)
+        conn = sqlite3.connect(db_path)
+        try:
+            upsert_questions(conn, [(question, user_name, timestamp)])
+        finally:
+            conn.close()
         return f"Question logged: '{question}' by {user_name} at {timestamp}"
 
     except sqlite3.Error as e:
         raise RuntimeError(f"Database insertion failed: {e}") from e
 
-def setup_database():
-    db_dir = os.path.dirname(DB_PATH)
-    os.makedirs(db_dir, exist_ok=True)
-    
-    conn = None
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS unanswered_questions (
-                id INTEGER PRIMARY KEY,
-                question TEXT NOT NULL,
-                user_name TEXT,
-                timestamp TEXT NOT NULL
-            );
-        """)
-        conn.commit()
-    except sqlite3.Error as e:
-        print(f"ERROR: Database setup failed: {e}")
-    finally:
-        if conn:
-            conn.close()
 
-setup_database()
\ No newline at end of file
+def _migrate(conn: sqlite3.Connection):
+    """Adds the dedup columns to databases created before questions were counted and merges duplicates."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(unanswered_questions)")}
+    if "normalized_question" in columns:
+        return
+    conn.execute("ALTER TABLE unanswered_questions ADD COLUMN normalized_question TEXT")
+    conn.execute("ALTER TABLE unanswered_questions ADD COLUMN last_timestamp TEXT")
+    conn.execute("ALTER TABLE unanswered_questions ADD COLUMN ask_count INTEGER NOT NULL DEFAULT 1")
+
+    kept = {}
+    for row_id, question, timestamp in conn.execute(
+        "SELECT id, question, timestamp FROM unanswered_questions ORDER BY id"
+    ).fetchall():
+        normalized = normalize_question(question)
+        if normalized in kept:
+            kept_id = kept[normalized]
+            conn.execute(
+                "UPDATE unanswered_questions SET ask_count = ask_count + 1, last_timestamp = ? WHERE id = ?",
+                (timestamp, kept_id)
+            )
+            conn.execute("DELETE FROM unanswered_questions WHERE id = ?", (row_id,))
+        else:
+            kept[normalized] = row_id
+            conn.execute(
+                "UPDATE unanswered_questions SET normalized_question = ?, last_timestamp = ? WHERE id = ?",
+                (normalized, timestamp, row_id)
+            )
+
+
+def setup_database(db_path: str = DB_PATH):
+    """Creates (or migrates) the table once per process and database file."""
+    if db_path in _setup_done:
+        return
+    with _setup_lock:
+        if db_path in _setup_done:
+            return
+        db_dir = os.path.dirname(db_path)
+        os.makedirs(db_dir, exist_ok=True)
+
+        conn = None
+        try:
+            conn = connect(db_path)
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS unanswered_questions (
+                    id INTEGER PRIMARY KEY,
+                    question TEXT NOT NULL,
+                    user_name TEXT,
+                    timestamp TEXT NOT NULL,
+                    normalized_question TEXT,
+                    last_timestamp TEXT,
+                    ask_count INTEGER NOT NULL DEFAULT 1
+                );
+            """)
+            _migrate(conn)
+            cursor.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_unanswered_questions_normalized
+                ON unanswered_questions (normalized_question);
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_unanswered_questions_timestamp ON unanswered_questions (timestamp);")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_unanswered_questions_last_timestamp ON unanswered_questions (last_timestamp);")
+
+            daily_exists = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'unanswered_question_daily'"
+            ).fetchone()
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS unanswered_question_daily (
+                    day TEXT NOT NULL,
+                    question_id INTEGER NOT NULL REFERENCES unanswered_questions (id),
+                    ask_count INTEGER NOT NULL,
+                    PRIMARY KEY (day, question_id)
+                ) WITHOUT ROWID;
+            """)
+            if not daily_exists:
+                # Older databases only know the first day of a question, attribute all its asks to it
+                cursor.execute("""
+                    INSERT INTO unanswered_question_daily (day, question_id, ask_count)
+                    SELECT substr(timestamp, 1, 10), id, ask_count FROM unanswered_questions;
+                """)
+            conn.commit()
+            _setup_done.add(db_path)
+        except sqlite3.Error as e:
+            logger.error("Database setup failed: %s", e)
+        finally:
+            if conn:
+                conn.close()
+
+
+class UnansweredQuestionWriter:
+    """
+    Logs unanswered questions without blocking the request path. Questions are queued and a
+    single background task writes them in batches, one transaction per batch, on a long-lived
+    WAL connection. Repeats of a question (after normalization) are merged into one row with
+    a counter, already within a batch.
+    """
+
+    def __init__(
+        self,
+        db_path: str = DB_PATH,
+        batch_size: int = QUESTION_LOG_BATCH_SIZE,
+        flush_interval_seconds: float = QUESTION_LOG_FLUSH_INTERVAL_SECONDS,
+        max_queue: int = QUESTION_LOG_MAX_QUEUE,
+    ):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_queue = max_queue
+        self.queued = 0
+        self.written_rows = 0
+        self.batches = 0
+        self.dropped = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        await asyncio.to_thread(setup_database, self.db_path)
+        self._conn = await asyncio.to_thread(connect, self.db_path)
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def aclose(self):
+        """Stops the writer after flushing everything that is still queued."""
+        if self._task:
+            await self._queue.put(None)
+            await self._task
+            self._task = None
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    def enqueue(self, question: str, user_name: str, timestamp: str) -> bool:
+        """Queues a question; returns False if the backlog is full and the question was dropped."""
+        try:
+            self._queue.put_nowait((question, user_name, timestamp))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.queued += 1
+        return True
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            # None is the shutdown marker queued by aclose, nothing is pending behind it
+            if first is None:
+                return
+            # The interval starts with the first question of the batch
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval_seconds
+            # Collect until the batch is full or the oldest question waited for the interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                    except asyncio.TimeoutError:
+                        break
+                if batch[-1] is None:
+                    break
+            # Everything queued before the shutdown marker is still written
+            if batch[-1] is None:
+                batch.pop()
+                stopping = True
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception:
+                logger.exception("Writing unanswered questions failed", extra={"questions": len(batch)})
+
+    def _write_batch(self, batch: List[Tuple[str, str, str]]):
+        self.written_rows += upsert_questions(self._conn, batch)
+        self.batches += 1
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queued,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "rows_written": self.written_rows,
+            "batches": self.batches,
+            "dropped": self.dropped,
+        }
+
+
+question_writer = UnansweredQuestionWriter()
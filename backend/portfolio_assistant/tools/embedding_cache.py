@@ -0,0 +1,167 @@
+# embedding_cache.py
+import os
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding model with a persistent SQLite cache keyed by (model name, text hash).
+    Vectors are stored as float32 blobs. Once more than `max_entries` vectors are stored,
+    the least recently used ones are evicted.
+
+    Access times of hits are buffered and written in batches (every `touch_batch_size` hits,
+    after `touch_interval_seconds` or before an eviction), and the row count is kept in memory,
+    so a hit is a single SELECT. The async methods run the SQLite work in a worker thread.
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: str, db_path: str, max_entries: int = 100_000,
+                 touch_batch_size: int = 256, touch_interval_seconds: float = 60.0):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.touch_batch_size = touch_batch_size
+        self.touch_interval_seconds = touch_interval_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched: dict = {}
+        self._touched_flushed_at = time.monotonic()
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        # Retrievers embed queries from worker threads, access is serialized by the lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            );
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access);")
+        self._conn.commit()
+        # Counts the rows this process inserted on top of the ones present at start, other
+        # workers sharing the file are only seen when an eviction recounts
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _lookup(self, texts: List[str]) -> dict:
+        """Returns {text_hash: vector} for all cached texts and records their access time."""
+        hashes = list({self._hash(text) for text in texts})
+        found = {}
+        with self._lock:
+            # Stay below SQLite's default limit of bound parameters per statement
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                    [self.model_name, *batch]
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                self._touched.update((text_hash, now) for text_hash in found)
+                if (len(self._touched) >= self.touch_batch_size
+                        or time.monotonic() - self._touched_flushed_at >= self.touch_interval_seconds):
+                    self._flush_touched()
+                    self._conn.commit()
+        return found
+
+    def _flush_touched(self):
+        """Writes the buffered access times, the caller holds the lock and commits."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                [(accessed_at, self.model_name, text_hash) for text_hash, accessed_at in self._touched.items()]
+            )
+            self._touched.clear()
+        self._touched_flushed_at = time.monotonic()
+
+    def _store(self, texts: List[str], vectors: List[List[float]]):
+        now = time.time()
+        with self._lock:
+            # A text cached meanwhile (another thread or worker) has the same vector, it is kept
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, text_hash, vector, last_access) VALUES (?, ?, ?, ?)",
+                [
+                    (self.model_name, self._hash(text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for text, vector in zip(texts, vectors)
+                ]
+            )
+            self._count += max(cursor.rowcount, 0)
+            if self._count > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Least recently used by the access times of all hits so far
+        self._flush_touched()
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_access LIMIT ?)",
+                (count - self.max_entries,)
+            )
+        self._count = min(count, self.max_entries)
+
+    def _split(self, texts: List[str]):
+        cached = self._lookup(texts)
+        missing = list(dict.fromkeys(text for text in texts if self._hash(text) not in cached))
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        return cached, missing
+
+    def _merge(self, texts: List[str], cached: dict, missing: List[str], vectors: List[List[float]]):
+        if missing:
+            self._store(missing, vectors)
+            cached.update({self._hash(text): vector for text, vector in zip(missing, vectors)})
+        return [cached[self._hash(text)] for text in texts]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached, missing = self._split(texts)
+        vectors = self.underlying.embed_documents(missing) if missing else []
+        return self._merge(texts, cached, missing, vectors)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached, missing = await asyncio.to_thread(self._split, texts)
+        if not missing:
+            return self._merge(texts, cached, missing, [])
+        vectors = await self.underlying.aembed_documents(missing)
+        return await asyncio.to_thread(self._merge, texts, cached, missing, vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        cached, missing = self._split([text])
+        vectors = [self.underlying.embed_query(text)] if missing else []
+        return self._merge([text], cached, missing, vectors)[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # The lock is shared with the indexing threads, waiting for it must not block the event loop
+        cached, missing = await asyncio.to_thread(self._split, [text])
+        if not missing:
+            return self._merge([text], cached, missing, [])[0]
+        vectors = [await self.underlying.aembed_query(text)]
+        return (await asyncio.to_thread(self._merge, [text], cached, missing, vectors))[0]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
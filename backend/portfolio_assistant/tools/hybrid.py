@@ -0,0 +1,109 @@
+# hybrid.py
+import re
+import math
+from collections import Counter, defaultdict
+from typing import List
+
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+
+# Keeps technology names like 'c++', 'c#' or 'node.js' as single tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[+#]+|\.[a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def document_key(doc: Document) -> str:
+    return doc.id or doc.page_content
+
+
+class BM25Index:
+    """In-process inverted index with Okapi BM25 scoring."""
+
+    def __init__(self, documents: List[Document], k1: float = 1.5, b: float = 0.75):
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)  # term -> [(doc index, term frequency)]
+        self.doc_lengths = []
+
+        for index, doc in enumerate(documents):
+            # Header metadata is indexed too, a section title is a strong signal for exact terms
+            headers = " ".join(str(value) for key, value in doc.metadata.items() if key.startswith("Header"))
+            terms = tokenize(f"{headers} {doc.page_content}")
+            self.doc_lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                self.postings[term].append((index, frequency))
+
+        self.avg_doc_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+
+    def _idf(self, term: str) -> float:
+        doc_frequency = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.documents) - doc_frequency + 0.5) / (doc_frequency + 0.5))
+
+    def search(self, query: str, k: int) -> List[Document]:
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self._idf(term)
+            for index, frequency in self.postings.get(term, ()):
+                length_norm = 1 - self.b + self.b * self.doc_lengths[index] / (self.avg_doc_length or 1)
+                scores[index] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+        ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [self.documents[index] for index in ranked]
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore: VectorStore) -> "BM25Index":
+        """Builds the index from the chunks stored in a Chroma collection."""
+        stored = vectorstore.get(include=["documents", "metadatas"])
+        documents = [
+            Document(id=doc_id, page_content=content, metadata=metadata or {})
+            for doc_id, content, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"])
+        ]
+        return cls(documents)
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], weights: List[float], rrf_k: int = 60) -> List[Document]:
+    """Fuses ranked lists with weighted RRF: score(d) = sum_i w_i / (rrf_k + rank_i(d))."""
+    scores = defaultdict(float)
+    documents = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc in enumerate(ranking, start=1):
+            key = document_key(doc)
+            scores[key] += weight / (rrf_k + rank)
+            documents.setdefault(key, doc)
+    return [documents[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+class HybridRetriever(BaseRetriever):
+    """Combines dense vector search and BM25 keyword search with reciprocal rank fusion."""
+
+    vectorstore: VectorStore
+    bm25: BM25Index
+    k: int = 5
+    # Candidates taken from each retriever before fusion
+    fetch_k: int = 20
+    vector_weight: float = 1.0
+    bm25_weight: float = 1.0
+    rrf_k: int = 60
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _fuse(self, dense: List[Document], sparse: List[Document]) -> List[Document]:
+        fused = reciprocal_rank_fusion([dense, sparse], [self.vector_weight, self.bm25_weight], self.rrf_k)
+        return fused[:self.k]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        dense = self.vectorstore.similarity_search(query, k=self.fetch_k) if self.vector_weight > 0 else []
+        sparse = self.bm25.search(query, self.fetch_k) if self.bm25_weight > 0 else []
+        return self._fuse(dense, sparse)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        dense = await self.vectorstore.asimilarity_search(query, k=self.fetch_k) if self.vector_weight > 0 else []
+        sparse = self.bm25.search(query, self.fetch_k) if self.bm25_weight > 0 else []
+        return self._fuse(dense, sparse)
@@ -0,0 +1,211 @@
+# ingestion.py
+"""
+Parsing and splitting of source files, run in worker processes. Only light imports here,
+every worker process imports this module on startup.
+"""
+import os
+import re
+import json
+import math
+import logging
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional
+
+from pypdf import PdfReader
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter, MarkdownHeaderTextSplitter
+
+logger = logging.getLogger(__name__)
+
+# Worker processes for parsing (0 parses in the calling process)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(os.cpu_count() or 1, 8))))
+# Fewer files than this are parsed in the calling process, starting workers would take longer
+INGEST_PARALLEL_MIN_FILES = int(os.getenv("INGEST_PARALLEL_MIN_FILES", "16"))
+
+HEADERS_TO_SPLIT_ON = [
+    ("#", "Header1"),
+    ("##", "Header2"),
+    ("###", "Header3"),
+]
+# Lines this much larger than the body text are headings
+HEADING_SIZE_RATIO = 1.15
+MAX_HEADING_LENGTH = 120
+BULLET_PATTERN = re.compile(r"^\s*[•◦▪‣●○■□·\-–*]\s+")
+
+
+@dataclass
+class ParsedFile:
+    """The chunks of one source file and its size in pages (1 for text files)."""
+    path: str
+    splits: List[Document]
+    pages: int
+
+
+def _sidecar_path(source_path: str) -> str:
+    base, _ = os.path.splitext(source_path)
+    return base + ".json"
+
+
+def _load_sidecar(source_path: str) -> dict:
+    sidecar_path = _sidecar_path(source_path)
+    if not os.path.exists(sidecar_path):
+        return {}
+    logger.debug("Found sidecar", extra={"source": os.path.basename(source_path)})
+    try:
+        with open(sidecar_path, 'r') as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        logger.warning("Invalid JSON in sidecar, skipping it", extra={"sidecar": os.path.basename(sidecar_path)})
+        return {}
+
+
+def _scale(matrix) -> float:
+    return math.hypot(matrix[1], matrix[3]) or 1.0
+
+
+def _page_lines(page) -> List[dict]:
+    """Text lines of a page with their effective font size and whether they are bold."""
+    lines: List[dict] = []
+    current = {"text": "", "size": 0.0, "bold": True}
+
+    def end_line():
+        nonlocal current
+        if current["text"].strip():
+            lines.append({**current, "text": current["text"].strip()})
+        current = {"text": "", "size": 0.0, "bold": True}
+
+    def visit(text, cm, tm, font_dict, font_size):
+        parts = text.split("\n")
+        for i, part in enumerate(parts):
+            if i > 0:
+                end_line()
+            if part.strip():
+                current["text"] += part
+                current["size"] = max(current["size"], font_size * _scale(tm) * _scale(cm))
+                font_name = str((font_dict or {}).get("/BaseFont", ""))
+                current["bold"] = current["bold"] and "bold" in font_name.lower()
+
+    page.extract_text(visitor_text=visit)
+    end_line()
+    return lines
+
+
+def pdf_to_markdown(source_path: str) -> tuple[str, int]:
+    """
+    Rebuilds the structure of a PDF as markdown: lines set in a larger font than the body
+    become #/##/### headings (largest first), short bold lines at body size the next level,
+    and bullet glyphs become '- ' list items. Returns the markdown and the number of pages.
+    """
+    reader = PdfReader(source_path)
+    pages = [_page_lines(page) for page in reader.pages]
+    lines = [line for page in pages for line in page]
+    if not lines:
+        return "", len(reader.pages)
+
+    # The body size is the one most characters are set in
+    size_chars = Counter()
+    for line in lines:
+        size_chars[round(line["size"], 1)] += len(line["text"])
+    body_size = size_chars.most_common(1)[0][0]
+    heading_sizes = sorted(
+        {round(line["size"], 1) for line in lines
+         if line["size"] > body_size * HEADING_SIZE_RATIO and len(line["text"]) <= MAX_HEADING_LENGTH},
+        reverse=True,
+    )
+    levels = {size: min(i + 1, 3) for i, size in enumerate(heading_sizes)}
+    bold_level = min(len(heading_sizes) + 1, 3)
+
+    markdown = []
+    for line in lines:
+        text, size = line["text"], round(line["size"], 1)
+        if text.isdigit():
+            # Page numbers
+            continue
+        if size in levels and len(text) <= MAX_HEADING_LENGTH:
+            markdown.append(f"\n{'#' * levels[size]} {text}\n")
+        elif line["bold"] and size == body_size and len(text) <= 80 and not text.endswith("."):
+            markdown.append(f"\n{'#' * bold_level} {text}\n")
+        elif BULLET_PATTERN.match(text):
+            markdown.append("- " + BULLET_PATTERN.sub("", text))
+        else:
+            markdown.append(text)
+    return "\n".join(markdown).strip(), len(reader.pages)
+
+
+def load_file(source_path: str) -> tuple[List[Document], int]:
+    """Loads a source file as documents with its sidecar metadata, and its number of pages."""
+    if source_path.endswith(".pdf"):
+        content, pages = pdf_to_markdown(source_path)
+    else:
+        with open(source_path, "r", encoding="utf-8") as f:
+            content, pages = f.read(), 1
+    metadata = {"source": source_path, **_load_sidecar(source_path), "source_filename": os.path.basename(source_path)}
+    if source_path.endswith(".pdf"):
+        metadata["pages"] = pages
+    return [Document(page_content=content, metadata=metadata)], pages
+
+
+def split_documents_markdown(docs: List[Document]) -> List[Document]:
+    """
+    Splits documents at their #/##/### headings; the chunks carry the headings as Header1/2/3
+    metadata. PDFs (converted to markdown by `pdf_to_markdown`) have long sections, their
+    sections are split further into chunks of about 1000 characters.
+    """
+    markdown_splitter = MarkdownHeaderTextSplitter(
+        headers_to_split_on=HEADERS_TO_SPLIT_ON,
+        strip_headers=False # Keep the headings in the content for context
+    )
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+
+    splits = []
+    for doc in docs:
+        source_filename = doc.metadata.get("source_filename", "")
+        if not source_filename.endswith(('.md', '.txt', '.pdf')):
+            splits.extend(text_splitter.split_documents([doc]))
+            continue
+
+        markdown_splits = markdown_splitter.split_text(doc.page_content)
+        # Carry over metadata (like source_filename) to the new chunks
+        for split in markdown_splits:
+            # Add the specific header level metadata (e.g., 'Header2': 'PROFESSIONAL EXPERIENCE')
+            split.metadata.update(doc.metadata)
+        if source_filename.endswith(".pdf"):
+            markdown_splits = text_splitter.split_documents(markdown_splits)
+        splits.extend(markdown_splits)
+
+    return splits
+
+
+def parse_file(source_path: str) -> ParsedFile:
+    docs, pages = load_file(source_path)
+    return ParsedFile(path=source_path, splits=split_documents_markdown(docs), pages=pages)
+
+
+def iter_parsed_files(source_paths: Iterable[str], workers: Optional[int] = None) -> Iterator[ParsedFile]:
+    """
+    Parses and splits the files, in `workers` processes for larger batches, and yields them
+    in input order. At most two files per worker are parsed ahead of the consumer, so a large
+    corpus is never held in memory at once.
+    """
+    source_paths = list(source_paths)
+    workers = INGEST_WORKERS if workers is None else workers
+    if workers <= 1 or len(source_paths) < INGEST_PARALLEL_MIN_FILES:
+        for source_path in source_paths:
+            yield parse_file(source_path)
+        return
+
+    # Spawned workers only import this module; forking the server (with its threads) is unsafe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        pending = iter(source_paths)
+        in_flight = [executor.submit(parse_file, path) for path in _take(pending, 2 * workers)]
+        while in_flight:
+            parsed = in_flight.pop(0).result()
+            in_flight.extend(executor.submit(parse_file, path) for path in _take(pending, 1))
+            yield parsed
+
+
+def _take(iterator: Iterator[str], count: int) -> List[str]:
+    return [item for _, item in zip(range(count), iterator)]
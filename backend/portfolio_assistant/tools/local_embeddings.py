@@ -0,0 +1,155 @@
+# local_embeddings.py
+import os
+import asyncio
+import logging
+from typing import List, Optional, Set
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+MISSING_PACKAGES_MESSAGE = (
+    "EMBEDDING_BACKEND=onnx requires the 'onnx' extra (onnxruntime, tokenizers, huggingface-hub): "
+    "uv sync --extra onnx, or pip install onnxruntime tokenizers huggingface-hub."
+)
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings on the CPU with onnxruntime: a (quantized) ONNX export of a
+    sentence-transformers model, mean-pooled and L2-normalized like sentence-transformers does.
+    `model` is a local directory or a Hugging Face repo with `tokenizer.json` and `onnx_file`;
+    a repo is downloaded on first use into the Hugging Face cache (HF_HUB_OFFLINE=1 then never calls out).
+    Raises ImportError without the packages of the `onnx` extra and OSError if the files cannot be loaded.
+    """
+
+    def __init__(self, model: str, onnx_file: str, max_length: int = 256, batch_size: int = 32, threads: int = 0):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(MISSING_PACKAGES_MESSAGE) from e
+
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer.from_file(self._model_file(model, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        if self.tokenizer.padding is None:
+            self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            self._model_file(model, onnx_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        logger.info("Loaded local embedding model", extra={"model": model, "onnx_file": onnx_file})
+
+    @staticmethod
+    def _model_file(model: str, filename: str) -> str:
+        if os.path.isdir(model):
+            return os.path.join(model, filename)
+        try:
+            from huggingface_hub import hf_hub_download
+        except ImportError as e:
+            raise ImportError(MISSING_PACKAGES_MESSAGE) from e
+        try:
+            return hf_hub_download(model, filename)
+        except Exception as e:
+            raise OSError(
+                f"Could not load '{filename}' of '{model}': it is neither cached nor downloadable ({e}). "
+                "Run once with network access or set LOCAL_EMBEDDING_MODEL to a local directory."
+            ) from e
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self.session.run(None, feeds)[0]
+
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        # Texts of similar length share a batch, so little of it is padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = np.empty((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            indices = order[start:start + self.batch_size]
+            batch = self._embed_batch([texts[i] for i in indices])
+            if vectors.shape[1] == 0:
+                vectors = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+            vectors[indices] = batch
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class BatchedQueryEmbeddings(Embeddings):
+    """
+    Collects the async queries arriving within `max_wait_seconds` (or until `max_batch`) and embeds
+    them with one `aembed_documents` call of the underlying local model, so concurrent requests share
+    a forward pass instead of queueing for the CPU one by one.
+    """
+
+    def __init__(self, underlying: Embeddings, max_wait_seconds: float = 0.002, max_batch: int = 32):
+        self.underlying = underlying
+        self.max_wait_seconds = max_wait_seconds
+        self.max_batch = max_batch
+        self.batches = 0
+        self.queries = 0
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # The event loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.underlying.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.underlying.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_seconds, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if pending:
+            task = asyncio.ensure_future(self._embed(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _embed(self, pending: List[tuple]):
+        self.batches += 1
+        self.queries += len(pending)
+        try:
+            vectors = await self.underlying.aembed_documents([text for text, _ in pending])
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), vector in zip(pending, vectors):
+            if not future.done():
+                future.set_result(vector)
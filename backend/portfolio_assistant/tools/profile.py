@@ -0,0 +1,113 @@
+# profile.py
+"""
+Portfolio facts precomputed from the indexed chunks whenever the index changes: the documents
+with their sections, the text of every section and the phrases the documents emphasize.
+Served by GET /profile, so the frontend can show common answers without an LLM call.
+"""
+import os
+import re
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from typing import Optional
+
+from langchain_core.vectorstores import VectorStore
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FILE = "data/vectordb/profile.json"
+PROFILE_SECTION_MAX_CHARS = int(os.getenv("PROFILE_SECTION_MAX_CHARS", "1500"))
+PROFILE_MAX_HIGHLIGHTS = int(os.getenv("PROFILE_MAX_HIGHLIGHTS", "30"))
+HEADER_KEYS = ("Header1", "Header2", "Header3")
+BOLD_PATTERN = re.compile(r"\*\*([^*\n]{2,80})\*\*")
+HEADING_LINE_PATTERN = re.compile(r"^#{1,6}\s.*$", re.MULTILINE)
+# Longest repeated text looked for between consecutive chunks (the splitters overlap by 200)
+MAX_CHUNK_OVERLAP = 400
+# Shorter matches are coincidences (a shared letter or word), not overlap
+MIN_CHUNK_OVERLAP = 20
+
+
+def _merge_chunks(texts: list[str]) -> str:
+    """Joins the chunks of a section in order, without the part one chunk repeats of the previous."""
+    merged = ""
+    for text in texts:
+        overlap = next(
+            (size for size in range(min(len(merged), len(text), MAX_CHUNK_OVERLAP), MIN_CHUNK_OVERLAP - 1, -1)
+             if merged.endswith(text[:size])),
+            0,
+        ) if merged else 0
+        merged += ("\n" if merged and not overlap else "") + text[overlap:]
+    return merged
+
+
+def build_profile(vectorstore: VectorStore) -> dict:
+    stored = vectorstore.get(include=["documents", "metadatas"])
+    documents: dict[str, dict] = {}
+    sections: dict[tuple, list[str]] = {}
+    highlights = Counter()
+
+    for text, metadata in zip(stored["documents"], stored["metadatas"]):
+        metadata = metadata or {}
+        source = metadata.get("source_filename") or os.path.basename(str(metadata.get("source", "")))
+        document = documents.setdefault(source, {
+            "source": source,
+            "title": metadata.get("Header1") or source,
+            "document_type": metadata.get("document_type"),
+            "language": metadata.get("language"),
+            "sections": [],
+        })
+        path = tuple(metadata[key] for key in HEADER_KEYS if metadata.get(key))
+        if path and (source, path) not in sections:
+            document["sections"].append(" / ".join(path))
+        sections.setdefault((source, path), []).append(text)
+        highlights.update(phrase.strip() for phrase in BOLD_PATTERN.findall(text))
+
+    profile_sections = []
+    for (source, path), texts in sections.items():
+        # The headings are part of the content (kept for retrieval), they are in `path` already
+        text = HEADING_LINE_PATTERN.sub("", _merge_chunks(texts)).strip()
+        if not text:
+            continue
+        profile_sections.append({
+            "source": source,
+            "path": list(path),
+            "title": path[-1] if path else documents[source]["title"],
+            "text": text[:PROFILE_SECTION_MAX_CHARS],
+            "truncated": len(text) > PROFILE_SECTION_MAX_CHARS,
+        })
+
+    return {
+        "generated_at": time.time(),
+        "documents": sorted(documents.values(), key=lambda document: document["source"]),
+        "sections": profile_sections,
+        "highlights": [{"text": text, "count": count} for text, count in highlights.most_common(PROFILE_MAX_HIGHLIGHTS)],
+    }
+
+
+def save_profile(profile: dict, path: str = PROFILE_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, separators=(",", ":"), ensure_ascii=False)
+    os.replace(tmp_path, path)
+    logger.info("Profile saved", extra={"sections": len(profile["sections"]), "documents": len(profile["documents"])})
+
+
+_cached: Optional[tuple[float, bytes]] = None
+_cache_lock = threading.Lock()
+
+def read_profile(path: str = PROFILE_FILE) -> Optional[tuple[bytes, float]]:
+    """The serialized profile and its modification time, None before the first index build."""
+    global _cached
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _cache_lock:
+        # Other workers (or a refresh) may have rewritten the file
+        if _cached is None or _cached[0] != mtime:
+            with open(path, "rb") as f:
+                _cached = (mtime, f.read())
+        return _cached[1], mtime
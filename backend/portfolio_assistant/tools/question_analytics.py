@@ -0,0 +1,136 @@
+# question_analytics.py
+"""
+Top missing topics from the unanswered-questions log.
+
+Usage: python -m portfolio_assistant.tools.question_analytics --since 2026-01-01 --limit 20
+       python -m portfolio_assistant.tools.question_analytics --no-cluster  (no embedding calls)
+"""
+import json
+import asyncio
+import argparse
+import datetime
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .db_manager import DB_PATH, connect, setup_database
+
+# Questions taken from the aggregate table before clustering; the long tail does not change the top topics
+CANDIDATE_LIMIT = 500
+CLUSTER_SIMILARITY_THRESHOLD = 0.85
+
+TOP_QUESTIONS_SQL = """
+    SELECT q.question, q.normalized_question, totals.asked, totals.first_day, totals.last_day
+    FROM (
+        SELECT question_id, SUM(ask_count) AS asked, MIN(day) AS first_day, MAX(day) AS last_day
+        FROM unanswered_question_daily
+        WHERE day BETWEEN ? AND ?
+        GROUP BY question_id
+        ORDER BY asked DESC
+        LIMIT ?
+    ) AS totals
+    JOIN unanswered_questions AS q ON q.id = totals.question_id
+    ORDER BY totals.asked DESC
+"""
+
+
+def top_questions(since: str, until: str, limit: int, db_path: str = DB_PATH) -> List[dict]:
+    """Most asked normalized questions between two ISO dates (inclusive), from the daily aggregate."""
+    setup_database(db_path)
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(TOP_QUESTIONS_SQL, (since[:10], until[:10], limit)).fetchall()
+    finally:
+        conn.close()
+    return [
+        {"question": question, "normalized_question": normalized, "asked": asked, "first_day": first_day, "last_day": last_day}
+        for question, normalized, asked, first_day, last_day in rows
+    ]
+
+
+def cluster_questions(questions: List[dict], vectors: List[List[float]], threshold: float) -> List[dict]:
+    """
+    Greedy clustering in order of frequency: a question joins the first topic whose leading
+    question is at least `threshold` cosine-similar, otherwise it starts a new topic.
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1, norms)
+
+    topics = []
+    leaders = []
+    for question, vector in zip(questions, matrix):
+        if leaders:
+            similarities = np.stack(leaders) @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= threshold:
+                topic = topics[best]
+                topic["asked"] += question["asked"]
+                topic["first_day"] = min(topic["first_day"], question["first_day"])
+                topic["last_day"] = max(topic["last_day"], question["last_day"])
+                topic["questions"].append(question["question"])
+                continue
+        leaders.append(vector)
+        topics.append({
+            "topic": question["question"],
+            "asked": question["asked"],
+            "first_day": question["first_day"],
+            "last_day": question["last_day"],
+            "questions": [question["question"]],
+        })
+    return sorted(topics, key=lambda topic: topic["asked"], reverse=True)
+
+
+async def atop_missing_topics(
+    since: str,
+    until: str,
+    limit: int = 20,
+    embeddings: Optional[Embeddings] = None,
+    threshold: float = CLUSTER_SIMILARITY_THRESHOLD,
+    db_path: str = DB_PATH,
+) -> List[dict]:
+    """
+    Top missing topics in the time range. With embeddings, similar questions are merged into
+    one topic; without, every normalized question is its own topic.
+    """
+    questions = await asyncio.to_thread(top_questions, since, until, CANDIDATE_LIMIT if embeddings else limit, db_path)
+    if not questions:
+        return []
+    if embeddings is None:
+        return [
+            {"topic": q["question"], "asked": q["asked"], "first_day": q["first_day"], "last_day": q["last_day"], "questions": [q["question"]]}
+            for q in questions
+        ]
+    # Normalized texts repeat across calls, so the embedding cache serves them after the first run
+    vectors = await embeddings.aembed_documents([q["normalized_question"] for q in questions])
+    return cluster_questions(questions, vectors, threshold)[:limit]
+
+
+def default_range(days: int = 30) -> tuple:
+    today = datetime.date.today()
+    return (today - datetime.timedelta(days=days)).isoformat(), today.isoformat()
+
+
+def main():
+    default_since, default_until = default_range()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", default=default_since, help="First day (YYYY-MM-DD), default 30 days ago")
+    parser.add_argument("--until", default=default_until, help="Last day (YYYY-MM-DD), default today")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--threshold", type=float, default=CLUSTER_SIMILARITY_THRESHOLD)
+    parser.add_argument("--no-cluster", action="store_true", help="Group by normalized question only")
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+
+    embeddings = None
+    if not args.no_cluster:
+        from .rag import get_embeddings
+        embeddings = get_embeddings()
+
+    topics = asyncio.run(atop_missing_topics(args.since, args.until, args.limit, embeddings, args.threshold, args.db))
+    print(json.dumps(topics, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,175 +1,546 @@
 # rag.py
 import os
-import time
 import json
-import shutil
+import logging
+import time
+import uuid
+import asyncio
+import hashlib
+import threading
+import contextlib
+from dataclasses import dataclass, field
 from dotenv import load_dotenv
 from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter, MarkdownHeaderTextSplitter
-from langchain_community.document_loaders import DirectoryLoader, TextLoader, PyPDFLoader
 from langchain_core.documents import Document
 
+try:
+    import fcntl
+except ImportError:  # Windows, single process only
+    fcntl = None
+
+from ..core.config import OPENROUTER_EMBEDDING_MODEL, create_embeddings
+from .embedding_cache import CachedEmbeddings
+from .batch_embedding import BatchEmbedder, EmbeddedBatch
+from .ingestion import ParsedFile, iter_parsed_files, split_documents_markdown, _sidecar_path
+from .hybrid import BM25Index, HybridRetriever
+from .profile import PROFILE_FILE, build_profile, save_profile
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 PERSIST_DIRECTORY = "data/vectordb/chroma_db"
 DATA_DIRECTORY = "data/source"
-LAST_UPDATE_FILE = os.path.join(PERSIST_DIRECTORY, ".last_update")
+MANIFEST_FILE = os.path.join(PERSIST_DIRECTORY, "manifest.json")
+# Every index update is built into a new collection, the manifest names the current one.
+# Indexes from before had a single collection with the langchain_chroma default name.
+COLLECTION_PREFIX = "portfolio_"
+DEFAULT_COLLECTION = "langchain"
+SOURCE_EXTENSIONS = ('.md', '.txt', '.pdf')
+EMBEDDING_CACHE_FILE = "data/vectordb/embedding_cache.db"
+# New chunks are sent to the embedding model in batches of this size while files are still parsed
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+# The manifest of an index update in progress is saved this often, an interrupted update resumes from it
+INDEX_CHECKPOINT_SECONDS = float(os.getenv("INDEX_CHECKPOINT_SECONDS", "10"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+# 'dense' (vector search only), 'bm25' (keyword search only) or 'hybrid' (both, fused with RRF)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "5"))
+HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0"))
+HYBRID_BM25_WEIGHT = float(os.getenv("HYBRID_BM25_WEIGHT", "1.0"))
 
-def should_rebuild_vectorstore():
-    if not os.path.exists(LAST_UPDATE_FILE):
-        return True
+# Callbacks invoked after the vector store was updated (e.g. to invalidate answer caches)
+_rebuild_listeners = []
 
-    with open(LAST_UPDATE_FILE, 'r') as f:
-        try:
-            last_build_time = float(f.read().strip())
-        except ValueError:
-            return True
+def register_rebuild_listener(callback):
+    _rebuild_listeners.append(callback)
 
-    if not os.path.exists(DATA_DIRECTORY):
-        return False
+def _notify_rebuild():
+    for callback in _rebuild_listeners:
+        callback()
+
+SAMPLE_SOURCE = "__sample__"
+SAMPLE_DOCUMENTS = [
+    Document(
+        page_content="Experienced **Software Engineer** (M.Sc.) specializing in **C++ and Python** in the fields of **Embedded Systems, Real-Time Applications, Computer Vision**, **Deep Learning** and **Sensor Fusion**. Profound knowledge in developing complex software components for the defense and automotive industries.", 
+        metadata={"document_type": "resume", "language": "en"}
+     )
+]
+
+@dataclass
+class IndexReport:
+    """What an incremental index update changed (or would change)."""
+    added: list[str] = field(default_factory=list)
+    modified: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+    chunks_added: int = 0
+    chunks_deleted: int = 0
+    pages_parsed: int = 0
+    embedding_batches: int = 0
+    embedding_retries: int = 0
+    ingest_seconds: float = 0.0
 
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.modified or self.removed)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.added)} added, {len(self.modified)} modified, {len(self.removed)} removed, "
+            f"{len(self.unchanged)} unchanged files; "
+            f"{self.chunks_added} chunks embedded in {self.embedding_batches} batches "
+            f"({self.embedding_retries} retries), {self.chunks_deleted} chunks deleted; "
+            f"{self.pages_parsed} pages in {self.ingest_seconds:.1f}s"
+        )
+
+def _list_source_files() -> list[str]:
+    if not os.path.exists(DATA_DIRECTORY):
+        return []
+    source_files = []
     for root, _, files in os.walk(DATA_DIRECTORY):
         for file in files:
-            file_path = os.path.join(root, file)
-            if file_path.endswith(('.md', '.txt', '.pdf', '.json')):
-                mod_time = os.path.getmtime(file_path)
-                if mod_time > last_build_time:
-                    print(f"--- RAG Check: File '{file}' is newer. Rebuilding. ---")
-                    return True
-    
-    return False
-
-def load_documents_with_metadata():
-    docs = []
-    
-    if not os.path.exists(DATA_DIRECTORY) or not os.listdir(DATA_DIRECTORY):
-        print("--- RAG: No data directory or empty, loading samples. ---")
-        return [
-            Document(
-                page_content="Experienced **Software Engineer** (M.Sc.) specializing in **C++ and Python** in the fields of **Embedded Systems, Real-Time Applications, Computer Vision**, **Deep Learning** and **Sensor Fusion**. Profound knowledge in developing complex software components for the defense and automotive industries.", 
-                metadata={"document_type": "resume", "language": "en"}
-             )
-        ]
-        
-    print("--- RAG: Loading documents and merging sidecar metadata. ---")
-    
-    loaded_docs = []
-
-    # Load PDFs
-    # TODO: Needs to be improved. Retrieval results are not good
-    pdf_loader = DirectoryLoader(
-        DATA_DIRECTORY, 
-        glob="**/*.pdf", 
-        loader_cls=PyPDFLoader, 
-        recursive=True
-    )
-    loaded_docs.extend(pdf_loader.load())
-    
-    # Load Markdown/Text
-    text_loader = DirectoryLoader(
-        DATA_DIRECTORY, 
-        glob=["**/*.md", "**/*.txt"],
-        loader_cls=TextLoader, 
-        recursive=True
-    )
-    loaded_docs.extend(text_loader.load())
-
-    # Add sidecar metadata
-    for doc in loaded_docs:
-        source_path = doc.metadata.get("source")
-        
-        if source_path:
-            base, _ = os.path.splitext(source_path)
-            sidecar_path = base + ".json"
-            
-            if os.path.exists(sidecar_path):
-                if source_path.endswith(".json"): continue 
-
-                print(f"    - Found sidecar for: {os.path.basename(source_path)}")
-                try:
-                    with open(sidecar_path, 'r') as f:
-                        sidecar_metadata = json.load(f)
-                        doc.metadata.update(sidecar_metadata)
-                except json.JSONDecodeError:
-                    print(f"    - WARNING: Invalid JSON in {os.path.basename(sidecar_path)}. Skipping.")
-            
-            doc.metadata["source_filename"] = os.path.basename(source_path)
-            
-        docs.append(doc)
-
-    return docs
-
-def split_documents_markdown(docs: list[Document]) -> list[Document]:
-    
-    headers_to_split_on = [
-        ("#", "Header1"),
-        ("##", "Header2"),
-        ("###", "Header3"),
-    ]
-
-    splits = []
-    
-    for doc in docs:
-        # Only process Markdown/Text files this way
-        if doc.metadata.get("source_filename", "").endswith(('.md', '.txt')):
-            
-            markdown_splitter = MarkdownHeaderTextSplitter(
-                headers_to_split_on=headers_to_split_on,
-                strip_headers=False # Keep the headings in the content for context
-            )
-            
-            markdown_splits = markdown_splitter.split_text(doc.page_content)
-            
-            # Carry over metadata (like source_filename) to the new chunks
-            for split in markdown_splits:
-                # Add the specific header level metadata (e.g., 'Header2': 'PROFESSIONAL EXPERIENCE')
-                split.metadata.update(doc.metadata)
-            
-            splits.extend(markdown_splits)
-            
+            if file.endswith(SOURCE_EXTENSIONS):
+                source_files.append(os.path.join(root, file))
+    return sorted(source_files)
+
+def _file_hash(source_path: str) -> str:
+    """Content hash of a source file including its sidecar metadata."""
+    digest = hashlib.sha256()
+    for path in (source_path, _sidecar_path(source_path)):
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 16), b""):
+                    digest.update(block)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def _sample_hash() -> str:
+    return hashlib.sha256("".join(doc.page_content for doc in SAMPLE_DOCUMENTS).encode()).hexdigest()
+
+def load_manifest() -> dict | None:
+    """Returns the manifest of the indexed files, or None if the index has none."""
+    if not os.path.exists(MANIFEST_FILE):
+        return None
+    try:
+        with open(MANIFEST_FILE, 'r') as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        logger.warning("Invalid index manifest, reindexing everything")
+        return None
+
+def save_manifest(manifest: dict):
+    tmp_path = MANIFEST_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, MANIFEST_FILE)
+
+def scan_source_changes(manifest: dict | None) -> tuple[IndexReport, dict]:
+    """
+    Compares the source directory against the manifest. Files whose mtime and size
+    are unchanged are not hashed again. Returns the report and the current file states.
+    """
+    indexed_files = (manifest or {}).get("files", {})
+    current = {}
+
+    source_files = _list_source_files()
+    if not source_files:
+        current[SAMPLE_SOURCE] = {"hash": _sample_hash(), "mtime": 0, "size": 0}
+
+    for path in source_files:
+        stat = os.stat(path)
+        sidecar = _sidecar_path(path)
+        mtime = max(stat.st_mtime, os.path.getmtime(sidecar) if os.path.exists(sidecar) else 0)
+        indexed = indexed_files.get(path)
+        if indexed and indexed["mtime"] == mtime and indexed["size"] == stat.st_size:
+            file_hash = indexed["hash"]
         else:
-            # For PDFs or other unstructured files, use a standard recursive split
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-            splits.extend(text_splitter.split_documents([doc]))
+            file_hash = _file_hash(path)
+        current[path] = {"hash": file_hash, "mtime": mtime, "size": stat.st_size}
 
-    return splits
+    report = IndexReport()
+    for path, state in current.items():
+        if path not in indexed_files:
+            report.added.append(path)
+        elif indexed_files[path]["hash"] != state["hash"]:
+            report.modified.append(path)
+        else:
+            report.unchanged.append(path)
+    report.removed = [path for path in indexed_files if path not in current]
+    return report, current
 
-def get_retriever():
-    embeddings = OpenAIEmbeddings(
-        model="text-embedding-3-small", 
-        base_url="https://openrouter.ai/api/v1",
-        api_key=os.getenv("OPENROUTER_API_KEY")
-    )
+def should_rebuild_vectorstore():
+    report, _ = scan_source_changes(load_manifest())
+    if report.has_changes:
+        logger.info("Source changes detected", extra={"changes": report.summary()})
+    return report.has_changes
+
+def _parse_sources(source_paths: list[str]):
+    """Parsed and split source files, in worker processes for larger batches (see ingestion.py)."""
+    if SAMPLE_SOURCE in source_paths:
+        samples = [doc.model_copy(deep=True) for doc in SAMPLE_DOCUMENTS]
+        yield ParsedFile(path=SAMPLE_SOURCE, splits=split_documents_markdown(samples), pages=1)
+    yield from iter_parsed_files([path for path in source_paths if path != SAMPLE_SOURCE])
 
-    should_rebuild = should_rebuild_vectorstore()
-    
-    if should_rebuild or not os.path.exists(PERSIST_DIRECTORY):
-        print("--- RAG: Creating new Vector Store (due to missing or updated files) ---")
-        if os.path.exists(PERSIST_DIRECTORY):
-            print(f"--- RAG: Deleting old persistence directory for clean rebuild: {PERSIST_DIRECTORY} ---")
-            shutil.rmtree(PERSIST_DIRECTORY)
-        os.makedirs(PERSIST_DIRECTORY, exist_ok=True)
-        
-        docs = load_documents_with_metadata()
-        splits = split_documents_markdown(docs)
-
-        vectorstore = Chroma.from_documents(
-            documents=splits,
-            embedding=embeddings,
-            persist_directory=PERSIST_DIRECTORY
+_embeddings = None
+
+def set_embeddings(embeddings):
+    """Replaces the shared embedding model, e.g. with a local fake for benchmarks."""
+    global _embeddings
+    _embeddings = embeddings
+
+def get_embeddings():
+    """
+    Shared embedding model for documents and queries (EMBEDDING_BACKEND). Vectors are
+    cached on disk, so unchanged chunks and repeated queries are not embedded again.
+    """
+    global _embeddings
+    if _embeddings is None:
+        embeddings, model_name = create_embeddings()
+        _embeddings = CachedEmbeddings(
+            embeddings,
+            model_name=model_name,
+            db_path=EMBEDDING_CACHE_FILE,
+            max_entries=EMBEDDING_CACHE_MAX_ENTRIES
         )
-        
-        with open(LAST_UPDATE_FILE, 'w') as f:
-            f.write(str(time.time()))
-        
-    else:
-        print("--- RAG: Loading existing Vector Store (no changes detected) ---")
-        vectorstore = Chroma(
-            persist_directory=PERSIST_DIRECTORY, 
-            embedding_function=embeddings
+    return _embeddings
+
+def _embedding_model_name(embeddings) -> str:
+    return getattr(embeddings, "model_name", type(embeddings).__name__)
+
+def chunk_ids(source_path: str, splits: list[Document]) -> list[str]:
+    """Stable ids derived from the chunk content, so unchanged chunks keep their id."""
+    ids = []
+    seen = {}
+    for split in splits:
+        digest = hashlib.sha256(
+            f"{source_path}\0{split.page_content}\0{json.dumps(split.metadata, sort_keys=True, default=str)}".encode()
+        ).hexdigest()[:32]
+        # Identical chunks within one file get an occurrence suffix
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        ids.append(f"{digest}-{occurrence}")
+    return ids
+
+def _add_embedded(vectorstore: Chroma, batch: EmbeddedBatch):
+    # langchain_chroma can only add documents by embedding them itself. One upsert is
+    # applied at once, larger batches than the client accepts are split.
+    step = vectorstore._client.get_max_batch_size()
+    for start in range(0, len(batch.ids), step):
+        documents = batch.documents[start:start + step]
+        vectorstore._collection.upsert(
+            ids=batch.ids[start:start + step],
+            embeddings=batch.vectors[start:start + step],
+            documents=[document.page_content for document in documents],
+            metadatas=[document.metadata for document in documents],
+        )
+
+def _copy_collection(source: Chroma, target: Chroma):
+    """Copies all chunks with their stored vectors, nothing is embedded again."""
+    step = source._client.get_max_batch_size()
+    for offset in range(0, source._collection.count(), step):
+        chunks = source._collection.get(include=["embeddings", "documents", "metadatas"], limit=step, offset=offset)
+        target._collection.upsert(
+            ids=chunks["ids"],
+            embeddings=chunks["embeddings"],
+            documents=chunks["documents"],
+            metadatas=chunks["metadatas"],
         )
 
-    return vectorstore.as_retriever(search_kwargs={"k": 5})
+def update_vectorstore(vectorstore: Chroma, manifest: dict) -> IndexReport:
+    """
+    Brings the vector store in sync with the source directory: only added or modified
+    files are re-split, only chunks with new ids are embedded, and chunks of removed
+    files are deleted. Files are parsed concurrently and their new chunks are embedded
+    in batches of INGEST_BATCH_SIZE with a bounded number of requests in flight.
+    A file changes in the store at once: its new chunks are kept until all of them are
+    embedded and then written together, after which its old chunks are deleted.
+    The server applies updates to a copy of the served collection (see _open_vectorstore),
+    so queries never see the update in progress.
+    The manifest is saved every INDEX_CHECKPOINT_SECONDS and when the update fails,
+    so an interrupted update only redoes the files it had not finished.
+    """
+    started_at = time.perf_counter()
+    report, current = scan_source_changes(manifest)
+    indexed_files = manifest.setdefault("files", {})
+
+    for path in report.removed:
+        indexed = indexed_files.pop(path)
+        stale_ids = indexed["chunk_ids"] + indexed.get("pending_ids", [])
+        if stale_ids:
+            vectorstore.delete(ids=stale_ids)
+        report.chunks_deleted += len(stale_ids)
+        logger.info("Removed source", extra={"source": path, "chunks_deleted": len(stale_ids)})
 
-retriever = get_retriever()
\ No newline at end of file
+    # Files whose new chunks are not all embedded yet: path -> (sequence of their last batch,
+    # manifest entry, new chunk ids, chunk ids to delete once the new ones are written)
+    unfinished: dict[str, tuple[int, dict, list[str], list[str]]] = {}
+    # Embedded chunks of the unfinished files: chunk id -> (document, vector)
+    embedded: dict[str, tuple[Document, list[float]]] = {}
+    files_total = len(report.added) + len(report.modified)
+    files_parsed = 0
+    last_checkpoint = time.monotonic()
+
+    def delete_stale(stale_ids: list[str]):
+        if stale_ids:
+            vectorstore.delete(ids=stale_ids)
+        report.chunks_deleted += len(stale_ids)
+
+    def write(batches: list[EmbeddedBatch]):
+        nonlocal last_checkpoint
+        for batch in batches:
+            embedded.update(zip(batch.ids, zip(batch.documents, batch.vectors)))
+        if batches:
+            for path, (sequence, entry, new_ids, stale_ids) in list(unfinished.items()):
+                if sequence <= batches[-1].sequence:
+                    documents, vectors = zip(*(embedded.pop(chunk_id) for chunk_id in new_ids))
+                    _add_embedded(vectorstore, EmbeddedBatch(sequence, new_ids, list(documents), list(vectors)))
+                    report.chunks_added += len(new_ids)
+                    # The old version of the file is only removed once the new one is complete
+                    delete_stale(stale_ids)
+                    indexed_files[path] = entry
+                    del unfinished[path]
+        if time.monotonic() - last_checkpoint >= INDEX_CHECKPOINT_SECONDS:
+            save_manifest(manifest)
+            last_checkpoint = time.monotonic()
+            elapsed = time.perf_counter() - started_at
+            logger.info("Indexing progress", extra={
+                "files_done": files_parsed - len(unfinished),
+                "files_total": files_total,
+                "chunks_embedded": report.chunks_added,
+                "chunks_per_second": round(report.chunks_added / elapsed, 1),
+            })
+
+    with BatchEmbedder(vectorstore.embeddings, batch_size=INGEST_BATCH_SIZE) as embedder:
+        try:
+            for parsed in _parse_sources(report.added + report.modified):
+                path, splits = parsed.path, parsed.splits
+                ids = chunk_ids(path, splits)
+                indexed = indexed_files.get(path, {})
+                old_ids = set(indexed.get("chunk_ids", []))
+
+                new_chunks = [(chunk_id, split) for chunk_id, split in zip(ids, splits) if chunk_id not in old_ids]
+                # Chunks of an interrupted update may or may not have been written
+                old_pending_ids = set(indexed.get("pending_ids", []))
+                stale_ids = list((old_ids | old_pending_ids) - set(ids))
+
+                entry = {**current[path], "chunk_ids": ids}
+                if new_chunks:
+                    # Until all its chunks are written, the file is recorded without a hash and with
+                    # all chunk ids that may be stored: a resumed update parses it again, and deletes
+                    # every one of them if the file was removed
+                    indexed_files[path] = {
+                        "hash": None, "mtime": None, "size": None,
+                        "chunk_ids": list(indexed.get("chunk_ids", [])),
+                        "pending_ids": [chunk_id for chunk_id, _ in new_chunks]
+                                       + [chunk_id for chunk_id in stale_ids if chunk_id in old_pending_ids],
+                    }
+                    unfinished[path] = (embedder.add(new_chunks), entry, [chunk_id for chunk_id, _ in new_chunks], stale_ids)
+                else:
+                    delete_stale(stale_ids)
+                    indexed_files[path] = entry
+
+                files_parsed += 1
+                report.pages_parsed += parsed.pages
+                logger.info("Parsed source", extra={"source": path, "new_chunks": len(new_chunks), "stale_chunks": len(stale_ids)})
+                write(embedder.completed())
+            write(embedder.finish())
+        except BaseException:
+            # Keeps the files finished so far
+            save_manifest(manifest)
+            raise
+        finally:
+            report.embedding_batches = embedder.batches
+            report.embedding_retries = embedder.retries
+
+    for path in report.unchanged:
+        # Keeps the refreshed mtime so the file is not hashed again next time
+        indexed_files[path].update(current[path])
+
+    if manifest.pop("building", False) or report.has_changes:
+        # Tells the other server workers that their retrievers are out of date
+        manifest["version"] = uuid.uuid4().hex
+    save_manifest(manifest)
+    report.ingest_seconds = time.perf_counter() - started_at
+    return report
+
+def create_retriever(vectorstore: Chroma, mode: str = RETRIEVAL_MODE):
+    if mode == "dense":
+        return vectorstore.as_retriever(search_kwargs={"k": RETRIEVAL_K})
+    if mode not in ("bm25", "hybrid"):
+        raise ValueError(f"Unknown RETRIEVAL_MODE '{mode}'. Use 'dense', 'bm25' or 'hybrid'.")
+
+    # The keyword index is rebuilt from the stored chunks, so it always matches the collection
+    return HybridRetriever(
+        vectorstore=vectorstore,
+        bm25=BM25Index.from_vectorstore(vectorstore),
+        k=RETRIEVAL_K,
+        vector_weight=0.0 if mode == "bm25" else HYBRID_VECTOR_WEIGHT,
+        bm25_weight=HYBRID_BM25_WEIGHT,
+    )
+
+@contextlib.contextmanager
+def _index_lock():
+    """Serializes index updates across processes, server workers share the persist directory."""
+    os.makedirs(PERSIST_DIRECTORY, exist_ok=True)
+    with open(os.path.join(PERSIST_DIRECTORY, ".index.lock"), "w") as lock_file:
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def open_vectorstore() -> Chroma:
+    """Opens the vector store and brings it up to date with the source directory."""
+    with _index_lock():
+        vectorstore = _open_vectorstore()
+        _drop_unused_collections(vectorstore)
+        return vectorstore
+
+def _open_collection(name: str) -> Chroma:
+    return Chroma(
+        collection_name=name,
+        persist_directory=PERSIST_DIRECTORY,
+        embedding_function=get_embeddings()
+    )
+
+def _start_collection(manifest: dict, copy_from: Chroma | None = None) -> Chroma:
+    """Creates the collection an update is built in, the current one is served until it is done."""
+    manifest["previous_collection"] = manifest.get("collection", DEFAULT_COLLECTION)
+    manifest["collection"] = f"{COLLECTION_PREFIX}{uuid.uuid4().hex}"
+    manifest["building"] = True
+    vectorstore = _open_collection(manifest["collection"])
+    if copy_from is not None:
+        _copy_collection(copy_from, vectorstore)
+    return vectorstore
+
+def _open_vectorstore() -> Chroma:
+    """
+    Returns the current collection, or a new one with the source changes applied. The served
+    collection is never written to: an update copies it and is applied to the copy, which
+    becomes current with the manifest saved at its end. Needs the index lock.
+    """
+    manifest = load_manifest()
+    model_name = _embedding_model_name(get_embeddings())
+    if manifest is None:
+        # Collection was built without a manifest (or not at all), chunk ids are unknown
+        logger.info("No index manifest found, indexing all documents")
+        manifest = {"files": {}, "embedding_model": model_name}
+        vectorstore = _start_collection(manifest)
+    elif manifest.get("embedding_model", OPENROUTER_EMBEDDING_MODEL) != model_name:
+        # Vectors of another model are not comparable (and usually differ in dimensions)
+        logger.info("Embedding model changed, indexing all documents",
+                    extra={"previous": manifest.get("embedding_model", OPENROUTER_EMBEDDING_MODEL), "current": model_name})
+        manifest = {"files": {}, "embedding_model": model_name, "collection": manifest.get("collection", DEFAULT_COLLECTION)}
+        vectorstore = _start_collection(manifest)
+    elif manifest.get("building"):
+        # An interrupted update continues in its own collection, nobody serves it yet
+        vectorstore = _open_collection(manifest["collection"])
+    else:
+        vectorstore = _open_collection(manifest.get("collection", DEFAULT_COLLECTION))
+        if scan_source_changes(manifest)[0].has_changes:
+            vectorstore = _start_collection(manifest, copy_from=vectorstore)
+
+    report = update_vectorstore(vectorstore, manifest)
+    if report.has_changes or not os.path.exists(PROFILE_FILE):
+        save_profile(build_profile(vectorstore))
+    if report.has_changes:
+        logger.info("Vector store updated", extra={"changes": report.summary()})
+    else:
+        logger.info("Loading existing vector store (no changes detected)")
+
+    return vectorstore
+
+def _index_version() -> str | None:
+    """Changes with every index update that changed the collection, in whichever worker it ran."""
+    return (load_manifest() or {}).get("version")
+
+def _drop_unused_collections(vectorstore: Chroma):
+    """
+    Deletes all collections but the current and the previous one. The previous one stays
+    for a refresh interval, other workers and requests in flight may still use it. Needs
+    the index lock, an update in progress builds its collection under it.
+    """
+    manifest = load_manifest() or {}
+    keep = {manifest.get("collection", DEFAULT_COLLECTION), manifest.get("previous_collection")}
+    for collection in vectorstore._client.list_collections():
+        if collection.name not in keep:
+            vectorstore._client.delete_collection(collection.name)
+            logger.info("Deleted unused collection", extra={"collection": collection.name})
+
+def _create_current_retriever() -> tuple:
+    """
+    Brings the index up to date and returns its vector store, a retriever for it and its
+    version. Needs the index lock.
+    """
+    vectorstore = _open_vectorstore()
+    return vectorstore, create_retriever(vectorstore), _index_version()
+
+def build_retriever():
+    """Opens the vector store, brings it up to date and returns a new retriever for it."""
+    with _index_lock():
+        return _create_current_retriever()[1]
+
+# The retriever is built lazily (or warmed up by the server lifespan) instead of at
+# import time. A refresh builds the update into a new collection in the background;
+# requests keep using the current one until the new one is swapped in with a single
+# assignment.
+_vectorstore = None
+_retriever = None
+# Index version the current retriever (and its BM25 index) was built from
+_retriever_version = None
+_retriever_lock = threading.Lock()
+
+def _swap_retriever(vectorstore: Chroma, retriever, version: str | None):
+    """Switches to the collection and its retriever together. Needs the index lock."""
+    global _vectorstore, _retriever, _retriever_version
+    changed = _retriever is not None and version != _retriever_version
+    _vectorstore, _retriever, _retriever_version = vectorstore, retriever, version
+    if changed:
+        # E.g. cached answers came from the previous index
+        _notify_rebuild()
+    _drop_unused_collections(vectorstore)
+
+def get_retriever():
+    """Returns the current retriever, building it on first use."""
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                started_at = time.perf_counter()
+                with _index_lock():
+                    _swap_retriever(*_create_current_retriever())
+                logger.info("Retriever ready", extra={"seconds": round(time.perf_counter() - started_at, 2)})
+    return _retriever
+
+async def aget_retriever():
+    if _retriever is not None:
+        return _retriever
+    return await asyncio.to_thread(get_retriever)
+
+async def warm_retriever():
+    """Builds the retriever off the event loop, e.g. during the FastAPI lifespan."""
+    await aget_retriever()
+
+def refresh_retriever() -> bool:
+    """
+    Applies source changes and swaps in the updated retriever. Returns True if it changed.
+    Every server worker refreshes on its own: when another worker already updated the
+    index, the version differs and only the retriever is rebuilt.
+    """
+    with _retriever_lock:
+        with _index_lock():
+            if _retriever is not None and _index_version() == _retriever_version and not should_rebuild_vectorstore():
+                return False
+            _swap_retriever(*_create_current_retriever())
+    return True
+
+async def refresh_retriever_periodically(interval_seconds: float):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(refresh_retriever)
+        except Exception:
+            logger.exception("Refreshing the vector store failed")
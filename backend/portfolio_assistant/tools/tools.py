@@ -1,32 +1,78 @@
 # tools.py
+import asyncio
+import logging
 import datetime
-from langchain_core.tools import tool
-from .rag import retriever
-from .db_manager import insert_unanswered_question
+from langchain_core.tools import StructuredTool
+from .rag import get_retriever, aget_retriever
+from .db_manager import insert_unanswered_question, question_writer
 
-@tool
-def retrieve_portfolio_info(query: str):
+logger = logging.getLogger(__name__)
+
+def format_documents(docs) -> str:
+    return "\n\n".join([doc.page_content for doc in docs])
+
+async def aretrieve_documents(query: str):
+    """Returns the retrieved chunks themselves, for callers that need more than the joined text."""
+    logger.info("Retrieving info", extra={"query": query})
+    retriever = await aget_retriever()
+    return await retriever.ainvoke(query)
+
+def _retrieve_portfolio_info(query: str):
+    """
+    Use this tool to retrieve specific information about Michael Schlosser
+    """
+    logger.info("Retrieving info", extra={"query": query})
+    retrieved_docs = get_retriever().invoke(query)
+    return format_documents(retrieved_docs)
+
+async def _aretrieve_portfolio_info(query: str):
     """
     Use this tool to retrieve specific information about Michael Schlosser
     """
-    print(f"--- TOOL CALL: Retrieving info for: {query} ---")
-    retrieved_docs = retriever.invoke(query)
-    return "\n\n".join([doc.page_content for doc in retrieved_docs])
+    return format_documents(await aretrieve_documents(query))
 
-@tool
-def log_unanswered_question(question: str, user_name: str = "Anonymous"):
+def _log_unanswered_question(question: str, user_name: str = "Anonymous"):
     """
     Log an unanswered question about Michael Schlosser to a database with a timestamp.
     """
     timestamp = datetime.datetime.now().isoformat()
     try:
         log_message = insert_unanswered_question(question, user_name, timestamp)
-        
-        print(f"--- TOOL CALL: {log_message} ---")
+
+        logger.info(log_message)
         return log_message
 
     except RuntimeError as e:
         error_message = f"Database ERROR logging question: {e}"
-        print(f"--- TOOL CALL: {error_message} ---")
+        logger.error(error_message)
         return error_message
-    
+
+async def _alog_unanswered_question(question: str, user_name: str = "Anonymous"):
+    """
+    Log an unanswered question about Michael Schlosser to a database with a timestamp.
+    """
+    if not question_writer.running:
+        # No writer outside the server lifespan (scripts, benchmarks): insert directly, off the event loop
+        return await asyncio.to_thread(_log_unanswered_question, question, user_name)
+
+    timestamp = datetime.datetime.now().isoformat()
+    if question_writer.enqueue(question, user_name, timestamp):
+        log_message = f"Question queued for logging: '{question}' by {user_name} at {timestamp}"
+    else:
+        log_message = f"Question log is full, dropped: '{question}'"
+    logger.info(log_message)
+    return log_message
+
+# Both tools provide a sync and a native async implementation, so graph nodes
+# can use `ainvoke` without being pushed into the default thread pool.
+retrieve_portfolio_info = StructuredTool.from_function(
+    func=_retrieve_portfolio_info,
+    coroutine=_aretrieve_portfolio_info,
+    name="retrieve_portfolio_info",
+)
+
+log_unanswered_question = StructuredTool.from_function(
+    func=_log_unanswered_question,
+    coroutine=_alog_unanswered_question,
+    name="log_unanswered_question",
+)
@@ -0,0 +1,117 @@
+# metrics.py
+import time
+import functools
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.outputs import LLMResult
+from prometheus_client import Counter, Histogram
+
+# Buckets in seconds, from local shortcuts (sub-millisecond) up to slow LLM generations
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+NODE_DURATION = Histogram(
+    "assistant_node_duration_seconds", "Duration of a LangGraph node", ["node"], buckets=LATENCY_BUCKETS
+)
+NODE_ERRORS = Counter("assistant_node_errors_total", "Exceptions raised by a LangGraph node", ["node"])
+LLM_DURATION = Histogram(
+    "assistant_llm_duration_seconds", "Duration of an LLM call", ["llm"], buckets=LATENCY_BUCKETS
+)
+LLM_TOKENS = Counter("assistant_llm_tokens_total", "Tokens used by LLM calls", ["llm", "type"])
+RETRIEVAL_DOCUMENTS = Histogram(
+    "assistant_retrieval_documents", "Chunks retrieved per search", buckets=(0, 1, 2, 3, 5, 8, 13, 21)
+)
+RETRIEVAL_SUB_QUERIES = Histogram(
+    "assistant_retrieval_sub_queries", "Sub-queries retrieved per search", buckets=(1, 2, 3, 4, 6, 8)
+)
+RELEVANCE_SCORE = Histogram(
+    "assistant_grader_relevance_score", "Local relevance score of the retrieved context",
+    buckets=tuple(i / 10 for i in range(11))
+)
+COALESCED_REQUESTS = Counter(
+    "assistant_coalesced_requests_total", "Chats answered by an identical chat's graph execution", ["mode"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Duration of HTTP requests", ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+
+
+def timed_node(name: str, node):
+    """Wraps an async graph node so every call is observed in assistant_node_duration_seconds."""
+    histogram = NODE_DURATION.labels(node=name)
+    errors = NODE_ERRORS.labels(node=name)
+
+    @functools.wraps(node)
+    async def wrapper(state):
+        started_at = time.perf_counter()
+        try:
+            return await node(state)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - started_at)
+
+    return wrapper
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """Records duration and token usage of every call of one LLM (router, grader, ...)."""
+
+    # Called directly on the event loop; the handler only does arithmetic
+    run_inline = True
+
+    def __init__(self, llm: str):
+        self.duration = LLM_DURATION.labels(llm=llm)
+        self.prompt_tokens = LLM_TOKENS.labels(llm=llm, type="prompt")
+        self.completion_tokens = LLM_TOKENS.labels(llm=llm, type="completion")
+        self._started_at: Dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any):
+        self._started_at[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any):
+        self._started_at[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        started_at = self._started_at.pop(run_id, None)
+        if started_at is not None:
+            self.duration.observe(time.perf_counter() - started_at)
+        usage = _usage(response)
+        if usage:
+            self.prompt_tokens.inc(usage.get("input_tokens", 0))
+            self.completion_tokens.inc(usage.get("output_tokens", 0))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._started_at.pop(run_id, None)
+
+
+def _usage(response: LLMResult) -> Optional[dict]:
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            if message is not None and getattr(message, "usage_metadata", None):
+                return message.usage_metadata
+    # Providers without usage_metadata report OpenAI style token_usage
+    token_usage = (response.llm_output or {}).get("token_usage")
+    if token_usage:
+        return {
+            "input_tokens": token_usage.get("prompt_tokens", 0),
+            "output_tokens": token_usage.get("completion_tokens", 0),
+        }
+    return None
+
+
+def instrument_llm(llm, name: str):
+    """
+    Attaches the metrics callback to a model, so every invocation is recorded. Call it before
+    `with_structured_output`; the model's own callbacks field is cheaper than a config binding.
+    """
+    handler = LLMMetricsCallback(name)
+    if isinstance(llm, BaseLanguageModel):
+        llm.callbacks = [*(llm.callbacks or []), handler]
+        return llm
+    return llm.with_config(callbacks=[handler])
@@ -0,0 +1,62 @@
+# conftest.py
+"""
+The tests run the FastAPI app in-process with the fake chat models and embeddings of
+benchmarks/fakes.py, in a scratch directory with a synthetic corpus (the data/ paths are
+relative). The settings are read when the modules are imported, so they are set here
+before any test imports the app.
+"""
+import os
+import tempfile
+import functools
+
+import pytest
+
+from benchmarks.bench_startup import write_corpus
+
+WORKDIR = tempfile.mkdtemp(prefix="portfolio_tests_")
+write_corpus(WORKDIR, 3)
+
+os.environ.update({
+    # Keeps the test questions out of the real review log
+    "QUESTION_DB_PATH": os.path.join(WORKDIR, "data", "questions", "unanswered_questions.db"),
+    "RAG_WARMUP_MODE": "blocking",
+    # The fake grader accepts any context; the local relevance gate would reject fake embeddings
+    "GRADER_MODE": "llm",
+    "CHAT_RATE_LIMIT": "4/day",
+    "LOG_LEVEL": "WARNING",
+    "ANALYTICS_TOKEN": "test-token",
+    # The app validates its model and mail configuration on import
+    "OPENROUTER_API_KEY": "test",
+    "MAIL_USERNAME": "test",
+    "MAIL_PASSWORD": "test",
+    "MAIL_FROM": "test@example.com",
+})
+
+ANSWER = "Michael is a Software Engineer specializing in C++ and Python."
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def client(monkeypatch):
+    """An ASGI client of the app with its lifespan running and fresh rate limits."""
+    # Before the import, the rate limit storage is opened with it
+    monkeypatch.chdir(WORKDIR)
+    import httpx
+    from benchmarks.fakes import FakeEmbeddings, fake_model_factory
+    from portfolio_assistant.core.assistant import PortfolioAssistant
+    from portfolio_assistant.tools.rag import set_embeddings
+    from app import main
+
+    set_embeddings(FakeEmbeddings())
+    main.PortfolioAssistant = functools.partial(
+        PortfolioAssistant, model_factory=fake_model_factory(latency=0.0, response=ANSWER)
+    )
+    main.limiter.reset()
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            yield client
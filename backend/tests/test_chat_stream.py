@@ -0,0 +1,48 @@
+# test_chat_stream.py
+import json
+
+import pytest
+
+from conftest import ANSWER
+
+pytestmark = pytest.mark.anyio
+
+
+def parse_sse(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+async def test_stream_sends_progress_tokens_and_final_answer(client):
+    async with client.stream("POST", "/chat/stream", json={"message": "What is his tech stack?"}) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_sse((await response.aread()).decode())
+
+    names = [name for name, _ in events]
+    assert names[-1] == "final"
+    assert "error" not in names
+    progress = [data["node"] for name, data in events if name == "progress"]
+    assert progress[0] == "router"
+    assert "retrieve" in progress and "generate_answer_good" in progress
+
+    # The fake generator streams its answer word by word, every chunk is forwarded
+    tokens = [data["text"] for name, data in events if name == "token"]
+    assert len(tokens) == len(ANSWER.split(" "))
+    assert "".join(tokens) == ANSWER
+    final = events[-1][1]
+    assert final["response"] == ANSWER
+    assert final["action"] == "none"
+    assert final["session_id"]
+
+
+async def test_chat_and_stream_share_one_rate_limit(client):
+    """CHAT_RATE_LIMIT is 4/day in the tests, switching endpoints does not grant more."""
+    statuses = []
+    for path in ["/chat", "/chat/stream", "/chat", "/chat/stream", "/chat", "/chat/stream"]:
+        response = await client.post(path, json={"message": "Hello"})
+        statuses.append(response.status_code)
+    assert statuses == [200, 200, 200, 200, 429, 429]
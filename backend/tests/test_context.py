@@ -0,0 +1,69 @@
+# test_context.py
+import asyncio
+import uuid
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from portfolio_assistant.core.context import ConversationContext, assign_prefix_ids
+
+pytestmark = pytest.mark.anyio
+
+
+class RecordingSummarizer:
+    """Returns a numbered summary and records how many messages every call summarized."""
+
+    def __init__(self):
+        self.transcript_lines = []
+
+    async def ainvoke(self, messages):
+        transcript = messages[0].content.split("New messages:\n", 1)[1]
+        self.transcript_lines.append(len(transcript.splitlines()))
+        return AIMessage(content=f"summary {len(self.transcript_lines)}")
+
+
+def make_context(summarizer) -> ConversationContext:
+    return ConversationContext(summarizer, max_recent_messages=4, max_context_tokens=100_000, router_window=2, summary_step=6)
+
+
+async def settle(context: ConversationContext):
+    await asyncio.gather(*context._pending.values())
+
+
+async def test_capped_session_summarizes_only_the_new_messages():
+    """A session drops its oldest messages beyond the cap, the summaries still carry forward."""
+    summarizer = RecordingSummarizer()
+    context = make_context(summarizer)
+    cap = 20
+    messages = []
+    for turn in range(60):
+        messages.append(HumanMessage(content=f"question {turn}", id=uuid.uuid4().hex))
+        del messages[:max(len(messages) - cap, 0)]
+        history = context.build(messages)
+        await settle(context)
+        messages.append(AIMessage(content=f"answer {turn}", id=uuid.uuid4().hex))
+
+    # One summary per summary_step messages, each covering only the messages since the previous one
+    assert max(summarizer.transcript_lines) == 6
+    assert len(summarizer.transcript_lines) <= 60 * 2 // 6
+    # The summary, at most one step (and the new message) not summarized yet, the recent messages
+    assert isinstance(history[0], SystemMessage)
+    assert len(history) <= 1 + 6 + 1 + 4
+
+
+async def test_resent_client_history_reuses_its_summary():
+    summarizer = RecordingSummarizer()
+    context = make_context(summarizer)
+
+    def client_history(turns: int):
+        messages = []
+        for turn in range(turns):
+            messages += [HumanMessage(content=f"question {turn}"), AIMessage(content=f"answer {turn}")]
+        return assign_prefix_ids(messages + [HumanMessage(content="and then?")])
+
+    context.build(client_history(8))
+    await settle(context)
+    calls = len(summarizer.transcript_lines)
+    history = context.build(client_history(8))
+    assert len(summarizer.transcript_lines) == calls
+    assert history[0].content.endswith(f"summary {calls}")
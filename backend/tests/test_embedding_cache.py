@@ -0,0 +1,51 @@
+# test_embedding_cache.py
+import time
+import sqlite3
+
+import pytest
+
+from benchmarks.fakes import FakeEmbeddings
+from portfolio_assistant.tools.embedding_cache import CachedEmbeddings
+
+pytestmark = pytest.mark.anyio
+
+
+def stored_rows(db_path) -> int:
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+async def test_hits_are_served_from_the_cache(tmp_path):
+    db_path = tmp_path / "cache.db"
+    cache = CachedEmbeddings(FakeEmbeddings(), model_name="fake", db_path=str(db_path))
+
+    first = await cache.aembed_query("What is his tech stack?")
+    second = await cache.aembed_query("What is his tech stack?")
+    assert second == pytest.approx(first)
+    vectors = await cache.aembed_documents(["Projects", "What is his tech stack?", "Projects"])
+    assert vectors[1] == pytest.approx(first)
+    assert vectors[0] == vectors[2]
+    assert (cache.hits, cache.misses) == (3, 2)
+    assert cache.stats()["entries"] == stored_rows(db_path) == 2
+
+
+def test_eviction_keeps_recently_hit_entries(tmp_path):
+    db_path = tmp_path / "cache.db"
+    # Access times are only written in batches, the eviction writes the pending ones first
+    cache = CachedEmbeddings(FakeEmbeddings(), model_name="fake", db_path=str(db_path), max_entries=3,
+                             touch_batch_size=100, touch_interval_seconds=3600)
+    cache.embed_documents(["hot"])
+    time.sleep(0.01)
+    cache.embed_documents(["old", "other"])
+    cache.embed_query("hot")
+    cache.embed_documents(["new"])
+
+    assert cache.stats()["entries"] == stored_rows(db_path) == 3
+    with sqlite3.connect(db_path) as conn:
+        remaining = {row[0] for row in conn.execute("SELECT text_hash FROM embeddings")}
+    assert cache._hash("hot") in remaining and cache._hash("new") in remaining
+
+    # The row count survives a restart and counts only new rows
+    reopened = CachedEmbeddings(FakeEmbeddings(), model_name="fake", db_path=str(db_path), max_entries=3)
+    reopened.embed_documents(["new"])
+    assert reopened.stats()["entries"] == 3
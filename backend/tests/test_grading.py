@@ -0,0 +1,45 @@
+# test_grading.py
+import pytest
+
+from benchmarks.fakes import FakeEmbeddings, fake_model_factory
+from portfolio_assistant.core.config import GRADER_BAD_THRESHOLD, GRADER_GOOD_THRESHOLD
+from portfolio_assistant.core.grading import LocalGrader
+
+pytestmark = pytest.mark.anyio
+
+QUERY = "Which radar tracking projects did he build at Hensoldt?"
+# The fake embeddings are hashes of the text: only identical texts are similar
+RELEVANT = [QUERY, "Hensoldt: development of radar tracking components in C++."]
+IRRELEVANT = ["He enjoys hiking and cooking.", "The thesis covered deep learning for object detection."]
+# All content words occur, but no chunk is semantically close
+AMBIGUOUS = ["Projects at Hensoldt: radar tracking, built in C++."]
+
+
+def make_grader() -> LocalGrader:
+    return LocalGrader(FakeEmbeddings(), good_threshold=GRADER_GOOD_THRESHOLD, bad_threshold=GRADER_BAD_THRESHOLD)
+
+
+@pytest.mark.parametrize("chunks, expected", [(RELEVANT, "good"), (IRRELEVANT, "bad"), (AMBIGUOUS, None), ([], "bad")])
+async def test_default_thresholds(chunks, expected):
+    grader = make_grader()
+    score = await grader.ascore(QUERY, chunks)
+    assert grader.decide(score) == expected
+    if expected is None:
+        assert GRADER_BAD_THRESHOLD < score < GRADER_GOOD_THRESHOLD
+
+
+@pytest.mark.parametrize("chunks, grade, llm_calls", [(RELEVANT, "good", 0), (IRRELEVANT, "bad", 0), (AMBIGUOUS, "good", 1)])
+async def test_hybrid_grading_asks_the_llm_only_for_ambiguous_scores(chunks, grade, llm_calls, monkeypatch):
+    from portfolio_assistant.core.assistant import PortfolioAssistant
+
+    assistant = PortfolioAssistant(model_factory=fake_model_factory(latency=0.0), embeddings=FakeEmbeddings())
+    monkeypatch.setattr(assistant, "grader_mode", "hybrid")
+    monkeypatch.setattr(assistant, "local_grader", make_grader())
+    state = {
+        "router_decision": {"step": "search", "search_query": QUERY},
+        "search_chunks": chunks,
+        "search_context": "\n\n".join(chunks),
+    }
+    # The fake LLM grader accepts any non-empty context, so only a local decision yields 'bad'
+    assert await assistant._grade_node(state) == {"grade": grade}
+    assert assistant.grader_decisions["llm"] == llm_calls
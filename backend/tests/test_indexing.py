@@ -0,0 +1,142 @@
+# test_indexing.py
+import os
+
+import pytest
+
+from benchmarks.bench_startup import write_corpus
+from benchmarks.fakes import FakeEmbeddings
+from portfolio_assistant.tools import rag
+
+
+@pytest.fixture
+def index_dir(tmp_path, monkeypatch):
+    """A scratch source directory (the index paths are relative) with small embedding batches."""
+    monkeypatch.chdir(tmp_path)
+    write_corpus(str(tmp_path), 3)
+    # Chroma reuses its clients per persist path, a relative one would be shared by all tests
+    monkeypatch.setattr(rag, "PERSIST_DIRECTORY", os.path.abspath(rag.PERSIST_DIRECTORY))
+    monkeypatch.setattr(rag, "MANIFEST_FILE", os.path.abspath(rag.MANIFEST_FILE))
+    monkeypatch.setattr(rag, "INGEST_BATCH_SIZE", 2)
+    rag.set_embeddings(FakeEmbeddings())
+    return tmp_path
+
+
+def rewrite_sources(directory, paths):
+    for path in paths:
+        with open(os.path.join(directory, "data", "source", path), "w") as f:
+            f.write("# Rewritten\n")
+            for section in range(5):
+                f.write(f"## Section {section}\nRewritten project {section} used Rust and Go.\n")
+
+
+def stored_sources(vectorstore) -> dict:
+    sources = {}
+    for metadata in vectorstore.get(include=["metadatas"])["metadatas"]:
+        source = os.path.basename(metadata["source"])
+        sources[source] = sources.get(source, 0) + 1
+    return sources
+
+
+def test_modified_file_is_replaced_at_once(index_dir, monkeypatch):
+    """The new chunks of a file span several batches but are written together, before its old ones are deleted."""
+    vectorstore = rag._open_vectorstore()
+    old_ids = set(rag.load_manifest()["files"][os.path.join("data", "source", "doc_0.md")]["chunk_ids"])
+    rewrite_sources(index_dir, ["doc_0.md", "doc_1.md"])
+
+    events = []
+    add_embedded = rag._add_embedded
+    delete = vectorstore.delete
+    monkeypatch.setattr(rag, "_add_embedded", lambda store, batch: (events.append(("add", set(batch.ids))), add_embedded(store, batch)))
+    monkeypatch.setattr(vectorstore, "delete", lambda ids: (events.append(("delete", set(ids))), delete(ids=ids)))
+    report = rag.update_vectorstore(vectorstore, rag.load_manifest())
+
+    path = os.path.join("data", "source", "doc_0.md")
+    new_ids = set(rag.load_manifest()["files"][path]["chunk_ids"]) - old_ids
+    assert len(new_ids) > rag.INGEST_BATCH_SIZE
+    added = [i for i, (kind, ids) in enumerate(events) if kind == "add" and ids & new_ids]
+    assert len(added) == 1 and events[added[0]][1] == new_ids
+    deleted_at = next(i for i, (kind, ids) in enumerate(events) if kind == "delete" and ids & old_ids)
+    assert added[0] < deleted_at
+    assert events[deleted_at][1] == old_ids - set(rag.load_manifest()["files"][path]["chunk_ids"])
+
+    assert report.chunks_deleted == report.chunks_added
+    assert stored_sources(vectorstore) == {"doc_0.md": 5, "doc_1.md": 5, "doc_2.md": 5}
+
+
+def test_removing_a_file_after_an_interrupted_update_deletes_all_of_its_chunks(index_dir, monkeypatch):
+    vectorstore = rag._open_vectorstore()
+    rewrite_sources(index_dir, ["doc_0.md"])
+    add_embedded = rag._add_embedded
+
+    def fail(store, batch):
+        raise RuntimeError("embedding provider unavailable")
+
+    monkeypatch.setattr(rag, "_add_embedded", fail)
+    with pytest.raises(RuntimeError):
+        rag.update_vectorstore(vectorstore, rag.load_manifest())
+    # The old version stays searchable while the new one is missing
+    assert stored_sources(vectorstore)["doc_0.md"] == 5
+
+    monkeypatch.setattr(rag, "_add_embedded", add_embedded)
+    os.remove(os.path.join(index_dir, "data", "source", "doc_0.md"))
+    rag.update_vectorstore(vectorstore, rag.load_manifest())
+    assert stored_sources(vectorstore) == {"doc_1.md": 5, "doc_2.md": 5}
+
+
+def test_refresh_picks_up_an_update_made_by_another_worker(index_dir, monkeypatch):
+    monkeypatch.setattr(rag, "_retriever", None)
+    monkeypatch.setattr(rag, "_retriever_version", None)
+    rebuilds = []
+    monkeypatch.setattr(rag, "_rebuild_listeners", [lambda: rebuilds.append(True)])
+    retriever = rag.get_retriever()
+    assert not rag.refresh_retriever()
+
+    # Another worker applies the change, this one finds no source changes left to apply
+    rewrite_sources(index_dir, ["doc_0.md"])
+    rag.open_vectorstore()
+    assert not rag.should_rebuild_vectorstore()
+
+    assert rag.refresh_retriever()
+    assert rag.get_retriever() is not retriever
+    assert rebuilds == [True]
+    assert any("Rust" in document.page_content for document in rag.get_retriever().invoke("Rust and Go"))
+    assert not rag.refresh_retriever()
+
+
+def test_refresh_builds_a_new_collection_and_swaps_it_in(index_dir, monkeypatch):
+    monkeypatch.setattr(rag, "_vectorstore", None)
+    monkeypatch.setattr(rag, "_retriever", None)
+    monkeypatch.setattr(rag, "_retriever_version", None)
+    monkeypatch.setattr(rag, "_rebuild_listeners", [])
+    rag.get_retriever()
+    served = rag._vectorstore
+    rewrite_sources(index_dir, ["doc_0.md"])
+
+    def stored_text(vectorstore) -> str:
+        return " ".join(vectorstore.get(include=["documents"])["documents"])
+
+    writes = []
+    add_embedded = rag._add_embedded
+
+    def add_and_check(store, batch):
+        add_embedded(store, batch)
+        writes.append((store._collection.name, "Rust" in stored_text(served)))
+
+    monkeypatch.setattr(rag, "_add_embedded", add_and_check)
+    assert rag.refresh_retriever()
+
+    # The served collection is not written to while the update is built
+    assert writes and all(name != served._collection.name and not changed for name, changed in writes)
+    assert rag._vectorstore is not served and rag._retriever.vectorstore is rag._vectorstore
+    assert "Rust" in stored_text(rag._vectorstore) and "Rust" not in stored_text(served)
+    assert rag.load_manifest()["collection"] == rag._vectorstore._collection.name
+
+    def collections() -> set:
+        return {collection.name for collection in served._client.list_collections()}
+
+    # The replaced collection is kept for the workers that did not refresh yet, and deleted by the next update
+    assert served._collection.name in collections()
+    rewrite_sources(index_dir, ["doc_1.md"])
+    current = rag._vectorstore
+    assert rag.refresh_retriever()
+    assert collections() == {current._collection.name, rag._vectorstore._collection.name}
@@ -0,0 +1,32 @@
+# test_intent.py
+import pytest
+
+from portfolio_assistant.core.intent import IntentPreClassifier
+
+THRESHOLD = 0.75
+
+
+@pytest.mark.parametrize("text", [
+    "How did he get in touch with computer vision?",
+    "Why did he reach out to Michael Jordan?",
+    "Write to him: what is your salary expectation?",
+    "what do you do?",
+    "How can I reach him?",
+])
+def test_questions_are_left_to_the_llm_router(text):
+    classifier = IntentPreClassifier(threshold=THRESHOLD)
+    assert classifier.predict(text)[1] < THRESHOLD
+    assert classifier.classify(text) is None
+
+
+@pytest.mark.parametrize("text, step", [
+    ("I want to email him", "email"),
+    ("Can you contact Michael for me?", "email"),
+    ("let me write him an email", "email"),
+    ("Please send him a message!", "email"),
+    ("hi", "chat"),
+    ("How are you?", "chat"),
+])
+def test_requests_and_greetings_bypass_the_llm_router(text, step):
+    classifier = IntentPreClassifier(threshold=THRESHOLD)
+    assert classifier.classify(text).step == step
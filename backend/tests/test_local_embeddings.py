@@ -0,0 +1,38 @@
+# test_local_embeddings.py
+import asyncio
+
+import pytest
+
+from benchmarks.fakes import FakeEmbeddings
+from portfolio_assistant.core import config
+from portfolio_assistant.tools import local_embeddings
+from portfolio_assistant.tools.local_embeddings import BatchedQueryEmbeddings
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_queries_share_one_batch():
+    embeddings = BatchedQueryEmbeddings(FakeEmbeddings(), max_wait_seconds=0.01)
+    questions = [f"Question {i}" for i in range(5)]
+    vectors = await asyncio.gather(*[embeddings.aembed_query(question) for question in questions])
+
+    assert vectors == [FakeEmbeddings().embed_query(question) for question in questions]
+    assert (embeddings.batches, embeddings.queries) == (1, 5)
+    # The batch task is referenced until it is done
+    assert not embeddings._tasks
+
+
+def unavailable(*args, **kwargs):
+    raise ImportError(local_embeddings.MISSING_PACKAGES_MESSAGE)
+
+
+def test_dev_mode_default_falls_back_to_ollama(monkeypatch):
+    monkeypatch.setattr(local_embeddings, "OnnxEmbeddings", unavailable)
+    monkeypatch.delenv("EMBEDDING_BACKEND", raising=False)
+    _, model_name = config.create_embeddings("onnx")
+    assert model_name == f"ollama:{config.OLLAMA_EMBEDDING_MODEL}"
+
+    # An explicitly chosen backend is not replaced
+    monkeypatch.setenv("EMBEDDING_BACKEND", "onnx")
+    with pytest.raises(ImportError, match="uv sync --extra onnx"):
+        config.create_embeddings("onnx")
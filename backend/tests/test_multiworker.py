@@ -0,0 +1,23 @@
+# test_multiworker.py
+import argparse
+
+import pytest
+
+from benchmarks.check_rate_limit import run
+
+pytestmark = [pytest.mark.anyio, pytest.mark.slow]
+
+WORKERS = 3
+LIMIT = 10
+REQUESTS = 30
+
+
+async def test_workers_share_one_sqlite_rate_limit():
+    """Three uvicorn workers on one SQLite storage accept exactly LIMIT of the simultaneous requests."""
+    args = argparse.Namespace(workers=WORKERS, limit=LIMIT, requests=REQUESTS, startup_seconds=3.0)
+    statuses, workers, counted = await run("sqlite:///data/ratelimit/limits.db", args)
+
+    assert workers == WORKERS
+    assert statuses == {200: LIMIT, 429: REQUESTS - LIMIT}
+    # /metrics merges the counts of all workers
+    assert counted == REQUESTS
@@ -0,0 +1,27 @@
+# test_question_log.py
+import time
+
+import pytest
+
+from portfolio_assistant.tools.db_manager import UnansweredQuestionWriter
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_idle_writer_stops_without_waiting_for_the_interval(tmp_path):
+    writer = UnansweredQuestionWriter(db_path=str(tmp_path / "questions.db"), flush_interval_seconds=30)
+    await writer.start()
+    started_at = time.perf_counter()
+    await writer.aclose()
+    assert time.perf_counter() - started_at < 1
+
+
+async def test_queued_questions_are_written_on_shutdown(tmp_path):
+    writer = UnansweredQuestionWriter(db_path=str(tmp_path / "questions.db"), flush_interval_seconds=30)
+    await writer.start()
+    assert writer.enqueue("What is his salary?", "visitor", "2026-01-01T00:00:00")
+    assert writer.enqueue("what is his salary", "visitor", "2026-01-01T00:00:01")
+    started_at = time.perf_counter()
+    await writer.aclose()
+    assert time.perf_counter() - started_at < 1
+    assert (writer.batches, writer.written_rows) == (1, 1)
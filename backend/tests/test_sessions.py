@@ -0,0 +1,37 @@
+# test_sessions.py
+import pytest
+
+from conftest import ANSWER
+
+pytestmark = pytest.mark.anyio
+
+QUESTION = "What is his tech stack?"
+
+
+async def test_session_turns_with_semantic_cache(client):
+    """Search turns of a server-side session are checkpointed with the answer cache enabled."""
+    from app import main
+
+    first = await client.post("/chat", json={"message": QUESTION})
+    assert first.status_code == 200
+    assert first.json()["response"] == ANSWER
+    session_id = first.json()["session_id"]
+
+    # Answered from the semantic cache
+    second = await client.post("/chat", json={"message": QUESTION, "session_id": session_id})
+    assert second.status_code == 200
+    assert second.json() == {"response": ANSWER, "action": "none", "session_id": session_id}
+
+    streamed = await client.post("/chat/stream", json={"message": "Which projects did he work on?", "session_id": session_id})
+    assert "event: error" not in streamed.text
+    assert "event: final" in streamed.text
+
+    assert (await client.get("/stats")).status_code == 401
+    stats = (await client.get("/stats", headers={"X-Analytics-Token": "test-token"})).json()
+    assert stats["answer_cache"]["hits"] == 1
+    assert stats["answer_cache"]["entries"] == 2
+
+    snapshot = await main.portfolio_assistant.workflow.aget_state({"configurable": {"thread_id": session_id}})
+    assert [message.type for message in snapshot.values["messages"]] == ["human", "ai"] * 3
+    # Only JSON-like turn state is checkpointed, no query vectors
+    assert "query_embedding" not in snapshot.values
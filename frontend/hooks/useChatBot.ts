@@ -20,6 +20,8 @@ I can also navigate this website for you.\n\nHow can I help you today?`
     ]);
     const [input, setInput] = useState('');
     const [isTyping, setIsTyping] = useState(false);
+    // Server-side session: the backend keeps the history, so only the new message is sent
+    const sessionIdRef = useRef<string | null>(null);
 
     const handleSend = useCallback(async (e: React.FormEvent) => {
         e.preventDefault();
@@ -28,9 +30,6 @@ I can also navigate this website for you.\n\nHow can I help you today?`
         const userMessage: Message = { role: 'user', text: input };
         
         // --- 1. Prepare State Updates ---
-        // Filter out the initial AI message from history for the API call
-        const historyForAPI = messages.filter(m => m.role !== 'ai' || !m.text.startsWith('Hello! I\'m the portfolio assistant'));
-
         setMessages(prev => [...prev, userMessage]);
         setInput('');
         setIsTyping(true);
@@ -44,7 +43,7 @@ I can also navigate this website for you.\n\nHow can I help you today?`
                 },
                 body: JSON.stringify({
                     message: userMessage.text,
-                    history: historyForAPI.map(m => ({ role: m.role, text: m.text })),
+                    session_id: sessionIdRef.current,
                 }),
             });
 
@@ -73,8 +72,11 @@ I can also navigate this website for you.\n\nHow can I help you today?`
                 throw new Error(`API call failed: ${response.statusText}`);
             }
             
-            // EXPECTING: { "response": "text", "action": "SCROLL_TO_CONTACT" }
+            // EXPECTING: { "response": "text", "action": "SCROLL_TO_CONTACT", "session_id": "..." }
             const data = await response.json();
+            if (data.session_id) {
+                sessionIdRef.current = data.session_id;
+            }
             const aiResponseText = data.response;
             const action = data.action; // <-- Extract the action key
 
@@ -95,7 +97,7 @@ I can also navigate this website for you.\n\nHow can I help you today?`
         } finally {
             setIsTyping(false);
         }
-    }, [input, isTyping, messages, onAction]); // Add onAction dependency
+    }, [input, isTyping, onAction]); // Add onAction dependency
 
     return {
         messages,
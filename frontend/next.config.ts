@@ -1,5 +1,8 @@
 import type { NextConfig } from "next";
 
+// Files in public/ change rarely: browsers reuse them for a day and revalidate in the background for a week
+const STATIC_ASSET_CACHE_CONTROL = "public, max-age=86400, stale-while-revalidate=604800";
+
 const nextConfig: NextConfig = {
   webpack: (config, { isServer }) => {
     // Add a rule to load .md files as raw strings (text content)
@@ -10,6 +13,18 @@ const nextConfig: NextConfig = {
 
     return config;
   },
+  async headers() {
+    return [
+      {
+        source: "/:file(Lebenslauf\\.pdf|profile-picture\\.jpg|.*\\.svg)",
+        headers: [{ key: "Cache-Control", value: STATIC_ASSET_CACHE_CONTROL }],
+      },
+      {
+        source: "/:dir(project_screenshots|logos)/:path*",
+        headers: [{ key: "Cache-Control", value: STATIC_ASSET_CACHE_CONTROL }],
+      },
+    ];
+  },
 };
 
 export default nextConfig;